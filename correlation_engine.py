@@ -4,11 +4,213 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, List, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
 
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    סכום על חלון נע לאורך ציר 0 - באמצעות סכום מצטבר (O(n))
+    
+    שורה i מכילה את סכום השורות i-window+1 עד i (כולל).
+    שורות החימום (i < window-1) מכילות 0.
+    """
+    csum = np.cumsum(values, axis=0)
+    sums = np.zeros_like(csum)
+    sums[window - 1:] = csum[window - 1:]
+    sums[window:] -= csum[:-window]
+    return sums
+
+
+def _trailing_means(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    ממוצע window השורות הקודמות (לא כולל השורה עצמה) לכל שורה ועמודה
+    
+    כל חלון נסכם בנפרד בדיוק כמו Series.mean על החלון (NaN מדולג), ולכן התוצאה
+    זהה ביט-לביט ללולאה המקורית - בלי שגיאת העיגול של סכום רץ.
+    שורות החימום (i < window) מכילות NaN.
+    """
+    means = np.full(values.shape, np.nan)
+    if window < 1 or len(values) <= window:
+        return means
+    
+    for col in range(values.shape[1]):
+        # חלון i מכסה את השורות i..i+window-1 ושייך לשורה i+window
+        windows = np.ascontiguousarray(sliding_window_view(values[:-1, col], window))
+        nan_mask = np.isnan(windows)
+        counts = window - nan_mask.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means[window:, col] = np.where(nan_mask, 0.0, windows).sum(axis=1) / counts
+    
+    return means
+
+
+def _centered(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    מרכוז עמודות סביב הממוצע (לשיפור הדיוק הנומרי של הסכומים המצטברים)
+    
+    Returns:
+        (ערכים ממורכזים עם 0 במקום NaN, מסכת NaN, שונות גלובלית לכל עמודה)
+    """
+    nan_mask = np.isnan(values)
+    mean = np.nanmean(values, axis=0)
+    centered = np.where(nan_mask, 0.0, values - np.nan_to_num(mean))
+    scale = np.mean(centered ** 2, axis=0)
+    return centered, nan_mask, scale
+
+
+def _block_centered(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    מרכוז מקומי לפי בלוקים של window שורות (NaN ושורות ריפוד מוחלפים ב-0)
+    
+    כל שורה ממורכזת פעמיים: סביב הממוצע של הבלוק שלה (own) וסביב הממוצע של הבלוק
+    הקודם (prev). חלון שמסתיים בבלוק k מכסה את סוף בלוק k-1 (own) ואת תחילת בלוק k (prev),
+    כך ששני החלקים ממורכזים סביב אותו ממוצע - של בלוק k-1, שקרוב לערכי החלון.
+    
+    Returns:
+        (own, prev) בצורת (בלוקים, window, ...) - הסדרה מרופדת לבלוק שלם
+    """
+    num_rows = len(values)
+    num_blocks = -(-num_rows // window)
+    
+    blocked = np.full((num_blocks * window,) + values.shape[1:], np.nan)
+    blocked[:num_rows] = values
+    blocked = blocked.reshape((num_blocks, window) + values.shape[1:])
+    
+    with warnings.catch_warnings():
+        # בלוק שכולו NaN - ממוצע 0 (החלונות שלו ממילא לא תקינים)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nan_to_num(np.nanmean(blocked, axis=1, keepdims=True))
+    
+    own = np.nan_to_num(blocked - means)
+    prev = blocked - np.concatenate([means[:1], means[:-1]])
+    return own, np.nan_to_num(prev, copy=False)
+
+
+def _local_window_sums(own: np.ndarray, prev: np.ndarray, num_rows: int) -> np.ndarray:
+    """
+    סכום על חלון נע מתוך ערכים ממורכזים מקומית (ראה _block_centered)
+    
+    הסכומים המצטברים מתחילים מחדש בכל בלוק, כך ששגיאת העיגול תלויה בגודל החלון
+    ובערכים שבו - לא באורך הסדרה ולא בשונות הכללית של העמודה.
+    חלון שמסתיים בשורה k*window + r = שורות r+1.. של בלוק k-1 (own) + שורות ..r של בלוק k (prev).
+    המערכים שמתקבלים נדרסים. שורות החימום (i < window-1) מכילות 0.
+    """
+    num_blocks, window = own.shape[:2]
+    
+    sums = np.cumsum(prev, axis=1, out=prev)
+    
+    # סכום השורות r+1..window-1 של כל בלוק = סך הבלוק פחות הסכום המצטבר עד r
+    tail = np.cumsum(own, axis=1, out=own)
+    np.subtract(tail[:, -1:], tail, out=tail)
+    
+    sums[1:] += tail[:-1]
+    sums = sums.reshape((num_blocks * window,) + own.shape[2:])[:num_rows]
+    sums[:window - 1] = 0
+    return sums
+
+
+def _rolling_moments(values: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    """
+    מומנטים גליליים לכל עמודה: סכום, שונות (כפול n²) ומסכת חלונות לא תקינים
+    
+    מחושבים פעם אחת ומשמשים לכל הזוגות שהעמודה משתתפת בהם.
+    חלון לא תקין = חלון עם NaN או חלון קבוע. חלון קבוע = שונות אפס ברמת דיוק float
+    ביחס לערכי החלון עצמו (ולא לשונות הכללית של העמודה) - תקופה שטוחה אבל לא
+    קבועה מקבלת קורלציה כמו בלולאה המקורית.
+    """
+    n = float(window)
+    own, prev = _block_centered(values, window)
+    sums = _local_window_sums(own.copy(), prev.copy(), len(values))
+    sum_sq = _local_window_sums(own * own, prev * prev, len(values))
+    var = n * sum_sq - sums * sums
+    
+    tolerance = 4 * n * np.finfo(np.float64).eps
+    invalid = (_window_sums(np.isnan(values).astype(np.int32), window) > 0) | (var <= tolerance * n * sum_sq)
+    return {
+        'own': own,
+        'prev': prev,
+        'sum': sums,
+        'var': var,
+        'invalid': invalid,
+    }
+
+
+def _select_moments(moments: Dict[str, np.ndarray], columns) -> Dict[str, np.ndarray]:
+    """
+    חיתוך מומנטים גליליים לתת-קבוצה של עמודות (מניות)
+    """
+    return {key: value[..., columns] for key, value in moments.items()}
+
+
+def _window_cross_sums(mx: Dict[str, np.ndarray], my: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    סכום המכפלות של שתי סדרות ממורכזות על כל חלון (משודר בין העמודות)
+    """
+    return _local_window_sums(mx['own'] * my['own'], mx['prev'] * my['prev'], len(mx['sum']))
+
+
+def _pearson_from_moments(mx: Dict[str, np.ndarray],
+                          my: Dict[str, np.ndarray],
+                          sxy: np.ndarray,
+                          window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    קורלציית פירסון מתוך מומנטים גליליים של שתי סדרות וסכום המכפלות שלהן
+    
+    Returns:
+        (קורלציות, מסכת חלונות תקינים - ללא חימום, ללא NaN וללא חלון קבוע)
+    """
+    cov = float(window) * sxy - mx['sum'] * my['sum']
+    
+    valid = ~(mx['invalid'] | my['invalid'])
+    valid[:window - 1] = False
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.clip(cov / np.sqrt(mx['var'] * my['var']), -1.0, 1.0)
+    
+    return corr, valid
+
+
+def rolling_pearson(x: np.ndarray, y: np.ndarray, window: int) -> np.ndarray:
+    """
+    קורלציית פירסון גלילית וקטורית - בדיוק כמו CORREL+OFFSET באקסל
+    
+    מבוסס על סכומים מצטברים של x, y, x², y² ו-xy (ממורכזים מקומית ומתאפסים בכל
+    בלוק של window שורות), כך שכל החלונות מחושבים במעבר אחד במקום חיתוך של כל חלון בנפרד.
+    
+    סמנטיקה (זהה ל-calculate_rolling_correlation המקורי):
+    - 0 בשורות החימום (i < window-1)
+    - 0 בכל חלון שמכיל NaN באחת הסדרות
+    - 0 כשהקורלציה לא מוגדרת (חלון קבוע - שונות 0 ברמת דיוק float)
+    
+    Args:
+        x: מערך (T,) או (T, N)
+        y: מערך (T,) או (T, N) - סדרה חד-ממדית משודרת מול כל העמודות של x
+        window: אורך החלון
+    
+    Returns:
+        np.ndarray (float64) בצורה המשודרת של x ו-y
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # סדרה חד-ממדית מול מטריצה - שידור לאורך העמודות
+    if x.ndim == 1 and y.ndim == 2:
+        x = x[:, None]
+    elif y.ndim == 1 and x.ndim == 2:
+        y = y[:, None]
+    
+    mx = _rolling_moments(x, window)
+    my = _rolling_moments(y, window)
+    sxy = _window_cross_sums(mx, my)
+    
+    corr, valid = _pearson_from_moments(mx, my, sxy, window)
+    
+    return np.where(valid, corr, 0.0)
+
+
 class CorrelationEngine:
     """
     מנוע חישוב קורלציות - משכפל בדיוק את הלוגיקה של האקסל
@@ -55,31 +257,85 @@ class CorrelationEngine:
         Returns:
             pd.Series: קורלציות גלילית לכל תאריך
         """
-        correlations = []
+        values = series.to_numpy(dtype=np.float64)
+        
+        # יישור לפי מיקום (כמו OFFSET) - ייחוס קצר יותר משלים ב-NaN ולכן מקבל 0
+        ref_values = np.full(len(values), np.nan)
+        ref_raw = reference.to_numpy(dtype=np.float64)[:len(values)]
+        ref_values[:len(ref_raw)] = ref_raw
+        
+        correlations = rolling_pearson(values, ref_values, window)
         
-        for i in range(len(series)):
-            if i < window - 1:
-                # אין מספיק נתונים - החזר 0 (כמו IF($A2>1230,0,...) באקסל)
-                correlations.append(0)
-            else:
-                # קח window ערכים אחורה (כולל הערך הנוכחי)
-                # זה בדיוק כמו OFFSET(D2,0,0,15,1) באקסל
-                stock_window = series.iloc[i-window+1:i+1]
-                ref_window = reference.iloc[i-window+1:i+1]
-                
-                # חישוב קורלציה (CORREL באקסל = קורלציית פירסון)
-                if len(stock_window) == window and len(ref_window) == window:
-                    # בדוק שאין NaN
-                    if stock_window.notna().all() and ref_window.notna().all():
-                        corr = stock_window.corr(ref_window)
-                        correlations.append(corr if not np.isnan(corr) else 0)
-                    else:
-                        correlations.append(0)
-                else:
-                    correlations.append(0)
-                    
         return pd.Series(correlations, index=series.index)
     
+    def get_field_frame(self,
+                        stock_data: pd.DataFrame,
+                        field: str = 'Close') -> pd.DataFrame:
+        """
+        חילוץ שדה אחד לכל המניות מתוך DataFrame עם MultiIndex (symbol, field)
+        
+        מניה ללא השדה המבוקש נופלת ל-Close, ומניה ללא Close מדולגת.
+        
+        Returns:
+            DataFrame (dates × symbols)
+        """
+        symbols = stock_data.columns.get_level_values(0).unique()
+        
+        data_dict = {}
+        for symbol in symbols:
+            if (symbol, field) in stock_data.columns:
+                data_dict[symbol] = stock_data[(symbol, field)]
+            elif (symbol, 'Close') in stock_data.columns:
+                data_dict[symbol] = stock_data[(symbol, 'Close')]
+        
+        return pd.DataFrame(data_dict)
+    
+    def extract_field_block(self,
+                            stock_data: pd.DataFrame,
+                            field: str = 'Close') -> Tuple[np.ndarray, List[str]]:
+        """
+        חילוץ בלוק (dates × symbols) של שדה אחד כמערך NumPy רציף
+        
+        Args:
+            stock_data: DataFrame עם MultiIndex (symbol, field)
+            field: 'Close', 'Adj Close' או 'Volume'
+        
+        Returns:
+            (מערך float64 בצורה (T, N), רשימת הסימולים לפי סדר העמודות)
+        """
+        field_df = self.get_field_frame(stock_data, field)
+        values = np.ascontiguousarray(field_df.to_numpy(dtype=np.float64))
+        return values, field_df.columns.tolist()
+    
+    def calculate_reference_correlations(self,
+                                         values: np.ndarray,
+                                         reference: np.ndarray,
+                                         window: Optional[int] = None) -> np.ndarray:
+        """
+        קורלציה גלילית של כל המניות מול מניית הייחוס - במעבר אחד
+        
+        מקביל להרצת calculate_rolling_correlation על כל עמודה בנפרד,
+        אבל מחושב כפעולה משודרת אחת על כל הבלוק.
+        
+        Args:
+            values: בלוק (T, N) מ-extract_field_block (מחירים או נפחים)
+            reference: סדרת הייחוס (T,) מיושרת לשורות הבלוק
+            window: אורך החלון (ברירת מחדל: block_length)
+        
+        Returns:
+            np.ndarray (float32) בצורה (T, N) - עמודה לכל מניה
+        """
+        window = window or self.block_length
+        values = np.asarray(values, dtype=np.float64)
+        reference = np.asarray(reference, dtype=np.float64).reshape(-1)
+        
+        if values.ndim != 2 or len(reference) != values.shape[0]:
+            raise ValueError(
+                f"צורת הבלוק {values.shape} לא תואמת לאורך הייחוס {len(reference)}"
+            )
+        
+        return rolling_pearson(values, reference, window).astype(np.float32)
+    
     def combine_correlations(self,
                            price_corr: pd.DataFrame,
                            volume_corr: pd.DataFrame) -> pd.DataFrame:
@@ -93,24 +349,54 @@ class CorrelationEngine:
                  (IF(OR(שער!M2<0,מחזור!M2<0),0,שער!M2*מחזור!M2)),
                  0)))
         """
-        combined = pd.DataFrame(index=price_corr.index)
-        
-        for col in price_corr.columns:
-            if self.calc_mode == 1:
-                # רק קורלציית שער
-                combined[col] = price_corr[col]
-            elif self.calc_mode == 2:
-                # רק קורלציית מחזור
-                combined[col] = volume_corr[col]
-            elif self.calc_mode == 3:
-                # מכפלה - רק אם שניהם חיוביים
-                combined[col] = np.where(
-                    (price_corr[col] < 0) | (volume_corr[col] < 0),
-                    0,
-                    price_corr[col] * volume_corr[col]
-                )
-        
-        return combined
+        if self.calc_mode not in (1, 2, 3):
+            # סוג חישוב לא מוכר - טבלה בלי עמודות, כמו בלולאה המקורית
+            return pd.DataFrame(index=price_corr.index)
+        
+        # יישור לפי תוויות - עובד גם לסדרות זמן (dates × symbols) וגם למטריצות (symbols × symbols)
+        volume_aligned = volume_corr.reindex(index=price_corr.index, columns=price_corr.columns)
+        
+        combined = self.combine_correlation_values(
+            price_corr.to_numpy(dtype=np.float64),
+            volume_aligned.to_numpy(dtype=np.float64)
+        )
+        
+        return pd.DataFrame(combined, index=price_corr.index, columns=price_corr.columns)
+    
+    def combine_correlation_values(self,
+                                   price_corr: np.ndarray,
+                                   volume_corr: np.ndarray) -> np.ndarray:
+        """
+        שילוב קורלציות על מערכים שלמים - ללא לולאות
+        
+        - calc_mode=1: קורלציית שער
+        - calc_mode=2: קורלציית מחזור
+        - calc_mode=3: 0 אם אחת מהן שלילית, אחרת מכפלה (NaN נשאר NaN, כמו באקסל)
+        - אחרת: מערך בלי עמודות
+        
+        Args:
+            price_corr: מערך קורלציות שער (כל צורה)
+            volume_corr: מערך קורלציות מחזור באותה צורה
+        
+        Returns:
+            np.ndarray באותה צורה
+        """
+        price_corr = np.asarray(price_corr, dtype=np.float64)
+        volume_corr = np.asarray(volume_corr, dtype=np.float64)
+        
+        if self.calc_mode == 1:
+            # רק קורלציית שער
+            return price_corr.copy()
+        elif self.calc_mode == 2:
+            # רק קורלציית מחזור
+            return volume_corr.copy()
+        elif self.calc_mode == 3:
+            # מכפלה - רק אם שניהם חיוביים
+            with np.errstate(invalid='ignore'):
+                either_negative = (price_corr < 0) | (volume_corr < 0)
+            return np.where(either_negative, 0.0, price_corr * volume_corr)
+        
+        return np.empty(np.broadcast(price_corr, volume_corr).shape[:-1] + (0,))
     
     def calculate_volume_ratio(self,
                               volumes: pd.DataFrame,
@@ -123,36 +409,26 @@ class CorrelationEngine:
            IF(C2<פרמטרים!$F$2,0,
               AVERAGE(OFFSET(M2,-פרמטרים!$H$2,0,פרמטרים!$H$2,1))/M2))
         """
-        ratio_df = pd.DataFrame(index=volumes.index)
+        volume_values = volumes.to_numpy(dtype=np.float64)
+        corr_values = combined_corr[volumes.columns].to_numpy(dtype=np.float64)
         
-        for col in volumes.columns:
-            ratios = []
-            
-            for i in range(len(volumes)):
-                # תנאי 1: יש מספיק נתונים היסטוריים
-                if i < self.ma_length:
-                    ratios.append(0)
-                    continue
-                
-                # תנאי 2: הקורלציה עוברת את סף המובהקות
-                if combined_corr[col].iloc[i] < self.significance:
-                    ratios.append(0)
-                    continue
-                
-                # חישוב הממוצע
-                volume_window = volumes[col].iloc[i-self.ma_length:i]
-                avg_volume = volume_window.mean()
-                current_volume = volumes[col].iloc[i]
-                
-                if current_volume > 0:
-                    ratio = avg_volume / current_volume
-                    ratios.append(ratio)
-                else:
-                    ratios.append(0)
-            
-            ratio_df[col] = ratios
+        # ממוצע של ma_length הימים הקודמים (לא כולל היום) - AVERAGE(OFFSET(M2,-H,0,H,1))
+        avg_volume = _trailing_means(volume_values, self.ma_length)
+        
+        # תנאי 1: יש מספיק נתונים היסטוריים
+        mask = np.zeros(volume_values.shape, dtype=bool)
+        mask[self.ma_length:] = True
+        
+        # תנאי 2: הקורלציה עוברת את סף המובהקות (NaN לא נחסם - כמו בהשוואה המקורית)
+        mask &= ~(corr_values < self.significance)
+        
+        # תנאי 3: נפח נוכחי חיובי (הגנה מחלוקה ב-0)
+        mask &= volume_values > 0
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(mask, avg_volume / volume_values, 0.0)
         
-        return ratio_df
+        return pd.DataFrame(ratios, index=volumes.index, columns=volumes.columns)
     
     def filter_opportunities(self, ratio_df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -257,6 +533,81 @@ class CorrelationEngine:
         
         return validation
     
+    def run_full_analysis(self,
+                          stock_data: pd.DataFrame,
+                          reference_prices: pd.Series,
+                          reference_volumes: pd.Series) -> Dict:
+        """
+        סריקה מלאה מול מניית הייחוס - גיליונות השער, המחזור, השילוב ויחס הנפח באקסל
+        
+        הקורלציות של כל המניות מחושבות במעבר אחד לכל שדה (calculate_reference_correlations)
+        במקום calculate_rolling_correlation על כל מניה בנפרד.
+        
+        Args:
+            stock_data: DataFrame עם MultiIndex (symbol, field)
+            reference_prices: מחירי מניית הייחוס (מיושרים לפי תאריך)
+            reference_volumes: נפחי מניית הייחוס (מיושרים לפי תאריך)
+        
+        Returns:
+            Dict עם price_correlations, volume_correlations, combined_correlations,
+            volume_ratios (DataFrame dates × symbols), opportunities ו-statistics
+        """
+        prices, symbols = self.extract_field_block(stock_data, self.price_field)
+        volume_df = self.get_field_frame(stock_data, 'Volume').reindex(columns=symbols)
+        dates = stock_data.index
+        
+        price_corr = self.calculate_reference_correlations(
+            prices, reference_prices.reindex(dates).to_numpy(dtype=np.float64)
+        )
+        volume_corr = self.calculate_reference_correlations(
+            volume_df.to_numpy(dtype=np.float64), reference_volumes.reindex(dates).to_numpy(dtype=np.float64)
+        )
+        
+        price_corr_df = pd.DataFrame(price_corr, index=dates, columns=symbols)
+        volume_corr_df = pd.DataFrame(volume_corr, index=dates, columns=symbols)
+        combined = self.combine_correlations(price_corr_df, volume_corr_df)
+        ratio_df = self.calculate_volume_ratio(volume_df, combined)
+        
+        return {
+            'price_correlations': price_corr_df,
+            'volume_correlations': volume_corr_df,
+            'combined_correlations': combined,
+            'volume_ratios': ratio_df,
+            'opportunities': self.filter_opportunities(ratio_df),
+            'statistics': self.calculate_statistics(ratio_df)
+        }
+    
+    def find_today_opportunities(self, results: Dict) -> List[Dict]:
+        """
+        הזדמנויות ביום האחרון של הסריקה - מניות שיחס הנפח שלהן עובר את הסף
+        
+        Args:
+            results: התוצאה של run_full_analysis
+        
+        Returns:
+            רשימת Dict עם symbol, correlation, volume_ratio, date - ממוינת לפי קורלציה (מהגבוהה)
+        """
+        ratio_df = results['volume_ratios']
+        if ratio_df.empty:
+            return []
+        
+        date = ratio_df.index[-1]
+        ratios = ratio_df.iloc[-1]
+        correlations = results['combined_correlations'].iloc[-1]
+        
+        opportunities = [
+            {
+                'symbol': symbol,
+                'correlation': float(correlations[symbol]),
+                'volume_ratio': float(ratio),
+                'date': date
+            }
+            for symbol, ratio in ratios.items()
+            if ratio > 1 + self.threshold
+        ]
+        
+        return sorted(opportunities, key=lambda opp: opp['correlation'], reverse=True)
+    
     def calculate_full_correlation_matrix(self,
                                         stock_data: pd.DataFrame,
                                         field: str = 'Close') -> pd.DataFrame:
@@ -312,47 +663,88 @@ class CorrelationEngine:
         Returns:
             DataFrame עם מטריצת קורלציה ממוצעת על כל התקופה
         """
-        # חילוץ כל המניות
-        symbols = stock_data.columns.get_level_values(0).unique()
-        
-        # יצירת DataFrame של השדה הנבחר
-        data_dict = {}
-        for symbol in symbols:
-            if (symbol, field) in stock_data.columns:
-                data_dict[symbol] = stock_data[(symbol, field)]
-            elif (symbol, 'Close') in stock_data.columns:
-                data_dict[symbol] = stock_data[(symbol, 'Close')]
-            else:
-                continue
+        data_df = self.get_field_frame(stock_data, field)
         
-        if not data_dict:
+        if data_df.empty:
             return pd.DataFrame()
         
-        data_df = pd.DataFrame(data_dict)
+        values = data_df.to_numpy(dtype=np.float64)
+        num_rows, num_symbols = values.shape
+        
+        # שורה נכנסת לחלון רק אם אין בה NaN (כמו dropna על החלון)
+        row_valid = ~np.isnan(values).any(axis=1)
+        centered, _, scale = _centered(values)
+        var_floor = 1e-9 * scale
         
-        # חישוב קורלציות גליליות ואז ממוצע
-        correlations_list = []
+        # סכומים רצים של החלון הנוכחי - O(N²) זיכרון ללא תלות באורך ההיסטוריה
+        sums = np.zeros(num_symbols)
+        cross = np.zeros((num_symbols, num_symbols))
+        count = 0
         
-        for i in range(window - 1, len(data_df)):
-            window_data = data_df.iloc[i-window+1:i+1]
-            # בדוק שיש מספיק נתונים תקינים
-            valid_data = window_data.dropna()
-            if len(valid_data) >= window * 0.8:  # לפחות 80% מהנתונים תקינים
-                corr_matrix = valid_data.corr()
-                correlations_list.append(corr_matrix)
+        # צבירת ממוצע הקורלציות תוך כדי (nanmean)
+        corr = np.empty((num_symbols, num_symbols))
+        corr_sum = np.zeros((num_symbols, num_symbols))
+        partial_count = np.zeros((num_symbols, num_symbols))
+        full_windows = 0
+        num_windows = 0
         
-        if not correlations_list:
+        for i in range(num_rows):
+            # עדכון rank-1: הוספת השורה החדשה והוצאת השורה שיצאה מהחלון
+            rows = []
+            signs = []
+            if row_valid[i]:
+                rows.append(i)
+                signs.append(1.0)
+            if i >= window and row_valid[i - window]:
+                rows.append(i - window)
+                signs.append(-1.0)
+            
+            if rows:
+                update = centered[rows]
+                weights = np.array(signs)
+                sums += weights @ update
+                cross += (update.T * weights) @ update
+                count += int(weights.sum())
+            
+            if i < window - 1:
+                continue
+            
+            # בדוק שיש מספיק נתונים תקינים - לפחות 80% מהנתונים תקינים
+            if count == 0 or count < window * 0.8:
+                continue
+            
+            # מטריצת שונות משותפת של החלון והמרה לקורלציה
+            np.multiply.outer(sums, sums / count, out=corr)
+            np.subtract(cross, corr, out=corr)
+            var = np.diag(corr).copy()
+            valid = var > var_floor * count
+            inv_std = np.zeros(num_symbols)
+            inv_std[valid] = 1.0 / np.sqrt(var[valid])
+            corr *= inv_std[:, None]
+            corr *= inv_std[None, :]
+            np.clip(corr, -1.0, 1.0, out=corr)
+            corr_sum += corr
+            
+            # מניה עם חלון קבוע - קורלציה לא מוגדרת (NaN) ולא נספרת בממוצע
+            if valid.all():
+                full_windows += 1
+            else:
+                partial_count += np.outer(valid, valid)
+            num_windows += 1
+        
+        if num_windows == 0:
             # אם אין מספיק נתונים, נחזיר קורלציה רגילה
             return data_df.corr()
         
         # ממוצע של כל המטריצות
-        # נשתמש ב-numpy כדי לחשב ממוצע
-        corr_arrays = [corr.values for corr in correlations_list]
-        avg_corr_array = np.nanmean(corr_arrays, axis=0)
+        corr_count = partial_count + full_windows
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_corr_array = np.where(corr_count > 0, corr_sum / corr_count, np.nan)
+        
         avg_correlation = pd.DataFrame(
             avg_corr_array,
-            index=correlations_list[0].index,
-            columns=correlations_list[0].columns
+            index=data_df.columns,
+            columns=data_df.columns
         )
         
         return avg_correlation
@@ -360,7 +752,8 @@ class CorrelationEngine:
     def calculate_rolling_correlation_over_time(self,
                                                stock_data: pd.DataFrame,
                                                field: str = 'Close',
-                                               window: int = 30) -> Dict:
+                                               window: int = 30,
+                                               as_tensor: bool = False) -> Dict:
         """
         חישוב קורלציות גליליות לאורך זמן - לכל תאריך
         
@@ -368,27 +761,21 @@ class CorrelationEngine:
             stock_data: DataFrame עם MultiIndex (symbol, field)
             field: השדה לחישוב קורלציה
             window: גודל החלון לחישוב קורלציה
+            as_tensor: אם True, מחזיר מערך float32 קומפקטי (time × pair) של המשולש העליון
+                       במקום DataFrame לכל מניה (ראה _rolling_correlation_tensor)
         
         Returns:
             Dict: {stock1: DataFrame שבו עמודות הן המניות האחרות ושורות הן תאריכים}
         """
-        # חילוץ כל המניות
-        symbols = stock_data.columns.get_level_values(0).unique().tolist()
+        data_df = self.get_field_frame(stock_data, field)
         
-        # יצירת DataFrame של השדה הנבחר
-        data_dict = {}
-        for symbol in symbols:
-            if (symbol, field) in stock_data.columns:
-                data_dict[symbol] = stock_data[(symbol, field)]
-            elif (symbol, 'Close') in stock_data.columns:
-                data_dict[symbol] = stock_data[(symbol, 'Close')]
-            else:
-                continue
-        
-        if not data_dict:
+        if data_df.empty:
             return {}
         
-        data_df = pd.DataFrame(data_dict)
+        if as_tensor:
+            return self._rolling_correlation_tensor(data_df, window, field)
+        
+        symbols = data_df.columns.tolist()
         
         # יצירת מבנה נתונים לאחסון קורלציות לאורך זמן
         # לכל מניה נשמור DataFrame שבו העמודות הן מניות אחרות והשורות הן תאריכים
@@ -413,38 +800,202 @@ class CorrelationEngine:
         
         return result
     
+    def _rolling_correlation_tensor(self,
+                                    data_df: pd.DataFrame,
+                                    window: int,
+                                    field: str) -> Dict:
+        """
+        קורלציות גליליות לכל הזוגות (i < j) במעבר וקטורי אחד על מומנטים גליליים
+        
+        כל זוג מחושב פעם אחת בלבד ונשמר כ-float32. הסמנטיקה זהה ל-rolling(window).corr:
+        NaN בחימום, בחלון עם NaN ובחלון קבוע.
+        
+        Returns:
+            Dict עם:
+            - symbols: רשימת המניות (אינדקס העמודות)
+            - dates: אינדקס התאריכים
+            - pairs: מערך (P, 2) של אינדקסי מניות (i < j) לכל עמודה ב-values
+            - values: מערך float32 בצורה (T, P)
+            - window, field: פרמטרי החישוב
+        """
+        values = data_df.to_numpy(dtype=np.float64)
+        num_rows, num_symbols = values.shape
+        
+        first, second = np.triu_indices(num_symbols, k=1)
+        tensor = np.full((num_rows, len(first)), np.nan, dtype=np.float32)
+        
+        moments = _rolling_moments(values, window)
+        
+        offset = 0
+        for i in range(num_symbols - 1):
+            # כל המניות j > i מול מניה i - בלוק אחד של עמודות רצופות ב-tensor
+            others = slice(i + 1, num_symbols)
+            mx = _select_moments(moments, slice(i, i + 1))
+            my = _select_moments(moments, others)
+            
+            sxy = _window_cross_sums(mx, my)
+            corr, valid = _pearson_from_moments(mx, my, sxy, window)
+            
+            width = num_symbols - i - 1
+            tensor[:, offset:offset + width] = np.where(valid, corr, np.nan)
+            offset += width
+        
+        return {
+            'symbols': data_df.columns.tolist(),
+            'dates': data_df.index,
+            'pairs': np.column_stack([first, second]).astype(np.int32),
+            'values': tensor,
+            'window': window,
+            'field': field,
+        }
+    
+    def get_pair_correlation_series(self,
+                                    tensor: Dict,
+                                    stock1: str,
+                                    stock2: str) -> pd.Series:
+        """
+        סדרת הקורלציה לאורך זמן של זוג מניות מתוך tensor
+        
+        Args:
+            tensor: תוצאה של calculate_rolling_correlation_over_time(as_tensor=True)
+            stock1, stock2: שתי מניות שונות (בכל סדר)
+        
+        Returns:
+            pd.Series לפי תאריך
+        """
+        symbols = tensor['symbols']
+        i, j = sorted((symbols.index(stock1), symbols.index(stock2)))
+        if i == j:
+            raise ValueError("נדרשות שתי מניות שונות")
+        
+        # מיקום הזוג (i, j) במשולש העליון לפי סדר שורות
+        num_symbols = len(symbols)
+        pair_idx = i * num_symbols - i * (i + 1) // 2 + (j - i - 1)
+        
+        return pd.Series(tensor['values'][:, pair_idx], index=tensor['dates'], name=f"{stock1}-{stock2}")
+    
+    def get_correlations_at_date(self,
+                                 tensor: Dict,
+                                 date) -> pd.Series:
+        """
+        חתך רוחב - הקורלציות של כל הזוגות בתאריך אחד (שורה אחת של ה-tensor)
+        
+        Args:
+            tensor: תוצאה של calculate_rolling_correlation_over_time(as_tensor=True)
+            date: תאריך שקיים באינדקס
+        
+        Returns:
+            pd.Series עם MultiIndex (מניה 1, מניה 2)
+        """
+        row = tensor['dates'].get_loc(date)
+        symbols = np.asarray(tensor['symbols'], dtype=object)
+        pairs = tensor['pairs']
+        
+        index = pd.MultiIndex.from_arrays(
+            [symbols[pairs[:, 0]], symbols[pairs[:, 1]]],
+            names=['מניה 1', 'מניה 2']
+        )
+        
+        return pd.Series(tensor['values'][row], index=index)
+    
     def find_top_correlations(self,
                             correlation_matrix: pd.DataFrame,
-                            top_n: int = 50) -> pd.DataFrame:
+                            top_n: int = 50,
+                            per_symbol: bool = False,
+                            min_correlation: Optional[float] = None) -> pd.DataFrame:
         """
         מציאת הקורלציות הגבוהות ביותר
         
+        בחירת top-K עם argpartition על המשולש העליון - רק K השורות שנבחרו
+        הופכות ל-DataFrame.
+        
         Args:
             correlation_matrix: מטריצת קורלציה
-            top_n: מספר הקורלציות הגבוהות ביותר להחזיר
+            top_n: מספר הקורלציות הגבוהות ביותר להחזיר (לכל מניה אם per_symbol=True)
+            per_symbol: אם True, מחזיר top_n מניות לכל מניה במקום top_n זוגות בסה"כ
+            min_correlation: סף מינימלי - קורלציות נמוכות ממנו לא מוחזרות
         
         Returns:
             DataFrame עם הקורלציות הגבוהות ביותר
         """
-        # המרה לרשימת tuples (stock1, stock2, correlation)
-        correlations = []
-        
-        for i, stock1 in enumerate(correlation_matrix.index):
-            for j, stock2 in enumerate(correlation_matrix.columns):
-                if i < j:  # רק חצי מהמטריצה (למנוע כפילויות)
-                    corr_value = correlation_matrix.iloc[i, j]
-                    if not np.isnan(corr_value):
-                        correlations.append({
-                            'מניה 1': stock1,
-                            'מניה 2': stock2,
-                            'קורלציה': corr_value
-                        })
-        
-        # המרה ל-DataFrame ומיון
-        corr_df = pd.DataFrame(correlations)
-        corr_df = corr_df.sort_values('קורלציה', ascending=False)
-        
-        return corr_df.head(top_n)
+        columns = ['מניה 1', 'מניה 2', 'קורלציה']
+        values = correlation_matrix.to_numpy(dtype=np.float64)
+        row_labels = np.asarray(correlation_matrix.index, dtype=object)
+        col_labels = np.asarray(correlation_matrix.columns, dtype=object)
+        
+        if per_symbol:
+            return self._find_top_correlations_per_symbol(
+                values, row_labels, col_labels, top_n, min_correlation
+            )
+        
+        # רק חצי מהמטריצה (למנוע כפילויות)
+        rows, cols = np.triu_indices(values.shape[0], k=1, m=values.shape[1])
+        upper = values[rows, cols]
+        
+        keep = ~np.isnan(upper)
+        if min_correlation is not None:
+            keep &= upper >= min_correlation
+        rows, cols, upper = rows[keep], cols[keep], upper[keep]
+        
+        if len(upper) == 0 or top_n <= 0:
+            return pd.DataFrame(columns=columns)
+        
+        # בחירת K הגבוהים ואז מיון שלהם בלבד
+        if len(upper) > top_n:
+            top_idx = np.argpartition(-upper, top_n - 1)[:top_n]
+        else:
+            top_idx = np.arange(len(upper))
+        top_idx = top_idx[np.argsort(-upper[top_idx], kind='stable')]
+        
+        return pd.DataFrame({
+            'מניה 1': row_labels[rows[top_idx]],
+            'מניה 2': col_labels[cols[top_idx]],
+            'קורלציה': upper[top_idx]
+        })
+    
+    def _find_top_correlations_per_symbol(self,
+                                          values: np.ndarray,
+                                          row_labels: np.ndarray,
+                                          col_labels: np.ndarray,
+                                          top_n: int,
+                                          min_correlation: Optional[float]) -> pd.DataFrame:
+        """
+        top_n המניות עם הקורלציה הגבוהה ביותר לכל מניה (ללא המניה עצמה)
+        """
+        columns = ['מניה 1', 'מניה 2', 'קורלציה']
+        num_rows, num_cols = values.shape
+        k = min(top_n, num_cols)
+        
+        if k <= 0 or num_rows == 0:
+            return pd.DataFrame(columns=columns)
+        
+        # תאים פסולים (NaN, המניה עצמה, מתחת לסף) מקבלים -inf ונזרקים בסוף
+        scores = np.where(np.isnan(values), -np.inf, values)
+        diagonal = np.arange(min(num_rows, num_cols))
+        scores[diagonal, diagonal] = -np.inf
+        if min_correlation is not None:
+            scores[scores < min_correlation] = -np.inf
+        
+        if k < num_cols:
+            top_cols = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top_cols = np.tile(np.arange(num_cols), (num_rows, 1))
+        top_scores = np.take_along_axis(scores, top_cols, axis=1)
+        
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top_cols = np.take_along_axis(top_cols, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        
+        rows = np.repeat(np.arange(num_rows), k)
+        cols = top_cols.ravel()
+        scores_flat = top_scores.ravel()
+        keep = np.isfinite(scores_flat)
+        
+        return pd.DataFrame({
+            'מניה 1': row_labels[rows[keep]],
+            'מניה 2': col_labels[cols[keep]],
+            'קורלציה': scores_flat[keep]
+        })
     
     def calculate_returns(self, stock_data: pd.DataFrame) -> Dict:
         """
@@ -4,11 +4,183 @@
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import random
 import time
 import os
-import pickle
+from price_store import PriceStore
+
+
+# כל הבקשות של yfinance יוצאות לאותו שרת - מגבלת קצב אחת משותפת
+YAHOO_HOST = "finance.yahoo.com"
+
+
+def _is_permanent_error(error: Exception) -> bool:
+    """
+    שגיאה שאין טעם לנסות שוב (מניה שהוסרה / אין נתונים), בניגוד לשגיאות רשת או rate limit
+    """
+    error_msg = str(error).lower()
+    return 'delisted' in error_msg or 'no timezone' in error_msg or 'no price data' in error_msg
+
+
+def _covered_range(start_date: str, end_date: str) -> Tuple[str, str]:
+    """
+    הטווח [start_date, end_date) שנרשם ככיסוי במאגר אחרי הורדה
+    
+    הסוף נחתך להיום (לא כולל): הבר של היום עוד פתוח (או עוד לא קיים) ותאריכים עתידיים
+    לא הורדו, כך שהורדה מאוחרת יותר תשלים אותם במקום להחזיר נתונים ישנים מהקאש.
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    return start_date, max(start_date, min(end_date, today))
+
+
+class _RateLimiter:
+    """
+    הגבלת קצב פשוטה - מרווח מינימלי בין בקשות, משותף לכל ה-threads
+    """
+    
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+    
+    def wait(self):
+        """
+        המתנה עד שמותר לשלוח את הבקשה הבאה
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class YFinanceTransport:
+    """
+    שכבת התקשורת מול Yahoo Finance (דרך yfinance)
+    
+    DataFetcher עובד מול הממשק הזה בלבד, כך שאפשר להחליף אותו ב-ReplayTransport
+    לבדיקות והרצות offline.
+    """
+    
+    host = YAHOO_HOST
+    
+    def history(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        היסטוריה יומית של מניה אחת בטווח [start_date, end_date)
+        """
+        return yf.Ticker(symbol).history(start=start_date, end=end_date)
+    
+    def history_many(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        """
+        היסטוריה יומית של קבוצת מניות בבקשה אחת (multi-ticker)
+        
+        Returns:
+            Dict מניה -> DataFrame. מניות בלי נתונים לא מופיעות.
+        """
+        raw = yf.download(
+            symbols,
+            start=start_date,
+            end=end_date,
+            group_by='ticker',
+            auto_adjust=True,  # כמו ticker.history
+            actions=False,
+            progress=False,
+            threads=False
+        )
+        
+        if raw is None or raw.empty:
+            return {}
+        
+        frames = {}
+        for symbol in symbols:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if symbol not in raw.columns.get_level_values(0):
+                    continue
+                df = raw[symbol]
+            else:
+                df = raw
+            
+            df = df.dropna(how='all')
+            if not df.empty:
+                frames[symbol] = df
+        
+        return frames
+    
+    def is_delisted(self, symbol: str) -> bool:
+        """
+        בדיקה אם מניה הוסרה מהמסחר (בקשה נוספת - נקראת רק כשאין היסטוריה)
+        """
+        info = yf.Ticker(symbol).info
+        return 'longName' not in info or info.get('quoteType') == 'DELISTED'
+
+
+class ReplayTransport:
+    """
+    Transport מקומי שמחזיר תגובות מוקלטות מהדיסק ({replay_dir}/{symbol}.parquet)
+    
+    אם ניתן record_from, מניה שאין לה הקלטה נמשכת מה-transport הזה ונשמרת,
+    כך שהרצה אחת מול השרת מכינה את הנתונים להרצות offline.
+    """
+    
+    host = None  # אין שרת - בלי מגבלת קצב
+    
+    def __init__(self, replay_dir: str, record_from=None):
+        """
+        אתחול
+        
+        Args:
+            replay_dir: תיקיית ההקלטות
+            record_from: transport אמיתי להקלטת מניות חסרות (None = offline בלבד)
+        """
+        self.replay_dir = replay_dir
+        self.record_from = record_from
+        os.makedirs(replay_dir, exist_ok=True)
+    
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.replay_dir, f"{symbol}.parquet")
+    
+    def record(self, symbol: str, df: pd.DataFrame):
+        """
+        שמירת תגובה של מניה להרצות הבאות
+        """
+        df.to_parquet(self._path(symbol))
+    
+    def history(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        if os.path.exists(self._path(symbol)):
+            df = pd.read_parquet(self._path(symbol))
+        elif self.record_from is not None:
+            df = self.record_from.history(symbol, start_date, end_date)
+            if not df.empty:
+                self.record(symbol, df)
+        else:
+            return pd.DataFrame()
+        
+        dates = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        return df[(dates >= pd.Timestamp(start_date)) & (dates < pd.Timestamp(end_date))]
+    
+    def history_many(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        missing = [s for s in symbols if not os.path.exists(self._path(s))]
+        if missing and self.record_from is not None:
+            for symbol, df in self.record_from.history_many(missing, start_date, end_date).items():
+                self.record(symbol, df)
+        
+        frames = {}
+        for symbol in symbols:
+            df = self.history(symbol, start_date, end_date) if os.path.exists(self._path(symbol)) else pd.DataFrame()
+            if not df.empty:
+                frames[symbol] = df
+        
+        return frames
+    
+    def is_delisted(self, symbol: str) -> bool:
+        return not os.path.exists(self._path(symbol))
 
 
 class DataFetcher:
@@ -16,15 +188,42 @@ class DataFetcher:
     מחלקה להורדת ועדכון נתוני מניות
     """
     
-    def __init__(self, cache_dir: str = "data_cache"):
+    def __init__(self,
+                 cache_dir: str = "data_cache",
+                 requests_per_second: float = 5.0,
+                 max_retries: int = 3,
+                 retry_backoff: float = 1.0,
+                 transport=None,
+                 batch_size: int = 50,
+                 max_cache_bytes: Optional[int] = None):
         """
         אתחול
         
         Args:
             cache_dir: תיקיית קאש לשמירת נתונים
+            requests_per_second: מקסימום בקשות לשנייה לכל שרת (משותף לכל ה-threads)
+            max_retries: מספר ניסיונות חוזרים לבקשה שנכשלה בשגיאה זמנית
+            retry_backoff: השהייה בסיסית (שניות) לפני ניסיון חוזר - מוכפלת בכל ניסיון, עם jitter
+            transport: שכבת התקשורת (ברירת מחדל: YFinanceTransport; ReplayTransport להרצות offline)
+            batch_size: מספר מניות לבקשת multi-ticker ב-download_multiple_stocks (1 = בקשה לכל מניה)
+            max_cache_bytes: תקציב גודל למאגר המחירים (None = ללא הגבלה, מעבר לו פינוי לפי LRU)
         """
         self.cache_dir = cache_dir
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.transport = transport or YFinanceTransport()
+        self.batch_size = batch_size
+        self._rate_limiters: Dict[str, _RateLimiter] = {}
+        self._rate_limiters_lock = threading.Lock()
+        self._symbol_locks: Dict[str, threading.Lock] = {}
         os.makedirs(cache_dir, exist_ok=True)
+        self.store = PriceStore(os.path.join(cache_dir, "prices"), max_bytes=max_cache_bytes)
+        
+        # ייבוא חד-פעמי של קבצי pickle מהגרסה הקודמת של הקאש
+        if not self.store.symbols() and any(f.endswith('.pkl') for f in os.listdir(cache_dir)):
+            imported = self.store.import_pickle_cache(cache_dir)
+            print(f"💾 יובאו {imported} מניות מקבצי pickle למאגר המחירים")
         
     def get_sp500_symbols(self) -> List[str]:
         """
@@ -209,66 +408,263 @@ class DataFetcher:
         Args:
             symbol: סימול המניה
             start_date: תאריך התחלה (ברירת מחדל: 2012-01-01)
-            end_date: תאריך סיום (ברירת מחדל: היום)
+            end_date: תאריך סיום, לא כולל (ברירת מחדל: עד היום כולל)
             use_cache: האם להשתמש בקאש
             force_download: האם לכפות הורדה מחדש (True = הורד בכל מקרה, False = השתמש בקאש אם קיים)
         """
         if end_date is None:
-            end_date = datetime.now().strftime("%Y-%m-%d")
+            # עד היום כולל - ticker.history לא כולל את תאריך הסיום
+            end_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
         
-        cache_file = os.path.join(self.cache_dir, f"{symbol}_{start_date}_{end_date}.pkl")
-        
-        # בדוק קאש - אם לא כפינו הורדה ויש קאש, תמיד השתמש בו
-        if use_cache and not force_download and os.path.exists(cache_file):
+        # בדוק מאגר - אם לא כפינו הורדה, מורידים רק את מה שעוד לא הורד (למשל היום הפתוח)
+        exists = use_cache and not force_download and self.store.has(symbol)
+        gaps = self.store.missing_ranges(symbol, start_date, end_date) if exists else [(start_date, end_date)]
+        if not gaps:
             try:
-                with open(cache_file, 'rb') as f:
-                    df = pickle.load(f)
+                df = self._read_from_store(symbol, start_date, end_date)
                 print(f"✅ {symbol}: נטען מקאש")
                 return df
             except Exception as e:
                 print(f"⚠️ {symbol}: שגיאה בטעינה מקאש ({e}), מוריד מחדש...")
                 # אם נכשל, נוריד מחדש
+                exists = False
+                gaps = [(start_date, end_date)]
         
         # הורדה מ-Yahoo Finance
         try:
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(start=start_date, end=end_date)
-            
-            if df.empty:
-                # בדיקה אם המניה הוסרה מהמסחר
-                info = ticker.info
-                if 'longName' not in info or info.get('quoteType') == 'DELISTED':
-                    print(f"⚠️ {symbol}: מניה הוסרה מהמסחר (delisted)")
-                else:
-                    print(f"⚠️ {symbol}: אין נתונים זמינים")
-                return None
-            
-            # בדיקה שיש לפחות כמה שורות נתונים
-            if len(df) < 10:
-                print(f"⚠️ {symbol}: נתונים מועטים מדי ({len(df)} ימים)")
-                return None
-            
-            # שמירה בקאש
-            with open(cache_file, 'wb') as f:
-                pickle.dump(df, f)
+            for gap_start, gap_end in gaps:
+                df = self._call_with_retry(self.transport.history, symbol, gap_start, gap_end)
+                
+                if not exists:
+                    if df.empty:
+                        # בדיקה אם המניה הוסרה מהמסחר
+                        if self._call_with_retry(self.transport.is_delisted, symbol):
+                            print(f"⚠️ {symbol}: מניה הוסרה מהמסחר (delisted)")
+                        else:
+                            print(f"⚠️ {symbol}: אין נתונים זמינים")
+                        return None
+                    
+                    # בדיקה שיש לפחות כמה שורות נתונים
+                    if len(df) < 10:
+                        print(f"⚠️ {symbol}: נתונים מועטים מדי ({len(df)} ימים)")
+                        return None
+                
+                # שמירה במאגר (מיזוג עם ההיסטוריה הקיימת של המניה)
+                self.store.append(symbol, df, *_covered_range(gap_start, gap_end))
             
-            return df
+            return self._read_from_store(symbol, start_date, end_date)
             
         except Exception as e:
-            error_msg = str(e).lower()
-            if 'delisted' in error_msg or 'no timezone' in error_msg or 'no price data' in error_msg:
+            if _is_permanent_error(e):
                 print(f"⚠️ {symbol}: מניה הוסרה מהמסחר או אין נתונים")
             else:
                 print(f"⚠️ שגיאה בהורדת {symbol}: {e}")
             return None
     
+    def get_reference_stock_data(self,
+                                 symbol: str = "SPY",
+                                 start_date: str = "2012-01-01",
+                                 end_date: str = None) -> Optional[Dict[str, pd.Series]]:
+        """
+        נתוני מניית הייחוס לסריקה (CorrelationEngine.run_full_analysis)
+        
+        Returns:
+            Dict עם price (Close) ו-volume (Volume), או None אם ההורדה נכשלה
+        """
+        df = self.download_stock_data(symbol, start_date, end_date)
+        if df is None or df.empty:
+            return None
+        
+        return {'price': df['Close'], 'volume': df['Volume']}
+    
+    def _rate_limiter(self, host: str) -> _RateLimiter:
+        """
+        מגבלת הקצב של שרת (נוצרת בפעם הראשונה)
+        """
+        with self._rate_limiters_lock:
+            if host not in self._rate_limiters:
+                self._rate_limiters[host] = _RateLimiter(self.requests_per_second)
+            return self._rate_limiters[host]
+    
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        """
+        נעילה למיזוג של מניה במאגר - שני פערים של אותה מניה יכולים לרדת במקביל
+        """
+        with self._rate_limiters_lock:
+            if symbol not in self._symbol_locks:
+                self._symbol_locks[symbol] = threading.Lock()
+            return self._symbol_locks[symbol]
+    
+    def _call_with_retry(self, func: Callable, *args, host: Optional[str] = None, **kwargs):
+        """
+        קריאה לשרת עם מגבלת קצב וניסיונות חוזרים (exponential backoff עם jitter)
+        
+        שגיאות קבועות (מניה שהוסרה / אין נתונים) נזרקות מיד בלי ניסיון חוזר.
+        """
+        host = host or self.transport.host
+        for attempt in range(self.max_retries + 1):
+            if host:
+                self._rate_limiter(host).wait()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or _is_permanent_error(e):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                time.sleep(delay)
+    
+    def _download_batch(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, bool]:
+        """
+        הורדת קבוצת מניות בבקשת multi-ticker אחת (או בקשה בודדת כש-batch_size=1) ומיזוג למאגר
+        
+        מניה שכבר במאגר ולא חזרו לה ברים (למשל פער שכולו חגים / לפני ההנפקה) לא נחשבת כושלת -
+        הכיסוי שלה מורחב כדי שהפער לא יורד שוב.
+        
+        Returns:
+            Dict מניה -> האם ההורדה הצליחה
+        """
+        try:
+            if len(symbols) == 1 and self.batch_size <= 1:
+                frames = {symbols[0]: self._call_with_retry(self.transport.history, symbols[0], start_date, end_date)}
+            else:
+                frames = self._call_with_retry(self.transport.history_many, symbols, start_date, end_date)
+        except Exception as e:
+            print(f"⚠️ שגיאה בהורדת קבוצה ({symbols[0]}..{symbols[-1]}): {e}")
+            return {symbol: False for symbol in symbols}
+        
+        results = {}
+        for symbol in symbols:
+            df = frames.get(symbol)
+            
+            with self._symbol_lock(symbol):
+                exists = self.store.has(symbol)
+                
+                if (df is None or df.empty) and not exists:
+                    # אין בקשת info נוספת במצב קבוצתי - מניה בלי נתונים נחשבת כושלת
+                    print(f"⚠️ {symbol}: מניה הוסרה מהמסחר או אין נתונים")
+                    results[symbol] = False
+                elif not exists and len(df) < 10:
+                    print(f"⚠️ {symbol}: נתונים מועטים מדי ({len(df)} ימים)")
+                    results[symbol] = False
+                else:
+                    self.store.append(symbol, df if df is not None else pd.DataFrame(), *_covered_range(start_date, end_date))
+                    results[symbol] = True
+        
+        return results
+    
+    def _plan_fetches(self, symbols: List[str], start_date: str, end_date: str) -> Dict[Tuple[str, str], List[str]]:
+        """
+        מה חסר במאגר כדי לכסות [start_date, end_date) - רק הפערים בכיסוי הקיים
+        
+        Returns:
+            Dict (תחילת פער, סוף פער) -> מניות. מניות שמכוסות במלואן לא מופיעות.
+        """
+        plans: Dict[Tuple[str, str], List[str]] = {}
+        
+        for symbol in symbols:
+            for gap in self.store.missing_ranges(symbol, start_date, end_date):
+                plans.setdefault(gap, []).append(symbol)
+        
+        return plans
+    
+    def _fetch_plans(self,
+                     plans: Dict[Tuple[str, str], List[str]],
+                     max_workers: int = 10,
+                     progress_callback: Optional[Callable[[int, int, str], None]] = None) -> Dict[str, bool]:
+        """
+        הורדת כל הפערים ב-thread pool, בקבוצות של self.batch_size מניות לבקשה
+        
+        Returns:
+            Dict מניה -> האם כל ההורדות שלה הצליחו
+        """
+        batch_size = max(1, self.batch_size)
+        jobs = [
+            (gap, group[i:i + batch_size])
+            for gap, group in plans.items()
+            for i in range(0, len(group), batch_size)
+        ]
+        total = sum(len(group) for group in plans.values())
+        results: Dict[str, bool] = {}
+        done = 0
+        
+        if not jobs:
+            return results
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+            futures = {
+                executor.submit(self._download_batch, batch, gap[0], gap[1]): batch
+                for gap, batch in jobs
+            }
+            
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    print(f"⚠️ שגיאה בהורדת {', '.join(batch)}: {e}")
+                    batch_results = {}
+                
+                for symbol in batch:
+                    results[symbol] = results.get(symbol, True) and batch_results.get(symbol, False)
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, total, symbol)
+        
+        return results
+    
+    def resolve_history(self,
+                        symbols: List[str],
+                        start_date: str = "2012-01-01",
+                        end_date: Optional[str] = None,
+                        fields: Optional[List[str]] = None,
+                        fetch_missing: bool = True,
+                        max_workers: int = 10) -> pd.DataFrame:
+        """
+        היסטוריית מניות לטווח [start_date, end_date) מהמאגר, עם הורדה של מה שחסר
+        
+        זו נקודת הכניסה המשותפת ל-DataFetcher, ל-PreComputeEngine ולעדכון היומי:
+        הכיסוי נבדק לפי האינדקס של המאגר (ולא לפי שמות קבצים), ורק הפערים בקצוות מורדים.
+        
+        Args:
+            symbols: רשימת מניות
+            start_date: תאריך התחלה
+            end_date: תאריך סיום, לא כולל (None = עד הבר האחרון במאגר, כיסוי נבדק מול היום)
+            fields: שדות (ברירת מחדל: כל שדות המאגר)
+            fetch_missing: האם להוריד פערים (False = מהמאגר בלבד)
+            max_workers: מספר הורדות במקביל
+            
+        Returns:
+            DataFrame עם MultiIndex (symbol, field) לפי סדר המניות; מניות בלי נתונים לא מופיעות
+        """
+        if fetch_missing:
+            target_end = end_date or datetime.now().strftime("%Y-%m-%d")
+            plans = self._plan_fetches(symbols, start_date, target_end)
+            if plans:
+                missing = len({symbol for group in plans.values() for symbol in group})
+                print(f"📥 משלים {missing} מניות חסרות במאגר...")
+                self._fetch_plans(plans, max_workers)
+        
+        stock_data = self.store.load(symbols, fields, start_date=start_date)
+        if end_date and not stock_data.empty:
+            stock_data = stock_data[stock_data.index < pd.Timestamp(end_date)]
+        
+        return stock_data
+    
+    def _read_from_store(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        קריאת מניה מהמאגר בטווח [start_date, end_date) - תאריך הסיום לא כלול, כמו ב-ticker.history
+        """
+        df = self.store.read(symbol, start_date=start_date)
+        return df[df.index < pd.Timestamp(end_date)]
+    
     def download_multiple_stocks(self,
                                 symbols: List[str],
                                 start_date: str = "2012-01-01",
                                 end_date: str = None,
                                 use_cache: bool = True,
                                 force_download: bool = False,
-                                max_workers: int = 10) -> pd.DataFrame:
+                                max_workers: int = 10,
+                                progress_callback: Optional[Callable[[int, int, str], None]] = None) -> pd.DataFrame:
         """
         הורדת נתונים של מספר מניות
         
@@ -277,8 +673,14 @@ class DataFetcher:
         - Adj Close: מחיר סגירה מותאם (מותאם לפיצולי מניות ודיבידנדים)
         - Volume: נפח מסחר
         
+        ההורדות רצות ב-thread pool בגודל max_workers (עם מגבלת קצב משותפת),
+        והתוצאות מורכבות לפי סדר הרשימה המקורית.
+        
         Args:
             force_download: אם True, יוריד מחדש גם אם יש קאש. אם False, ישתמש בקאש אם קיים.
+            max_workers: מספר הורדות במקביל
+            (מניות שלא בקאש מורדות בקבוצות של self.batch_size בבקשת multi-ticker)
+            progress_callback: פונקציה (done, total, symbol) שנקראת אחרי כל מניה שהורדה
         
         Returns:
             DataFrame עם MultiIndex: (symbol, field) - Close, Adj Close ו-Volume
@@ -293,90 +695,18 @@ class DataFetcher:
         elif force_download:
             print("🔄 כופה הורדה מחדש - מתעלם מקאש")
         
-        all_data = {}
-        failed_symbols = []
+        # מה צריך להוריד: עם קאש - רק הפערים בכיסוי של כל מניה; בלי קאש - הכל
+        if use_cache and not force_download:
+            plans = self._plan_fetches(symbols, start_date, end_date)
+            pending = {symbol for group in plans.values() for symbol in group}
+            if len(pending) < len(symbols):
+                print(f"💾 {len(symbols) - len(pending)} מניות נטענו מהמאגר")
+        else:
+            plans = {(start_date, end_date): list(symbols)}
         
-        for i, symbol in enumerate(symbols):
-            if (i + 1) % 50 == 0:
-                print(f"התקדמות: {i+1}/{len(symbols)}")
-            
-            df = self.download_stock_data(symbol, start_date, end_date, use_cache, force_download)
-            
-            if df is not None and not df.empty:
-                # בדוק אילו עמודות זמינות
-                available_columns = df.columns.tolist()
-                
-                # נרמול שמות עמודות (הסרת רווחים מיותרים, המרה ל-lowercase לבדיקה)
-                normalized_columns = {col.strip(): col for col in available_columns}
-                normalized_lower = {col.strip().lower(): col for col in available_columns}
-                
-                # מיפוי שמות עמודות אפשריים (yfinance יכול להחזיר שמות שונים)
-                column_mapping = {
-                    'Close': ['Close', 'close', 'CLOSE'],
-                    'Adj Close': ['Adj Close', 'AdjClose', 'Adj_Close', 'adj close', 'ADJ CLOSE', 'AdjClose'],
-                    'Volume': ['Volume', 'volume', 'VOLUME', 'vol']
-                }
-                
-                # פונקציה עזר למציאת עמודה
-                def find_column(possible_names):
-                    # נסה מציאת מדויקת
-                    for col_name in possible_names:
-                        if col_name in available_columns:
-                            return col_name
-                        # נסה עם נרמול
-                        if col_name.strip() in normalized_columns:
-                            return normalized_columns[col_name.strip()]
-                        # נסה case-insensitive
-                        if col_name.strip().lower() in normalized_lower:
-                            return normalized_lower[col_name.strip().lower()]
-                    return None
-                
-                # בדיקה ראשונית - אם אין Close, המניה לא תקינה
-                close_col = find_column(column_mapping['Close'])
-                close_found = close_col is not None
-                
-                if not close_found:
-                    print(f"⚠️ {symbol}: אין עמודת 'Close' - מדלג על מניה זו")
-                    print(f"   עמודות זמינות: {available_columns}")
-                    failed_symbols.append(symbol)
-                    continue
-                
-                # דיבוג: הדפס עמודות עבור מניות ראשונות (למקרה של בעיות)
-                if i < 3 and len(failed_symbols) == 0:
-                    print(f"   {symbol}: עמודות זמינות: {available_columns}")
-                
-                # שמור רק את השדות הנדרשים לניתוח:
-                # - Close: מחיר סגירה (לחישוב קורלציות מחיר)
-                # - Adj Close: מחיר סגירה מותאם (מותאם לפיצולי מניות ודיבידנדים)
-                # - Volume: נפח מסחר (לחישוב קורלציות נפח)
-                for field, possible_names in column_mapping.items():
-                    found_column = find_column(possible_names)
-                    
-                    if found_column:
-                        all_data[(symbol, field)] = df[found_column]
-                    else:
-                        # אם לא נמצאה העמודה, נדפיס אזהרה ונשתמש בעמודה חלופית
-                        if field == 'Adj Close':
-                            # אם אין Adj Close, נשתמש ב-Close
-                            if close_col:
-                                if i < 5:  # הדפס רק עבור 5 מניות ראשונות כדי לא להציף
-                                    print(f"⚠️ {symbol}: אין עמודת 'Adj Close', משתמש ב-'Close'")
-                                all_data[(symbol, field)] = df[close_col]
-                            else:
-                                # זה לא אמור לקרות כי בדקנו קודם
-                                failed_symbols.append(symbol)
-                                break
-                        elif field == 'Volume':
-                            # Volume הוא אופציונלי יותר, נשתמש ב-0 אם אין
-                            if i < 5:  # הדפס רק עבור 5 מניות ראשונות
-                                print(f"⚠️ {symbol}: אין עמודת 'Volume', משתמש ב-0")
-                            all_data[(symbol, field)] = pd.Series(0, index=df.index)
-            else:
-                failed_symbols.append(symbol)
-            
-            # השהייה קלה כדי לא להעמיס על השרת
-            if not use_cache:
-                time.sleep(0.1)
+        # הורדה מקבילית למאגר, ואז טעינה אחת מהמאגר לפי הסדר המקורי
+        results = self._fetch_plans(plans, max_workers, progress_callback)
+        failed_symbols = [s for s in symbols if results.get(s) is False or not self.store.has(s)]
         
         if failed_symbols:
             print(f"\n⚠️ נכשלו {len(failed_symbols)} מניות (הוסרו מהמסחר או אין נתונים)")
@@ -385,8 +715,9 @@ class DataFetcher:
             else:
                 print(f"   מניות שנכשלו (20 ראשונות): {', '.join(failed_symbols[:20])}")
         
-        # יצירת DataFrame אחד גדול
-        combined_df = pd.DataFrame(all_data)
+        failed_set = set(failed_symbols)
+        loaded_symbols = [s for s in symbols if s not in failed_set]
+        combined_df = self.resolve_history(loaded_symbols, start_date, end_date, ['Close', 'Adj Close', 'Volume'], fetch_missing=False)
         
         if combined_df.empty:
             print("\n❌ לא הורדו נתונים עבור אף מניה")
@@ -399,41 +730,153 @@ class DataFetcher:
         
         return combined_df
     
-    def update_daily(self, symbols: List[str]) -> pd.DataFrame:
+    def update_incremental(self,
+                           symbols: List[str],
+                           end_date: str = None,
+                           default_start: str = "2012-01-01",
+                           overlap_days: int = 7,
+                           max_workers: int = 10,
+                           progress_callback: Optional[Callable[[int, int, str], None]] = None) -> Dict:
         """
-        עדכון יומי - מוריד רק את הנתונים החדשים
+        עדכון אינקרמנטלי של המאגר - מוריד רק את הברים שאחרי הבר האחרון של כל מניה
+        
+        לכל מניה מורד הטווח (last_bar - overlap_days, end_date] בלבד. הברים החופפים
+        משמשים לזיהוי restatement: אם Close / Adj Close של ברים שכבר שמורים השתנו
+        (פיצול או דיבידנד מתאימים מחדש את כל ההיסטוריה), ההיסטוריה של אותה מניה
+        מורדת מחדש ונכתבת מחדש. מניה שאין לה נתונים במאגר מורדת מ-default_start.
+        
+        Args:
+            symbols: רשימת מניות
+            end_date: תאריך אחרון לעדכון, כולל (ברירת מחדל: היום)
+            default_start: תאריך התחלה למניות חדשות
+            overlap_days: ימים קלנדריים לפני הבר האחרון שמורדים שוב לבדיקת restatement
+            max_workers: מספר בקשות במקביל
+            progress_callback: פונקציה (done, total, symbol)
+            
+        Returns:
+            Dict עם new, appended, restated, unchanged, failed (רשימות מניות) ו-new_rows
         """
-        # מצא את התאריך האחרון בקאש
-        latest_date = None
+        if end_date is None:
+            end_date = datetime.now().strftime("%Y-%m-%d")
         
-        for symbol in symbols[:5]:  # בדוק 5 מניות ראשונות
-            cache_files = [f for f in os.listdir(self.cache_dir) if f.startswith(symbol)]
-            if cache_files:
-                latest_file = max(cache_files, key=lambda f: os.path.getmtime(
-                    os.path.join(self.cache_dir, f)
-                ))
-                file_date = datetime.fromtimestamp(
-                    os.path.getmtime(os.path.join(self.cache_dir, latest_file))
-                )
-                if latest_date is None or file_date > latest_date:
-                    latest_date = file_date
+        # ticker.history לא כולל את תאריך הסיום
+        fetch_end = (pd.Timestamp(end_date) + timedelta(days=1)).strftime("%Y-%m-%d")
         
-        if latest_date and latest_date.date() == datetime.now().date():
-            print("הנתונים כבר עודכנו היום")
-            return None
+        # קיבוץ מניות לפי תאריך ההתחלה של הבקשה (לרוב זהה לכל היקום)
+        plans: Dict[str, List[str]] = {}
+        for symbol in symbols:
+            info = self.store.coverage(symbol)
+            if info is None:
+                start = default_start
+            else:
+                start = (pd.Timestamp(info['last_date']) - timedelta(days=overlap_days)).strftime("%Y-%m-%d")
+            plans.setdefault(start, []).append(symbol)
         
-        # הורד נתונים חדשים
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        today = datetime.now().strftime("%Y-%m-%d")
+        batch_size = max(1, self.batch_size)
+        jobs = [
+            (start, group[i:i + batch_size])
+            for start, group in plans.items()
+            for i in range(0, len(group), batch_size)
+        ]
         
-        print(f"מעדכן נתונים מ-{yesterday} עד {today}")
+        stats = {'new': [], 'appended': [], 'restated': [], 'unchanged': [], 'failed': [], 'new_rows': 0}
+        done = 0
         
-        return self.download_multiple_stocks(
-            symbols,
-            start_date=yesterday,
-            end_date=today,
-            use_cache=False
-        )
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs) or 1))) as executor:
+            futures = {
+                executor.submit(self._call_with_retry, self.transport.history_many, batch, start, fetch_end): (start, batch)
+                for start, batch in jobs
+            }
+            
+            for future in as_completed(futures):
+                start, batch = futures[future]
+                try:
+                    frames = future.result()
+                except Exception as e:
+                    print(f"⚠️ שגיאה בעדכון קבוצה ({batch[0]}..{batch[-1]}): {e}")
+                    frames = None
+                
+                for symbol in batch:
+                    if frames is None:
+                        stats['failed'].append(symbol)
+                    else:
+                        try:
+                            status, new_rows = self._merge_increment(symbol, frames.get(symbol), start, fetch_end)
+                            stats[status].append(symbol)
+                            stats['new_rows'] += new_rows
+                        except Exception as e:
+                            print(f"⚠️ שגיאה בעדכון {symbol}: {e}")
+                            stats['failed'].append(symbol)
+                    
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, len(symbols), symbol)
+        
+        return stats
+    
+    def _merge_increment(self, symbol: str, df: pd.DataFrame, start_date: str, end_date: str):
+        """
+        מיזוג ברים חדשים של מניה אחת למאגר
+        
+        הכיסוי שנרשם נחתך להיום (ראה _covered_range), כך שהבר של היום וטווח עתידי
+        שהתבקש לא נחשבים מכוסים.
+        
+        Returns:
+            (סטטוס, מספר שורות חדשות) - סטטוס אחד מ-new / appended / restated / unchanged / failed
+        """
+        info = self.store.coverage(symbol)
+        
+        if df is None or df.empty:
+            return ('unchanged' if info else 'failed'), 0
+        
+        if info is None:
+            if len(df) < 10:
+                return 'failed', 0
+            self.store.write(symbol, df, *_covered_range(start_date, end_date))
+            return 'new', len(df)
+        
+        # בדיקת restatement על ברים חופפים (בלי הבר האחרון - ייתכן שנשמר באמצע יום מסחר)
+        incoming = self.store.normalize(df)
+        stored = self.store.read(symbol, ['Close', 'Adj Close'], start_date=start_date)
+        stored = stored[stored.index < pd.Timestamp(info['last_date'])]
+        common = stored.index.intersection(incoming.index)
+        
+        if len(common) > 0:
+            old_values = stored.loc[common].to_numpy()
+            new_values = incoming.loc[common, ['Close', 'Adj Close']].to_numpy()
+            if not np.allclose(old_values, new_values, rtol=1e-4, equal_nan=True):
+                full = self._call_with_retry(self.transport.history, symbol, info['fetched_start'], end_date)
+                if full is None or full.empty:
+                    return 'failed', 0
+                self.store.write(symbol, full, *_covered_range(info['fetched_start'], end_date))
+                print(f"🔁 {symbol}: ההיסטוריה עודכנה מחדש (פיצול / דיבידנד)")
+                return 'restated', max(0, len(full) - info['rows'])
+        
+        self.store.append(symbol, df, *_covered_range(start_date, end_date))
+        new_rows = self.store.coverage(symbol)['rows'] - info['rows']
+        return ('appended' if new_rows > 0 else 'unchanged'), new_rows
+    
+    def update_daily(self, symbols: List[str]) -> Dict:
+        """
+        עדכון יומי - מוריד רק את הברים החדשים של כל מניה (ראה update_incremental)
+        """
+        print(f"מעדכן {len(symbols)} מניות באופן אינקרמנטלי...")
+        
+        stats = self.update_incremental(symbols)
+        
+        print(f"✅ {len(stats['appended'])} עודכנו, {len(stats['new'])} חדשות, "
+              f"{len(stats['restated'])} נכתבו מחדש, {len(stats['unchanged'])} ללא שינוי, "
+              f"{len(stats['failed'])} נכשלו ({stats['new_rows']} שורות חדשות)")
+        
+        return stats
+    
+    def compact_cache(self) -> Dict:
+        """
+        דחיסת קאש - יישור אינדקס המאגר מול הדיסק ומחיקת קבצים זמניים וקבצי pickle ישנים שכבר מכוסים
+        """
+        stats = self.store.compact(legacy_dir=self.cache_dir)
+        print(f"קאש נדחס: {stats['removed_files']} קבצים נמחקו ({stats['freed_bytes'] / (1024 * 1024):.2f} MB)")
+        return stats
     
     def clear_cache(self):
         """
@@ -89,11 +89,16 @@ class DailyUpdater:
             
             # שלב 2: עדכון נתונים
             logger.info("שלב 2: מעדכן נתוני מניות...")
+            def report_progress(done, total, symbol):
+                if done % 50 == 0 or done == total:
+                    logger.info(f"התקדמות: {done}/{total}")
+            
             stock_data = self.fetcher.download_multiple_stocks(
                 symbols,
                 start_date=self.config['start_date'],
                 end_date=datetime.now().strftime("%Y-%m-%d"),
-                use_cache=True
+                use_cache=True,
+                progress_callback=report_progress
             )
             
             if stock_data is None or stock_data.empty:
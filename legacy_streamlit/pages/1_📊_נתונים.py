@@ -6,8 +6,8 @@ import streamlit as st
 import pandas as pd
 import os
 from datetime import datetime
-import pickle
 from data_fetcher import DataFetcher
+from price_store import PriceStore
 from utils import load_css, initialize_session_state
 
 # טעינת CSS
@@ -16,6 +16,9 @@ load_css()
 # אתחול session state
 initialize_session_state()
 
+# מאגר המחירים (Parquet לכל מניה)
+store = PriceStore(os.path.join("data_cache", "prices"))
+
 # כותרת עמוד
 st.markdown("""
 <div style='direction: rtl; text-align: right;'>
@@ -25,158 +28,38 @@ st.markdown("""
 
 def get_cached_stocks():
     """קבלת רשימת כל המניות שנמצאות בקאש"""
-    cache_dir = "data_cache"
-    stocks = []
-    
-    if not os.path.exists(cache_dir):
-        return []
-    
-    for filename in os.listdir(cache_dir):
-        if filename.endswith('.pkl') and not filename.startswith('SPY'):
-            # חילוץ שם המניה מהקובץ (פורמט: SYMBOL_startdate_enddate.pkl)
-            symbol = filename.split('_')[0]
-            if symbol not in stocks:
-                stocks.append(symbol)
-    
-    return sorted(stocks)
+    return [symbol for symbol in store.symbols() if symbol != 'SPY']
 
 def get_stock_info(symbol):
-    """קבלת מידע על מניה מהקאש"""
-    cache_dir = "data_cache"
+    """קבלת מידע על מניה מהקאש (מה-metadata של המאגר, בלי לטעון את הנתונים)"""
     info = {
         'symbol': symbol,
-        'files': [],
+        'size': 0,
         'date_range': None,
         'total_days': 0
     }
     
-    if not os.path.exists(cache_dir):
-        return info
-    
-    for filename in os.listdir(cache_dir):
-        if filename.startswith(f"{symbol}_") and filename.endswith('.pkl'):
-            filepath = os.path.join(cache_dir, filename)
-            file_date = datetime.fromtimestamp(os.path.getmtime(filepath))
-            
-            # חילוץ תאריכים מהשם
-            parts = filename.replace('.pkl', '').split('_')
-            if len(parts) >= 3:
-                start_date = parts[1]
-                end_date = parts[2]
-                
-                info['files'].append({
-                    'filename': filename,
-                    'start_date': start_date,
-                    'end_date': end_date,
-                    'modified': file_date,
-                    'size': os.path.getsize(filepath)
-                })
-    
-    if info['files']:
-        # מציאת טווח התאריכים הכולל
-        all_starts = [f['start_date'] for f in info['files']]
-        all_ends = [f['end_date'] for f in info['files']]
-        info['date_range'] = f"{min(all_starts)} עד {max(all_ends)}"
-        
-        # חישוב מספר ימים כולל
-        try:
-            with open(os.path.join(cache_dir, info['files'][0]['filename']), 'rb') as f:
-                df = pickle.load(f)
-                info['total_days'] = len(df)
-        except:
-            pass
+    coverage = store.coverage(symbol)
+    if coverage:
+        info['size'] = store.size_bytes(symbol)
+        info['date_range'] = f"{coverage['first_date']} עד {coverage['last_date']}"
+        info['total_days'] = coverage['rows']
     
     return info
 
 def load_data_from_cache():
-    """טעינת נתונים מהקאש"""
-    cache_dir = "data_cache"
-    
-    if not os.path.exists(cache_dir):
-        return None, []
-    
-    # קבלת כל המניות בקאש
+    """טעינת נתונים מהקאש - סריקה אחת על מאגר המחירים"""
     symbols = get_cached_stocks()
     
     if not symbols:
         return None, []
     
-    # ארגון קבצים לפי symbol - נקח את הקובץ האחרון לכל symbol
-    symbol_files = {}
-    for symbol in symbols:
-        symbol_files[symbol] = []
-        for filename in os.listdir(cache_dir):
-            if filename.startswith(f"{symbol}_") and filename.endswith('.pkl'):
-                filepath = os.path.join(cache_dir, filename)
-                file_mtime = os.path.getmtime(filepath)
-                symbol_files[symbol].append((filename, filepath, file_mtime))
-        
-        # מיון לפי תאריך עדכון - הקובץ האחרון ראשון
-        symbol_files[symbol].sort(key=lambda x: x[2], reverse=True)
+    combined_df = store.load(symbols, ['Close', 'Adj Close', 'Volume'])
     
-    if not any(symbol_files.values()):
+    if combined_df.empty:
         return None, []
     
-    # טעינת נתונים - נקח את הקובץ האחרון לכל symbol
-    all_data = {}
-    loaded_symbols = []
-    
-    for symbol, files_list in symbol_files.items():
-        if not files_list:
-            continue
-        
-        # נקח את הקובץ האחרון
-        filename, filepath, _ = files_list[0]
-        
-        try:
-            with open(filepath, 'rb') as f:
-                df = pickle.load(f)
-            
-            if df is not None and not df.empty:
-                # בדיקת עמודות זמינות
-                available_columns = df.columns.tolist()
-                
-                # מיפוי שמות עמודות
-                column_mapping = {
-                    'Close': ['Close', 'close', 'CLOSE'],
-                    'Adj Close': ['Adj Close', 'AdjClose', 'Adj_Close', 'adj close', 'ADJ CLOSE'],
-                    'Volume': ['Volume', 'volume', 'VOLUME', 'vol']
-                }
-                
-                def find_column(possible_names):
-                    for col_name in possible_names:
-                        if col_name in available_columns:
-                            return col_name
-                    return None
-                
-                # טעינת Close
-                close_col = find_column(column_mapping['Close'])
-                if close_col:
-                    all_data[(symbol, 'Close')] = df[close_col]
-                    
-                    # טעינת Adj Close (או Close אם אין)
-                    adj_close_col = find_column(column_mapping['Adj Close'])
-                    if adj_close_col:
-                        all_data[(symbol, 'Adj Close')] = df[adj_close_col]
-                    else:
-                        all_data[(symbol, 'Adj Close')] = df[close_col]
-                    
-                    # טעינת Volume (או 0 אם אין)
-                    volume_col = find_column(column_mapping['Volume'])
-                    if volume_col:
-                        all_data[(symbol, 'Volume')] = df[volume_col]
-                    else:
-                        all_data[(symbol, 'Volume')] = pd.Series(0, index=df.index)
-                    
-                    loaded_symbols.append(symbol)
-        except Exception as e:
-            continue
-    
-    if not all_data:
-        return None, []
-    
-    # יצירת DataFrame משולב
-    combined_df = pd.DataFrame(all_data)
+    loaded_symbols = list(dict.fromkeys(combined_df.columns.get_level_values(0)))
     return combined_df, loaded_symbols
 
 # טעינה אוטומטית מהקאש אם אין נתונים ב-session state
@@ -235,7 +118,7 @@ if cached_stocks:
             'מניה': symbol,
             'טווח תאריכים': info['date_range'] or 'לא זמין',
             'מספר ימים': info['total_days'],
-            'מספר קבצים': len(info['files'])
+            'גודל (KB)': round(info['size'] / 1024, 1)
         })
     
     if stocks_data:
@@ -271,24 +154,9 @@ if cached_stocks:
     )
     
     if selected_stock:
-        cache_dir = "data_cache"
-        
-        # מציאת הקובץ האחרון של המניה
-        stock_files = []
-        for filename in os.listdir(cache_dir):
-            if filename.startswith(f"{selected_stock}_") and filename.endswith('.pkl'):
-                filepath = os.path.join(cache_dir, filename)
-                file_mtime = os.path.getmtime(filepath)
-                stock_files.append((filename, filepath, file_mtime))
-        
-        if stock_files:
-            # מיון לפי תאריך עדכון - הקובץ האחרון ראשון
-            stock_files.sort(key=lambda x: x[2], reverse=True)
-            filename, filepath, _ = stock_files[0]
-            
+        if store.has(selected_stock):
             try:
-                with open(filepath, 'rb') as f:
-                    df = pickle.load(f)
+                df = store.read(selected_stock)
                 
                 if df is not None and not df.empty:
                     # הצגת מידע כללי
@@ -444,7 +312,7 @@ if cached_stocks:
             except Exception as e:
                 st.error(f"❌ שגיאה בטעינת נתוני {selected_stock}: {str(e)}")
         else:
-            st.warning(f"⚠️ לא נמצאו קבצים עבור {selected_stock}")
+            st.warning(f"⚠️ לא נמצאו נתונים עבור {selected_stock}")
 
 st.markdown("---")
 
@@ -483,22 +351,12 @@ if st.session_state.data_loaded and st.session_state.stock_data is not None:
         all_data = []
         for symbol in selected_symbols_table[:20]:  # הגבל ל-20 מניות
             # טען נתונים
-            cache_dir = "data_cache"
-            if os.path.exists(cache_dir):
-                symbol_files = [f for f in os.listdir(cache_dir) 
-                              if f.startswith(f"{symbol}_") and f.endswith('.pkl')]
-                
-                if symbol_files:
-                    # מיון לפי תאריך שינוי - הקובץ האחרון
-                    symbol_files.sort(key=lambda f: os.path.getmtime(
-                        os.path.join(cache_dir, f)), reverse=True)
-                    
-                    with open(os.path.join(cache_dir, symbol_files[0]), 'rb') as f:
-                        df_stock = pickle.load(f)
-                    
-                    # הוסף עמודת Symbol
-                    df_stock['Symbol'] = symbol
-                    all_data.append(df_stock)
+            df_stock = store.read(symbol)
+            
+            if df_stock is not None:
+                # הוסף עמודת Symbol
+                df_stock['Symbol'] = symbol
+                all_data.append(df_stock)
         
         if all_data:
             combined = pd.concat(all_data)
@@ -604,10 +462,15 @@ with col2:
             status_text.text(f"📥 מוריד נתונים עבור {len(symbols)} מניות...")
             progress_bar.progress(30)
             
+            def report_progress(done, total, symbol):
+                progress_bar.progress(30 + int(60 * done / total))
+                status_text.text(f"📥 מוריד נתונים... {done}/{total} ({symbol})")
+            
             stock_data = fetcher.download_multiple_stocks(
                 symbols,
                 start_date=start_date.strftime("%Y-%m-%d"),
-                end_date=end_date.strftime("%Y-%m-%d")
+                end_date=end_date.strftime("%Y-%m-%d"),
+                progress_callback=report_progress
             )
             
             if stock_data is None or stock_data.empty:
@@ -657,7 +520,7 @@ with col1:
         min_value=1,
         max_value=365,
         value=30,
-        help="מספר הימים האחרונים לעדכון"
+        help="מספר הימים שלפני הבר האחרון שנבדקים מחדש (פיצולים / דיבידנדים)"
     )
 
 with col2:
@@ -673,27 +536,15 @@ with col2:
             status_text = st.empty()
             
             try:
-                from datetime import timedelta
-                end_date = datetime.now()
-                start_date = datetime.now() - timedelta(days=update_days)
-                
                 status_text.text(f"🔄 מעדכן {len(cached_stocks)} מניות...")
                 
-                updated_count = 0
-                for i, symbol in enumerate(cached_stocks):
-                    progress_bar.progress((i + 1) / len(cached_stocks))
-                    
-                    try:
-                        df = fetcher.download_stock_data(
-                            symbol,
-                            start_date=start_date.strftime("%Y-%m-%d"),
-                            end_date=end_date.strftime("%Y-%m-%d"),
-                            use_cache=False
-                        )
-                        if df is not None and not df.empty:
-                            updated_count += 1
-                    except:
-                        pass
+                # רק הברים החדשים של כל מניה; הימים האחרונים נבדקים מחדש לזיהוי פיצולים / דיבידנדים
+                stats = fetcher.update_incremental(
+                    cached_stocks,
+                    overlap_days=update_days,
+                    progress_callback=lambda done, total, symbol: progress_bar.progress(done / total)
+                )
+                updated_count = len(cached_stocks) - len(stats['failed'])
                 
                 st.success(f"✅ עודכנו {updated_count} מתוך {len(cached_stocks)} מניות")
                 st.rerun()
@@ -802,20 +653,16 @@ with tab2:
         
         if selected_to_remove:
             if st.button("🗑️ הסר מניות נבחרות", use_container_width=True, type="primary"):
-                cache_dir = "data_cache"
                 removed_count = 0
                 
-                if os.path.exists(cache_dir):
-                    for symbol in selected_to_remove:
-                        for filename in os.listdir(cache_dir):
-                            if filename.startswith(f"{symbol}_") and filename.endswith('.pkl'):
-                                try:
-                                    os.remove(os.path.join(cache_dir, filename))
-                                    removed_count += 1
-                                except:
-                                    pass
+                for symbol in selected_to_remove:
+                    try:
+                        if store.remove(symbol):
+                            removed_count += 1
+                    except:
+                        pass
                 
-                st.success(f"✅ הוסרו {removed_count} קבצים עבור {len(selected_to_remove)} מניות")
+                st.success(f"✅ הוסרו {removed_count} מניות מתוך {len(selected_to_remove)} שנבחרו")
                 st.rerun()
     else:
         st.info("ℹ️ אין מניות במאגר להסרה")
@@ -831,28 +678,19 @@ st.markdown("""
 
 col1, col2, col3 = st.columns(3)
 
+# הגדלים נקראים מאינדקס המאגר ולא מסריקת התיקייה
+cache_index = store.index()
+
 with col1:
-    cache_dir = "data_cache"
-    if os.path.exists(cache_dir):
-        try:
-            cache_files = [f for f in os.listdir(cache_dir) if f.endswith('.pkl')]
-            st.metric("מספר קבצים", len(cache_files))
-        except:
-            st.metric("מספר קבצים", 0)
-    else:
-        st.metric("מספר קבצים", 0)
+    st.metric("מספר מניות", len(cache_index))
 
 with col2:
-    cache_dir = "data_cache"
-    if os.path.exists(cache_dir):
-        try:
-            cache_files = [f for f in os.listdir(cache_dir) if f.endswith('.pkl')]
-            cache_size = sum(os.path.getsize(os.path.join(cache_dir, f)) for f in cache_files) / (1024 * 1024)
-            st.metric("גודל קאש", f"{cache_size:.2f} MB")
-        except:
-            st.metric("גודל קאש", "0 MB")
-    else:
-        st.metric("גודל קאש", "0 MB")
+    cache_size = sum(entry['bytes'] for entry in cache_index.values()) / (1024 * 1024)
+    st.metric("גודל קאש", f"{cache_size:.2f} MB")
+    
+    if st.button("🧹 דחוס קאש", use_container_width=True):
+        stats = DataFetcher().compact_cache()
+        st.success(f"✅ נמחקו {stats['removed_files']} קבצים מיותרים ({stats['freed_bytes'] / (1024 * 1024):.2f} MB)")
 
 with col3:
     if st.button("🗑️ נקה כל הקאש", use_container_width=True):
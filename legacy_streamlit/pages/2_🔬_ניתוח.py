@@ -5,11 +5,11 @@
 import streamlit as st
 import pandas as pd
 import os
-import pickle
 import time
 from datetime import datetime
 from correlation_engine import CorrelationEngine
 from data_fetcher import DataFetcher
+from price_store import PriceStore
 from utils import load_css, initialize_session_state
 
 # טעינת CSS
@@ -18,6 +18,9 @@ load_css()
 # אתחול session state
 initialize_session_state()
 
+# מאגר המחירים (Parquet לכל מניה)
+store = PriceStore(os.path.join("data_cache", "prices"))
+
 # כותרת עמוד
 st.markdown("""
 <div style='direction: rtl; text-align: right;'>
@@ -27,110 +30,21 @@ st.markdown("""
 
 def get_cached_stocks():
     """קבלת רשימת כל המניות שנמצאות בקאש"""
-    cache_dir = "data_cache"
-    stocks = []
-    
-    if not os.path.exists(cache_dir):
-        return []
-    
-    for filename in os.listdir(cache_dir):
-        if filename.endswith('.pkl') and not filename.startswith('SPY'):
-            # חילוץ שם המניה מהקובץ (פורמט: SYMBOL_startdate_enddate.pkl)
-            symbol = filename.split('_')[0]
-            if symbol not in stocks:
-                stocks.append(symbol)
-    
-    return sorted(stocks)
+    return [symbol for symbol in store.symbols() if symbol != 'SPY']
 
 def load_data_from_cache():
-    """טעינת נתונים מהקאש"""
-    cache_dir = "data_cache"
-    
-    if not os.path.exists(cache_dir):
-        return None, []
-    
-    # קבלת כל המניות בקאש
+    """טעינת נתונים מהקאש - סריקה אחת על מאגר המחירים"""
     symbols = get_cached_stocks()
     
     if not symbols:
         return None, []
     
-    # ארגון קבצים לפי symbol - נקח את הקובץ האחרון לכל symbol
-    symbol_files = {}
-    for symbol in symbols:
-        symbol_files[symbol] = []
-        for filename in os.listdir(cache_dir):
-            if filename.startswith(f"{symbol}_") and filename.endswith('.pkl'):
-                filepath = os.path.join(cache_dir, filename)
-                file_mtime = os.path.getmtime(filepath)
-                symbol_files[symbol].append((filename, filepath, file_mtime))
-        
-        # מיון לפי תאריך עדכון - הקובץ האחרון ראשון
-        symbol_files[symbol].sort(key=lambda x: x[2], reverse=True)
-    
-    if not any(symbol_files.values()):
-        return None, []
-    
-    # טעינת נתונים - נקח את הקובץ האחרון לכל symbol
-    all_data = {}
-    loaded_symbols = []
+    combined_df = store.load(symbols, ['Close', 'Adj Close', 'Volume'])
     
-    for symbol, files_list in symbol_files.items():
-        if not files_list:
-            continue
-        
-        # נקח את הקובץ האחרון
-        filename, filepath, _ = files_list[0]
-        
-        try:
-            with open(filepath, 'rb') as f:
-                df = pickle.load(f)
-            
-            if df is not None and not df.empty:
-                # בדיקת עמודות זמינות
-                available_columns = df.columns.tolist()
-                
-                # מיפוי שמות עמודות
-                column_mapping = {
-                    'Close': ['Close', 'close', 'CLOSE'],
-                    'Adj Close': ['Adj Close', 'AdjClose', 'Adj_Close', 'adj close', 'ADJ CLOSE'],
-                    'Volume': ['Volume', 'volume', 'VOLUME', 'vol']
-                }
-                
-                def find_column(possible_names):
-                    for col_name in possible_names:
-                        if col_name in available_columns:
-                            return col_name
-                    return None
-                
-                # טעינת Close
-                close_col = find_column(column_mapping['Close'])
-                if close_col:
-                    all_data[(symbol, 'Close')] = df[close_col]
-                    
-                    # טעינת Adj Close (או Close אם אין)
-                    adj_close_col = find_column(column_mapping['Adj Close'])
-                    if adj_close_col:
-                        all_data[(symbol, 'Adj Close')] = df[adj_close_col]
-                    else:
-                        all_data[(symbol, 'Adj Close')] = df[close_col]
-                    
-                    # טעינת Volume (או 0 אם אין)
-                    volume_col = find_column(column_mapping['Volume'])
-                    if volume_col:
-                        all_data[(symbol, 'Volume')] = df[volume_col]
-                    else:
-                        all_data[(symbol, 'Volume')] = pd.Series(0, index=df.index)
-                    
-                    loaded_symbols.append(symbol)
-        except Exception as e:
-            continue
-    
-    if not all_data:
+    if combined_df.empty:
         return None, []
     
-    # יצירת DataFrame משולב
-    combined_df = pd.DataFrame(all_data)
+    loaded_symbols = list(dict.fromkeys(combined_df.columns.get_level_values(0)))
     return combined_df, loaded_symbols
 
 # בדיקת נתונים
@@ -396,29 +310,11 @@ with col2:
             status_text.text("📊 שלב 3/3: משלב קורלציות...")
             combine_start = time.time()
             
-            # יצירת מטריצה משולבת לפי calc_mode
-            if params['calc_mode'] == 1:
-                # רק מחיר
-                combined_matrix = price_matrix.copy()
-            elif params['calc_mode'] == 2:
-                # רק נפח
-                combined_matrix = volume_matrix.copy()
-            elif params['calc_mode'] == 3:
-                # משולב - מכפלה רק אם שתיהן חיוביות
-                combined_matrix = pd.DataFrame(
-                    index=price_matrix.index,
-                    columns=price_matrix.columns
-                )
-                
-                for i in price_matrix.index:
-                    for j in price_matrix.columns:
-                        price_corr = price_matrix.loc[i, j]
-                        volume_corr = volume_matrix.loc[i, j]
-                        
-                        if price_corr > 0 and volume_corr > 0:
-                            combined_matrix.loc[i, j] = price_corr * volume_corr
-                        else:
-                            combined_matrix.loc[i, j] = 0
+            # יצירת מטריצה משולבת לפי calc_mode (מחיר / נפח / מכפלה רק אם שתיהן חיוביות)
+            combined_matrix = engine.combine_correlations(price_matrix, volume_matrix)
+            if params['calc_mode'] == 3:
+                # בדף הזה זוג בלי קורלציה (NaN) נחשב לא חיובי ומקבל 0
+                combined_matrix = combined_matrix.fillna(0)
             
             combine_time = time.time() - combine_start
             
@@ -438,14 +334,16 @@ with col2:
                 price_rolling = engine.calculate_rolling_correlation_over_time(
                     st.session_state.stock_data,
                     field='Adj Close',
-                    window=rolling_window
+                    window=rolling_window,
+                    as_tensor=True
                 )
                 
                 # חישוב rolling correlations לנפח
                 volume_rolling = engine.calculate_rolling_correlation_over_time(
                     st.session_state.stock_data,
                     field='Volume',
-                    window=rolling_window
+                    window=rolling_window,
+                    as_tensor=True
                 )
                 
                 rolling_time = time.time() - rolling_start
@@ -479,7 +479,7 @@ with tab5:
         
         col1, col2 = st.columns(2)
         
-        available_stocks = list(price_rolling.keys())
+        available_stocks = price_rolling['symbols']
         
         with col1:
             stock1 = st.selectbox(
@@ -497,9 +497,9 @@ with tab5:
         
         if stock1 and stock2 and stock1 != stock2:
             # חילוץ הקורלציות לאורך זמן
-            if stock2 in price_rolling[stock1].columns:
-                price_corr_series = price_rolling[stock1][stock2]
-                volume_corr_series = volume_rolling[stock1][stock2]
+            if stock1 in volume_rolling['symbols'] and stock2 in volume_rolling['symbols']:
+                price_corr_series = engine.get_pair_correlation_series(price_rolling, stock1, stock2)
+                volume_corr_series = engine.get_pair_correlation_series(volume_rolling, stock1, stock2)
                 
                 # הצגה
                 st.markdown(f"### קורלציות {stock1} ↔ {stock2} לאורך זמן")
@@ -595,7 +595,7 @@ with tab5:
         st.markdown("### בחר תאריך לראות קורלציות גבוהות באותו יום")
         
         # בחירת תאריך
-        available_dates = sorted(list(price_rolling[available_stocks[0]].index))
+        available_dates = sorted(list(price_rolling['dates']))
         
         selected_date = st.selectbox(
             "בחר תאריך",
@@ -607,32 +607,28 @@ with tab5:
         if selected_date:
             st.markdown(f"### קורלציות גבוהות ב-{selected_date.strftime('%Y-%m-%d')}")
             
-            # חילוץ כל הקורלציות לתאריך זה
-            correlations_on_date = []
+            # חילוץ כל הקורלציות לתאריך זה - שורה אחת של ה-tensor (כל זוג פעם אחת)
+            price_on_date = engine.get_correlations_at_date(price_rolling, selected_date)
+            volume_on_date = engine.get_correlations_at_date(volume_rolling, selected_date)
             
-            for stock_a in available_stocks:
-                for stock_b in available_stocks:
-                    if stock_a < stock_b:  # למנוע כפילויות
-                        if stock_b in price_rolling[stock_a].columns:
-                            price_corr = price_rolling[stock_a][stock_b].loc[selected_date]
-                            volume_corr = volume_rolling[stock_a][stock_b].loc[selected_date]
-                            
-                            # חישוב קורלציה משולבת
-                            if price_corr > 0 and volume_corr > 0:
-                                combined_corr = price_corr * volume_corr
-                            else:
-                                combined_corr = 0
-                            
-                            correlations_on_date.append({
-                                'מניה 1': stock_a,
-                                'מניה 2': stock_b,
-                                'קורלציית מחיר': price_corr,
-                                'קורלציית נפח': volume_corr,
-                                'קורלציה משולבת': combined_corr
-                            })
+            price_values = price_on_date.to_numpy(dtype=np.float64)
+            volume_values = volume_on_date.to_numpy(dtype=np.float64)
+            
+            # חישוב קורלציה משולבת - מכפלה רק אם שתיהן חיוביות
+            combined_values = np.where(
+                (price_values > 0) & (volume_values > 0),
+                price_values * volume_values,
+                0.0
+            )
             
             # יצירת DataFrame
-            df_date = pd.DataFrame(correlations_on_date)
+            df_date = pd.DataFrame({
+                'מניה 1': price_on_date.index.get_level_values(0),
+                'מניה 2': price_on_date.index.get_level_values(1),
+                'קורלציית מחיר': price_values,
+                'קורלציית נפח': volume_values,
+                'קורלציה משולבת': combined_values
+            })
             df_date = df_date.sort_values('קורלציה משולבת', ascending=False)
             
             # עיגול
@@ -78,7 +78,7 @@ project/
 │   └── 4_⚙️_טכני.py          # מערך טכני
 │
 ├── data_cache/                # קאש של נתונים
-│   └── *.pkl                  # קבצי נתונים מוטמנים
+│   └── prices/symbol=*/       # מאגר מחירים (Parquet לכל מניה)
 │
 └── daily_results/             # תוצאות יומיות
     ├── opportunities_*.json
@@ -152,7 +152,7 @@ col1, col2 = st.columns(2)
 with col1:
     st.subheader("מנגנוני אופטימיזציה")
     st.write("""
-    - **קאש:** שמירת נתונים ב-pickle
+    - **קאש:** מאגר מחירים עמודתי ב-Parquet
     - **Parallel Processing:** הורדה מקבילית של מניות
     - **Vectorization:** שימוש ב-numpy/pandas
     - **Lazy Loading:** טעינת נתונים רק כשצריך
@@ -5,16 +5,23 @@ Backtesting Engine - בדיקת דיוק המערכת על נתונים היסט
 import sys
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import numpy as np
 import pandas as pd
 import logging
 
 # הוספת נתיב למודולים
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from price_store import PriceStore
 from .db_client import SupabaseClient
-from .config import COMPUTATION_PARAMS
-from .utils import calculate_similarity
+from .config import COMPUTATION_PARAMS, PATHS
+from .forward_returns import ForwardReturnMatrix
+from .trading_calendar import TradingCalendar
+from .similarity_index import SimilarityIndex
+from .pattern_index import PatternIndex
+from .pre_compute import PreComputeEngine
+from .utils import calculate_similarity, calculate_correlation_matrix_for_date, calculate_forward_returns
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,36 +35,239 @@ class BacktestEngine:
     מנוע Backtesting לבדיקת דיוק המערכת
     """
     
-    def __init__(self):
-        """אתחול"""
-        self.db_client = SupabaseClient()
+    # מספר ה-snapshots ההיסטוריים שנשקלים בכל חיזוי (כמו ה-limit בשאילתת ה-DB)
+    HISTORY_LIMIT = 1000
+    
+    def __init__(self, connect: bool = True):
+        """
+        אתחול
+        
+        Args:
+            connect: False = בלי DB (Backtest מקומי ממאגר המחירים)
+        """
+        self.db_client = SupabaseClient() if connect else None
         self.params = COMPUTATION_PARAMS
+        self.forward_returns: Optional[ForwardReturnMatrix] = None
+        self.similarity_indexes: Dict[str, SimilarityIndex] = {}
+        self.pattern_index: Optional[PatternIndex] = None
+    
+    def load_similarity_index(self,
+                              stock_symbol: str,
+                              start_date: str,
+                              end_date: str,
+                              lookback_days: int = 15,
+                              correlation_threshold: float = 0.85,
+                              forward_days: int = 15) -> Optional[SimilarityIndex]:
+        """
+        טעינת ה-snapshots של מניה פעם אחת לכל ה-backtest ובניית אינדקס דמיון
+        
+        נטענים כל ה-snapshots עד end_date, כולל HISTORY_LIMIT לפני start_date, כך
+        שכל חיזוי בטווח רואה את אותו חלון כמו בשאילתה ל-DB. רק ה-snapshots של שילוב
+        הפרמטרים הנבדק - אחרי סריקת פרמטרים יש ב-DB כמה שילובים לכל (מניה, תאריך).
+        
+        Args:
+            stock_symbol: סימול המניה
+            start_date: תאריך התחלה (YYYY-MM-DD)
+            end_date: תאריך סיום (YYYY-MM-DD)
+            lookback_days: ימים אחורה
+            correlation_threshold: סף קורלציה
+            forward_days: ימים קדימה
+            
+        Returns:
+            SimilarityIndex (שורות ממוינות לפי תאריך) או None
+        """
+        days = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+        snapshots = self.db_client.get_correlation_snapshots(
+            stock_symbol=stock_symbol,
+            end_date=end_date,
+            limit=days + self.HISTORY_LIMIT,
+            lookback_days=lookback_days,
+            forward_days=forward_days,
+            correlation_threshold=correlation_threshold
+        )
+        
+        if not snapshots:
+            return None
+        
+        # מהישן לחדש (סדר יציב בתוך אותו תאריך)
+        snapshots = sorted(reversed(snapshots), key=lambda s: s['snapshot_date'])
+        index = SimilarityIndex.from_snapshots(snapshots)
+        self.similarity_indexes[stock_symbol] = index
+        
+        return index
+    
+    def _predict_from_index(self,
+                            index: SimilarityIndex,
+                            date_str: str,
+                            min_similarity: float = 0.7) -> Optional[Dict[str, Any]]:
+        """
+        חיזוי מאינדקס הדמיון - אותה לוגיקה כמו get_prediction_for_date מול ה-DB
+        """
+        dates = index.snapshot_dates
+        current_end = int(np.searchsorted(dates, date_str, side='right'))
+        history_end = int(np.searchsorted(dates, date_str, side='left'))
+        
+        if current_end == history_end:
+            return None
+        
+        # ה-snapshot של התאריך, והחלון של HISTORY_LIMIT השורות האחרונות עד התאריך (כולל)
+        return self._predict_row(
+            index, current_end - 1,
+            max(0, current_end - self.HISTORY_LIMIT), history_end, min_similarity
+        )
+    
+    def _predict_row(self,
+                     index: SimilarityIndex,
+                     row: int,
+                     history_start: int,
+                     history_end: int,
+                     min_similarity: float = 0.7) -> Optional[Dict[str, Any]]:
+        """
+        חיזוי ל-snapshot בשורה row מהמקרים הדומים בשורות [history_start, history_end)
+        """
+        current_matches = index.matched_stocks(row)
+        if not current_matches:
+            return None
+        
+        rows, similarities = index.query(current_matches, min_similarity, history_start, history_end)
+        
+        return self._prediction_from_returns(index.future_returns[rows])
+    
+    def _predict_from_pattern_index(self,
+                                    stock_symbol: str,
+                                    date_str: str,
+                                    min_similarity: float = 0.7) -> Optional[Dict[str, Any]]:
+        """
+        חיזוי מאינדקס ה-MinHash/LSH - מקרים דומים מכל ההיסטוריה שלפני התאריך
+        """
+        current_matches = self.pattern_index.matched_stocks(stock_symbol, date_str)
+        if not current_matches:
+            return None
+        
+        similar_cases = self.pattern_index.query(
+            stock_symbol, current_matches,
+            top_k=None, before_date=date_str, min_similarity=min_similarity
+        )
+        
+        return self._prediction_from_returns(np.array(
+            [c['future_return'] for c in similar_cases if c['future_return'] is not None],
+            dtype=np.float64
+        ))
+    
+    def _prediction_from_returns(self, returns: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        חיזוי מהתשואות של המקרים הדומים (NaN = לא ידועה)
+        """
+        returns = returns[~np.isnan(returns)]
+        
+        if len(returns) == 0:
+            return None
+        
+        avg_return = float(returns.mean())
+        up_count = int((returns > 0).sum())
+        confidence = max(up_count, len(returns) - up_count) / len(returns) * 100
+        
+        direction = 'up' if avg_return > 0 else 'down' if avg_return < 0 else 'neutral'
+        
+        return {
+            'predicted_direction': direction,
+            'predicted_return': avg_return,
+            'confidence': confidence,
+            'similar_cases': len(returns)
+        }
+    
+    def load_forward_returns(self, stock_symbols: List[str], forward_days: int = 15) -> Optional[ForwardReturnMatrix]:
+        """
+        טעינת מטריצת התשואות העתידיות מהקאש שליד מאגר המחירים (נבנית אם חסרה)
+        
+        Args:
+            stock_symbols: רשימת מניות
+            forward_days: ימים קדימה
+            
+        Returns:
+            ForwardReturnMatrix או None (אז התוצאות נשלפות מה-DB)
+        """
+        try:
+            store = PriceStore(os.path.join(PATHS['data_cache'], "prices"))
+            self.forward_returns = ForwardReturnMatrix.from_store(store, stock_symbols, forward_days)
+            if not self.forward_returns.symbols:
+                logger.warning("⚠️ אין מחירים במאגר למניות האלה, משתמש ב-DB")
+                self.forward_returns = None
+                return None
+            logger.info(f"📦 מטריצת תשואות: {len(self.forward_returns.dates)} תאריכים × {len(self.forward_returns.symbols)} מניות")
+        except Exception as e:
+            logger.warning(f"⚠️ לא ניתן לטעון מטריצת תשואות, משתמש ב-DB: {e}")
+            self.forward_returns = None
+        
+        return self.forward_returns
+    
+    def trading_calendar(self, stock_symbol: str) -> Optional[TradingCalendar]:
+        """
+        לוח ימי המסחר לבדיקת מניה - אותם ימים כמו ב-run_offline_backtest
+        
+        הלוח של מטריצת התשואות (ימי המסחר במאגר המחירים, כמו source='store'), ובלי
+        מאגר - תאריכי ה-snapshots של המניה באינדקס שנטען (כמו source='db').
+        
+        Args:
+            stock_symbol: סימול המניה
+            
+        Returns:
+            TradingCalendar או None אם אין ימי מסחר
+        """
+        if self.forward_returns is not None:
+            return self.forward_returns.calendar
+        
+        if self.pattern_index is not None:
+            dates = self.pattern_index.snapshot_dates(stock_symbol)
+        else:
+            index = self.similarity_indexes.get(stock_symbol)
+            dates = np.empty(0, dtype='U10') if index is None else index.snapshot_dates
+        
+        if len(dates) == 0:
+            return None
+        return TradingCalendar(pd.DatetimeIndex(np.unique(dates)))
     
     def get_prediction_for_date(self,
                                 stock_symbol: str,
                                 date: datetime,
                                 lookback_days: int = 15,
-                                correlation_threshold: float = 0.85) -> Dict[str, Any]:
+                                correlation_threshold: float = 0.85,
+                                forward_days: int = 15) -> Dict[str, Any]:
         """
         קבלת חיזוי לתאריך ספציפי
         
+        עם אינדקס MinHash/LSH (full_history) - חיפוש בכל ההיסטוריה. אם נטען אינדקס דמיון
+        למניה (load_similarity_index) - החיפוש נעשה בו, אחרת מול ה-DB.
+        
         Args:
             stock_symbol: סימול המניה
             date: תאריך לחיזוי
             lookback_days: ימים אחורה
             correlation_threshold: סף קורלציה
+            forward_days: ימים קדימה
             
         Returns:
             Dict עם חיזוי או None
         """
         try:
-            # שליפת snapshot נוכחי
             date_str = date.strftime('%Y-%m-%d')
+            
+            if self.pattern_index is not None:
+                return self._predict_from_pattern_index(stock_symbol, date_str)
+            
+            index = self.similarity_indexes.get(stock_symbol)
+            if index is not None:
+                return self._predict_from_index(index, date_str)
+            
+            # שליפת snapshot נוכחי
             snapshots = self.db_client.get_correlation_snapshots(
                 stock_symbol=stock_symbol,
                 start_date=date_str,
                 end_date=date_str,
-                limit=1
+                limit=1,
+                lookback_days=lookback_days,
+                forward_days=forward_days,
+                correlation_threshold=correlation_threshold
             )
             
             if not snapshots:
@@ -73,7 +283,10 @@ class BacktestEngine:
             historical_snapshots = self.db_client.get_correlation_snapshots(
                 stock_symbol=stock_symbol,
                 end_date=date_str,
-                limit=1000
+                limit=self.HISTORY_LIMIT,
+                lookback_days=lookback_days,
+                forward_days=forward_days,
+                correlation_threshold=correlation_threshold
             )
             
             # חישוב דמיון
@@ -117,26 +330,49 @@ class BacktestEngine:
     def get_actual_outcome(self,
                           stock_symbol: str,
                           date: datetime,
-                          forward_days: int = 15) -> Dict[str, Any]:
+                          forward_days: int = 15,
+                          lookback_days: int = 15,
+                          correlation_threshold: float = 0.85) -> Dict[str, Any]:
         """
         קבלת תוצאה בפועל
         
+        אם נטענה מטריצת תשואות לאותו forward_days והמניה בה - שליפה ממנה, אחרת מה-snapshot ב-DB.
+        
         Args:
             stock_symbol: סימול המניה
             date: תאריך התחלה
             forward_days: ימים קדימה
+            lookback_days: ימים אחורה (שילוב הפרמטרים של ה-snapshot ב-DB)
+            correlation_threshold: סף קורלציה (שילוב הפרמטרים של ה-snapshot ב-DB)
             
         Returns:
             Dict עם תוצאה בפועל
         """
         try:
+            matrix = self.forward_returns
+            if matrix is not None and matrix.forward_days == forward_days and stock_symbol in matrix.symbols:
+                future_return, movement_type = matrix.get(stock_symbol, date)
+                if future_return is None:
+                    return None
+                
+                direction = 'up' if future_return > 0 else 'down' if future_return < 0 else 'neutral'
+                
+                return {
+                    'actual_direction': direction,
+                    'actual_return': future_return,
+                    'movement_type': movement_type
+                }
+            
             future_date = (date + timedelta(days=forward_days)).strftime('%Y-%m-%d')
             
             snapshots = self.db_client.get_correlation_snapshots(
                 stock_symbol=stock_symbol,
                 start_date=date.strftime('%Y-%m-%d'),
                 end_date=date.strftime('%Y-%m-%d'),
-                limit=1
+                limit=1,
+                lookback_days=lookback_days,
+                forward_days=forward_days,
+                correlation_threshold=correlation_threshold
             )
             
             if not snapshots:
@@ -184,7 +420,8 @@ class BacktestEngine:
                     end_date: str,
                     lookback_days: int = 15,
                     correlation_threshold: float = 0.85,
-                    forward_days: int = 15) -> Dict[str, Any]:
+                    forward_days: int = 15,
+                    full_history: bool = False) -> Dict[str, Any]:
         """
         הרצת Backtest
         
@@ -195,6 +432,8 @@ class BacktestEngine:
             lookback_days: ימים אחורה
             correlation_threshold: סף קורלציה
             forward_days: ימים קדימה
+            full_history: חיפוש מקרים דומים בכל ההיסטוריה (אינדקס MinHash/LSH מקומי)
+                במקום ב-1000 ה-snapshots האחרונים
             
         Returns:
             Dict עם תוצאות Backtest
@@ -204,33 +443,47 @@ class BacktestEngine:
         
         results = []
         
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        
-        # יצירת רשימת תאריכים (כל יום)
-        current = start
-        dates = []
-        while current <= end:
-            dates.append(current)
-            current += timedelta(days=1)
+        # תוצאות בפועל ממטריצה אחת במקום שאילתה לכל (מניה, תאריך)
+        self.load_forward_returns(stock_symbols, forward_days)
         
-        logger.info(f"   {len(dates)} תאריכים לבדיקה")
+        if full_history:
+            self.pattern_index = PatternIndex(params={
+                'lookback_days': lookback_days,
+                'forward_days': forward_days,
+                'correlation_threshold': correlation_threshold,
+                'window_type': self.params['window_type']
+            })
+            logger.info(f"🔎 חיפוש בכל ההיסטוריה מאינדקס LSH ({self.pattern_index.index_dir})")
         
         for stock_symbol in stock_symbols:
             logger.info(f"📊 בודק {stock_symbol}...")
             
+            # snapshots של המניה נטענים פעם אחת במקום שתי שאילתות לכל תאריך
+            if not full_history:
+                self.load_similarity_index(
+                    stock_symbol, start_date, end_date, lookback_days, correlation_threshold, forward_days
+                )
+            
+            # רק ימי מסחר - אותם תאריכים כמו ב-Backtest המקומי
+            calendar = self.trading_calendar(stock_symbol)
+            positions = calendar.between(start_date, end_date) if calendar is not None else []
+            dates = [calendar.date(pos).to_pydatetime() for pos in positions]
+            logger.info(f"   {len(dates)} ימי מסחר לבדיקה")
+            
             for date in dates:
                 try:
                     # חיזוי
                     prediction = self.get_prediction_for_date(
-                        stock_symbol, date, lookback_days, correlation_threshold
+                        stock_symbol, date, lookback_days, correlation_threshold, forward_days
                     )
                     
                     if not prediction:
                         continue
                     
                     # תוצאה בפועל
-                    actual = self.get_actual_outcome(stock_symbol, date, forward_days)
+                    actual = self.get_actual_outcome(
+                        stock_symbol, date, forward_days, lookback_days, correlation_threshold
+                    )
                     
                     if not actual:
                         continue
@@ -252,8 +505,201 @@ class BacktestEngine:
                 except Exception as e:
                     logger.warning(f"⚠️ שגיאה בבדיקה עבור {stock_symbol} ב-{date}: {e}")
                     continue
+            
+            self.similarity_indexes.pop(stock_symbol, None)
+        
+        return self._summarize(results)
+    
+    def load_snapshot_arrays(self,
+                             stock_symbols: List[str],
+                             start_date: str,
+                             end_date: str,
+                             lookback_days: int = 15,
+                             correlation_threshold: float = 0.85,
+                             forward_days: int = 15) -> Optional[SimilarityIndex]:
+        """
+        חישוב ה-snapshots ממאגר המחירים ישירות למערכים עמודתיים (בלי DB ובלי dicts)
+        
+        אותה סמנטיקה כמו ה-snapshots של Pre-Computation: התאמה = קורלציית מחיר או נפח
+        ≥ הסף, corr_price של קורלציה לא מוגדרת = 0.0, והתשואה מ-calculate_forward_returns.
+        השורות ממוינות לפי מניה ואז תאריך: מניה i היא השורות [i * D, (i + 1) * D),
+        כאשר D = מספר ימי המסחר שנטענו, החל מה-lookback_days הראשון ועד end_date.
+        
+        Args:
+            stock_symbols: רשימת מניות (היקום של רשימות ההתאמות)
+            start_date: תאריך התחלה (YYYY-MM-DD) - נטענים גם HISTORY_LIMIT ימי מסחר לפניו
+            end_date: תאריך סיום (YYYY-MM-DD)
+            lookback_days: ימים אחורה
+            correlation_threshold: סף קורלציה
+            forward_days: ימים קדימה
+            
+        Returns:
+            SimilarityIndex (universe = המניות שנטענו) או None
+        """
+        # HISTORY_LIMIT + lookback_days ימי מסחר לפני start_date (~252 בשנה + מרווח לחגים)
+        history_start = datetime.strptime(start_date, '%Y-%m-%d') - timedelta(
+            days=int((self.HISTORY_LIMIT + lookback_days) * 365 / 252) + 30
+        )
+        store = PriceStore(os.path.join(PATHS['data_cache'], "prices"))
+        stock_data = store.load(stock_symbols, ['Adj Close', 'Volume'], start_date=history_start.strftime('%Y-%m-%d'))
+        if stock_data.empty:
+            return None
+        
+        pre_compute = PreComputeEngine(connect=False)
+        
+        loaded = set(stock_data.columns.get_level_values(0))
+        symbols = [s for s in stock_symbols if s in loaded]
+        panels = pre_compute.build_correlation_panels(stock_data, symbols)
+        
+        columns = pd.MultiIndex.from_tuples([(symbol, 'Adj Close') for symbol in symbols])
+        prices = stock_data.reindex(columns=columns).to_numpy(dtype=np.float64)
+        future_returns = calculate_forward_returns(prices, forward_days)
+        
+        last = int(np.searchsorted(stock_data.index.values, np.datetime64(pd.Timestamp(end_date)), side='right'))
+        positions = np.arange(lookback_days - 1, last)
+        num_stocks = len(symbols)
+        logger.info(f"🧮 מחשב snapshots ל-{len(positions)} ימי מסחר × {num_stocks} מניות...")
+        
+        # CSR לפי תאריך ואז מניה
+        counts = np.zeros((len(positions), num_stocks), dtype=np.int64)
+        cols_by_date = []
+        corrs_by_date = []
+        for d, date_idx in enumerate(positions.tolist()):
+            corr_price = calculate_correlation_matrix_for_date(panels['Adj Close'], date_idx, lookback_days)
+            if corr_price is None:
+                cols_by_date.append(np.empty(0, dtype=np.int64))
+                corrs_by_date.append(np.empty(0))
+                continue
+            corr_volume = calculate_correlation_matrix_for_date(panels['Volume'], date_idx, lookback_days)
+            
+            rows, cols = np.nonzero((corr_price >= correlation_threshold) | (corr_volume >= correlation_threshold))
+            counts[d] = np.bincount(rows, minlength=num_stocks)
+            cols_by_date.append(cols)
+            corrs_by_date.append(np.nan_to_num(corr_price[rows, cols]))
+        
+        cols = np.concatenate(cols_by_date)
+        corrs = np.concatenate(corrs_by_date)
+        starts = np.cumsum(counts.ravel()) - counts.ravel()
+        
+        # סידור מחדש לפי מניה ואז תאריך
+        order = (np.arange(len(positions))[None, :] * num_stocks + np.arange(num_stocks)[:, None]).ravel()
+        lengths = counts.ravel()[order]
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        source = np.repeat(starts[order], lengths) + offsets
+        
+        dates = stock_data.index[positions].strftime('%Y-%m-%d').to_numpy(dtype=str)
+        return SimilarityIndex(
+            symbols,
+            np.concatenate([[0], np.cumsum(lengths)]),
+            cols[source],
+            corrs[source],
+            np.tile(dates, num_stocks),
+            future_returns[positions].T.ravel()
+        )
+    
+    def run_offline_backtest(self,
+                             stock_symbols: List[str],
+                             start_date: str,
+                             end_date: str,
+                             lookback_days: int = 15,
+                             correlation_threshold: float = 0.85,
+                             forward_days: int = 15,
+                             source: str = 'store') -> Dict[str, Any]:
+        """
+        הרצת Backtest מקומית על מערכים, רק בימי מסחר
         
-        # חישוב metrics
+        ה-snapshots נטענים פעם אחת: מחושבים ממאגר המחירים (source='store') או נשלפים
+        מה-DB בשאילתה אחת למניה (source='db'). כל חיזוי הוא שאילתה לאינדקס הדמיון על
+        HISTORY_LIMIT ה-snapshots שלפני התאריך, והתוצאה בפועל היא התשואה של ה-snapshot
+        עצמו - אותה לוגיקה כמו run_backtest, בלי שאילתות לכל יום.
+        
+        Args:
+            stock_symbols: רשימת מניות
+            start_date: תאריך התחלה
+            end_date: תאריך סיום
+            lookback_days: ימים אחורה
+            correlation_threshold: סף קורלציה
+            forward_days: ימים קדימה
+            source: 'store' או 'db'
+            
+        Returns:
+            Dict עם תוצאות Backtest
+        """
+        logger.info(f"🧪 מתחיל Backtest מקומי ({source}) עבור {len(stock_symbols)} מניות")
+        logger.info(f"   מ-{start_date} עד {end_date}")
+        
+        def stock_ranges():
+            # (מניה, אינדקס, שורה ראשונה, שורה אחרי האחרונה)
+            if source == 'store':
+                index = self.load_snapshot_arrays(
+                    stock_symbols, start_date, end_date, lookback_days, correlation_threshold, forward_days
+                )
+                if index is None:
+                    return
+                days = len(index) // len(index.universe)
+                for i, stock_symbol in enumerate(index.universe):
+                    yield stock_symbol, index, i * days, (i + 1) * days
+            elif source == 'db':
+                for stock_symbol in stock_symbols:
+                    index = self.load_similarity_index(
+                        stock_symbol, start_date, end_date, lookback_days, correlation_threshold, forward_days
+                    )
+                    self.similarity_indexes.pop(stock_symbol, None)
+                    if index is not None:
+                        yield stock_symbol, index, 0, len(index)
+            else:
+                raise ValueError(f"מקור backtest לא מוכר: {source} (אפשרויות: 'store', 'db')")
+        
+        results = []
+        
+        for stock_symbol, index, lo, hi in stock_ranges():
+            dates = index.snapshot_dates[lo:hi]
+            first = lo + int(np.searchsorted(dates, start_date, side='left'))
+            last = lo + int(np.searchsorted(dates, end_date, side='right'))
+            
+            for row in range(first, last):
+                date_str = str(index.snapshot_dates[row])
+                
+                # אותו תאריך פעמיים (DB) - ה-snapshot האחרון שלו, כמו ב-_predict_from_index
+                if row + 1 < last and index.snapshot_dates[row + 1] == date_str:
+                    continue
+                
+                actual_return = index.future_returns[row]
+                if np.isnan(actual_return):
+                    continue
+                
+                history_end = lo + int(np.searchsorted(dates, date_str, side='left'))
+                prediction = self._predict_row(
+                    index, row, max(lo, row + 1 - self.HISTORY_LIMIT), history_end
+                )
+                if not prediction:
+                    continue
+                
+                actual_direction = 'up' if actual_return > 0 else 'down' if actual_return < 0 else 'neutral'
+                
+                results.append({
+                    'stock_symbol': stock_symbol,
+                    'date': date_str,
+                    'predicted_direction': prediction['predicted_direction'],
+                    'predicted_return': prediction['predicted_return'],
+                    'actual_direction': actual_direction,
+                    'actual_return': float(actual_return),
+                    'confidence': prediction['confidence'],
+                    'correct': prediction['predicted_direction'] == actual_direction
+                })
+        
+        return self._summarize(results)
+    
+    def _summarize(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        חישוב metrics מתוצאות הבדיקות
+        
+        Args:
+            results: רשימת בדיקות (predicted_direction, actual_direction, correct)
+            
+        Returns:
+            Dict עם תוצאות Backtest
+        """
         total = len(results)
         correct = sum(1 for r in results if r['correct'])
         accuracy = (correct / total * 100) if total > 0 else 0
@@ -300,10 +746,13 @@ def main():
     parser.add_argument('--lookback-days', type=int, default=15, help='ימים אחורה')
     parser.add_argument('--correlation-threshold', type=float, default=0.85, help='סף קורלציה')
     parser.add_argument('--forward-days', type=int, default=15, help='ימים קדימה')
+    parser.add_argument('--full-history', action='store_true', help='חיפוש מקרים דומים בכל ההיסטוריה (אינדקס LSH)')
+    parser.add_argument('--offline', choices=['store', 'db'], help='Backtest מקומי על מערכים: snapshots ממאגר המחירים או מה-DB')
     
     args = parser.parse_args()
     
-    engine = BacktestEngine()
+    # Backtest מקומי ממאגר המחירים עם רשימת מניות לא צריך DB
+    engine = BacktestEngine(connect=not (args.offline == 'store' and args.stocks))
     
     # קבלת רשימת מניות
     if args.stocks:
@@ -313,14 +762,26 @@ def main():
         stock_symbols = [s['symbol'] for s in stocks_from_db]
     
     # הרצת Backtest
-    results = engine.run_backtest(
-        stock_symbols,
-        args.start_date,
-        args.end_date,
-        args.lookback_days,
-        args.correlation_threshold,
-        args.forward_days
-    )
+    if args.offline:
+        results = engine.run_offline_backtest(
+            stock_symbols,
+            args.start_date,
+            args.end_date,
+            args.lookback_days,
+            args.correlation_threshold,
+            args.forward_days,
+            args.offline
+        )
+    else:
+        results = engine.run_backtest(
+            stock_symbols,
+            args.start_date,
+            args.end_date,
+            args.lookback_days,
+            args.correlation_threshold,
+            args.forward_days,
+            args.full_history
+        )
     
     print("\n" + "="*50)
     print("תוצאות Backtest:")
@@ -0,0 +1,123 @@
+"""
+יומן checkpoints לריצות Pre-Computation - המשך ריצה שנקטעה מהנקודה שבה עצרה
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set
+
+from .utils import hash_params
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotJournal:
+    """
+    יומן append-only (JSON lines) של יחידות עבודה שהושלמו
+    
+    יחידה = chunk של תאריכים (לכל המניות), ונרשמת כ-done רק אחרי שה-snapshots שלה
+    נשמרו ב-DB. שורה ראשונה היא כותרת עם הפרמטרים ורשימת המניות; ריצה עם --resume
+    ממשיכה רק אם הם זהים (רשימות ההתאמות תלויות בכל המניות ביחד).
+    שורה חלקית בסוף הקובץ (קריסה באמצע כתיבה) פשוט מדולגת.
+    """
+    
+    def __init__(self,
+                 journal_dir: str,
+                 params: Dict[str, Any],
+                 symbols: List[str],
+                 resume: bool = False):
+        """
+        Args:
+            journal_dir: תיקיית היומנים
+            params: lookback_days, forward_days, correlation_threshold, window_type
+            symbols: רשימת המניות של הריצה
+            resume: True = טעינת יחידות שהושלמו מיומן קיים, False = יומן חדש
+        """
+        self.params_hash = hash_params(
+            params['lookback_days'],
+            params['forward_days'],
+            params['correlation_threshold'],
+            params['window_type']
+        )
+        self.path = os.path.join(journal_dir, f"{self.params_hash}.jsonl")
+        self.header = {'params': params, 'symbols': list(symbols)}
+        self._done: Set[str] = set()
+        
+        os.makedirs(journal_dir, exist_ok=True)
+        
+        if resume and os.path.exists(self.path):
+            if self._load():
+                logger.info(f"♻️ ממשיך ריצה קודמת: {len(self._done)} יחידות כבר הושלמו ({self.path})")
+                return
+            logger.warning("⚠️ היומן הקיים נוצר עם פרמטרים או מניות אחרים - מתחיל מההתחלה")
+        
+        self._write_lines([self.header], mode='w')
+    
+    def _load(self) -> bool:
+        """
+        טעינת יחידות שהושלמו
+        
+        Returns:
+            False אם הכותרת לא תואמת לריצה הנוכחית
+        """
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        
+        if not records or records[0] != self.header:
+            return False
+        
+        for record in records[1:]:
+            if record.get('status') == 'done':
+                self._done.add(record['unit'])
+            elif record.get('status') == 'failed':
+                self._done.discard(record['unit'])
+        
+        return True
+    
+    def _write_lines(self, records: List[Dict[str, Any]], mode: str = 'a'):
+        with open(self.path, mode, encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def is_done(self, unit: str) -> bool:
+        return unit in self._done
+    
+    @property
+    def completed(self) -> int:
+        return len(self._done)
+    
+    def mark_done(self, units: Dict[str, int]):
+        """
+        רישום יחידות שה-snapshots שלהן נשמרו
+        
+        Args:
+            units: יחידה -> מספר snapshots
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        self._write_lines([
+            {'unit': unit, 'status': 'done', 'snapshots': count, 'at': now}
+            for unit, count in units.items()
+        ])
+        self._done.update(units)
+    
+    def mark_failed(self, units: List[str], error: Optional[str] = None):
+        """
+        רישום יחידות שנכשלו (חישוב או שמירה) - יחושבו מחדש ב---resume
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        self._write_lines([
+            {'unit': unit, 'status': 'failed', 'error': error, 'at': now}
+            for unit in units
+        ])
+        self._done.difference_update(units)
@@ -23,6 +23,13 @@ COMPUTATION_PARAMS = {
     }
 }
 
+# רשת פרמטרים ל-Pre-Computation בסריקה (--sweep) - הטווחים של הסליידרים ב-frontend
+SWEEP_PARAMS = {
+    'lookbacks': [5, 10, 15, 20, 25, 30],
+    'forwards': [5, 10, 15, 20, 25, 30],
+    'thresholds': [0.7, 0.75, 0.8, 0.85, 0.9, 0.95],
+}
+
 # הגדרות Supabase
 SUPABASE_CONFIG = {
     'url': os.getenv('SUPABASE_URL', ''),
@@ -34,7 +41,14 @@ SUPABASE_CONFIG = {
 MULTIPROCESSING_CONFIG = {
     'max_workers': min(16, os.cpu_count() or 8),
     'batch_size': 1000,  # גודל batch ל-Supabase inserts
-    'chunk_size': 50,    # מספר מניות לכל worker
+    'chunk_size': 50,    # מספר תאריכים לכל chunk (כל תאריך = כל המניות)
+}
+
+# אינדקס MinHash/LSH לפטרנים דומים (num_perm = bands × שורות לכל band)
+LSH_CONFIG = {
+    'num_perm': 128,  # מספר פונקציות hash בחתימה
+    'bands': 32,      # 4 שורות לכל band: מועמד בהסתברות ~87% ב-Jaccard 0.5, ~99% ב-0.6
+    'seed': 42,
 }
 
 # הגדרות Apify
@@ -47,6 +61,9 @@ APIFY_CONFIG = {
 # נתיבים
 PATHS = {
     'data_cache': 'data_cache',
+    'price_cube': os.path.join('data_cache', 'cube', 'prices'),  # קובייה ממופת-זיכרון ל-workers
+    'precompute_journal': os.path.join('data_cache', 'precompute'),  # יומני checkpoints של Pre-Computation
+    'pattern_index': os.path.join('data_cache', 'patterns'),  # אינדקס MinHash/LSH לחיפוש פטרנים דומים
     'database_migrations': 'database/migrations',
 }
 
@@ -54,5 +71,6 @@ PATHS = {
 CACHE_CONFIG = {
     'daily_analysis_ttl_days': 7,  # TTL לקאש ניתוחים יומיים
     'pattern_statistics_ttl_days': 30,  # TTL לסטטיסטיקות פטרנים
+    'price_store_max_bytes': None,  # תקציב למאגר המחירים (None = ללא הגבלה, מעבר לו LRU)
 }
 
@@ -8,7 +8,6 @@ import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import logging
-import pickle
 
 # הוספת נתיב למודולים
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,6 +16,7 @@ from data_fetcher import DataFetcher
 from .config import COMPUTATION_PARAMS, PATHS, CACHE_CONFIG
 from .db_client import SupabaseClient
 from .pre_compute import PreComputeEngine
+from .pattern_index import PatternIndex
 from .utils import calculate_correlation_for_date, calculate_future_return, classify_movement
 
 logging.basicConfig(
@@ -33,10 +33,14 @@ class DailyUpdateEngine:
     
     def __init__(self):
         """אתחול"""
-        self.data_fetcher = DataFetcher(cache_dir=PATHS['data_cache'])
+        self.data_fetcher = DataFetcher(
+            cache_dir=PATHS['data_cache'],
+            max_cache_bytes=CACHE_CONFIG['price_store_max_bytes']
+        )
         self.db_client = SupabaseClient()
         self.pre_compute = PreComputeEngine()
         self.params = COMPUTATION_PARAMS
+        self.pattern_index = PatternIndex(PATHS['pattern_index'], self.params)
     
     def update_stock_data(self, symbols: List[str]) -> Dict[str, Any]:
         """
@@ -50,60 +54,33 @@ class DailyUpdateEngine:
         """
         logger.info(f"📥 מעדכן נתונים עבור {len(symbols)} מניות...")
         
-        updated = 0
-        failed = []
+        # רק הברים שאחרי הבר האחרון של כל מניה (עם זיהוי restatement)
+        stats = self.data_fetcher.update_incremental(symbols)
         
-        # תאריכים
-        end_date = datetime.now().strftime("%Y-%m-%d")
-        start_date = (datetime.now() - timedelta(days=5)).strftime("%Y-%m-%d")  # 5 ימים אחורה (למקרה שיש gaps)
+        updated = len(stats['appended']) + len(stats['new']) + len(stats['restated'])
+        failed = stats['failed']
         
-        for symbol in symbols:
-            try:
-                # הורדת נתונים (עם force_download=False כדי להשתמש בקאש אם אפשר)
-                df = self.data_fetcher.download_stock_data(
-                    symbol,
-                    start_date=start_date,
-                    end_date=end_date,
-                    use_cache=True,
-                    force_download=False  # לא כופה הורדה - משתמש בקאש אם קיים ועדכני
-                )
-                
-                if df is not None and not df.empty:
-                    # בדיקה אם יש נתונים חדשים
-                    cache_file = os.path.join(PATHS['data_cache'], f"{symbol}_{start_date}_{end_date}.pkl")
-                    
-                    if os.path.exists(cache_file):
-                        # טעינת קאש ישן
-                        with open(cache_file, 'rb') as f:
-                            old_df = pickle.load(f)
-                        
-                        # השוואה
-                        if len(df) > len(old_df):
-                            updated += 1
-                            logger.debug(f"✅ {symbol}: עודכן ({len(old_df)} → {len(df)} שורות)")
-                        else:
-                            logger.debug(f"ℹ️ {symbol}: אין עדכונים")
-                    else:
-                        updated += 1
-                        logger.debug(f"✅ {symbol}: נוצר קאש חדש")
-                else:
-                    failed.append(symbol)
-                    
-            except Exception as e:
-                logger.warning(f"⚠️ שגיאה בעדכון {symbol}: {e}")
-                failed.append(symbol)
+        if stats['restated']:
+            logger.info(f"🔁 {len(stats['restated'])} מניות נכתבו מחדש (פיצול / דיבידנד): {stats['restated'][:10]}")
         
-        logger.info(f"✅ עדכון הושלם: {updated} עודכנו, {len(failed)} נכשלו")
+        logger.info(f"✅ עדכון הושלם: {updated} עודכנו ({stats['new_rows']} שורות חדשות), {len(failed)} נכשלו")
         
         return {
             'updated': updated,
+            'restated': stats['restated'],
             'failed': failed,
             'total': len(symbols)
         }
     
     def compute_today_snapshots(self) -> int:
         """
-        חישוב snapshots ליום האחרון בלבד
+        חישוב snapshots ליום האחרון + השלמת התוצאה של ה-snapshot מלפני forward_days
+        
+        נטען רק החלון האחרון (lookback_days + forward_days ימי מסחר), ושני התאריכים
+        מחושבים בקרנל המטריצות:
+        - היום האחרון: התאמות חדשות (בלי תוצאה - העתיד עוד לא ידוע)
+        - בדיוק forward_days ימי מסחר אחורה: התוצאה (future_return_pct / movement_type)
+          ידועה עכשיו, וה-snapshot נשמר מחדש איתה (upsert - גם משלים יום שחסר ב-DB)
         
         Returns:
             מספר snapshots שנוצרו
@@ -117,52 +94,65 @@ class DailyUpdateEngine:
             return 0
         
         symbols = [s['symbol'] for s in stocks_from_db]
+        lookback_days = self.params['lookback_days']
+        forward_days = self.params['forward_days']
+        window_rows = lookback_days + forward_days
         
-        # טעינת נתונים
+        # טעינת החלון האחרון בלבד (~252 ימי מסחר בשנה + מרווח לחגים);
+        # הנתונים כבר עודכנו ב-update_stock_data, אז בלי הורדות נוספות
+        today = datetime.now().date()
+        start_date = today - timedelta(days=int(window_rows * 365 / 252) + 10)
         try:
-            stock_data = self.pre_compute.load_stock_data(symbols)
+            stock_data = self.pre_compute.load_stock_data(
+                symbols, start_date.strftime("%Y-%m-%d"), fetch_missing=False
+            )
         except Exception as e:
             logger.error(f"❌ שגיאה בטעינת נתונים: {e}")
             return 0
         
-        # תאריך היום
-        today = datetime.now().date()
-        today_datetime = pd.to_datetime(today)
+        stock_data = stock_data.iloc[-window_rows:]
+        loaded = set(stock_data.columns.get_level_values(0))
+        symbols = [s for s in symbols if s in loaded]
         
-        # בדיקה שיש מספיק נתונים
-        if today_datetime not in stock_data.index:
-            logger.warning("⚠️ אין נתונים ליום הנוכחי, משתמש ביום האחרון...")
-            today_datetime = stock_data.index[-1]
+        if stock_data.index[-1] != pd.to_datetime(today):
+            logger.warning(f"⚠️ אין נתונים ליום הנוכחי, משתמש ביום האחרון ({stock_data.index[-1].date()})...")
         
         # בדיקה שיש lookback_days נתונים
-        lookback_days = self.params['lookback_days']
-        date_idx = stock_data.index.get_indexer([today_datetime], method='nearest')[0]
-        
-        if date_idx < lookback_days - 1:
+        last_idx = len(stock_data.index) - 1
+        if last_idx < lookback_days - 1:
             logger.error(f"❌ אין מספיק נתונים (צריך {lookback_days} ימים)")
             return 0
         
-        # חישוב snapshots
-        dates = [today_datetime]
-        snapshots = []
-        
-        for stock in symbols:
-            try:
-                stock_snapshots = self.pre_compute.compute_snapshots_for_stock(
-                    stock_data, stock, dates, symbols,
-                    lookback_days,
-                    self.params['forward_days'],
-                    self.params['correlation_threshold']
-                )
-                snapshots.extend(stock_snapshots)
-            except Exception as e:
-                logger.warning(f"⚠️ שגיאה בחישוב snapshot עבור {stock}: {e}")
-                continue
-        
-        # שמירה ל-DB
+        # התאריך שהתוצאה שלו ידועה עכשיו (צריך גם lookback_days לפניו)
+        date_positions = [last_idx]
+        outcome_idx = last_idx - forward_days
+        if outcome_idx >= lookback_days - 1:
+            date_positions.insert(0, outcome_idx)
+        
+        snapshots = self.pre_compute.compute_snapshot_chunk(
+            stock_data, symbols, date_positions,
+            lookback_days, forward_days,
+            self.params['correlation_threshold']
+        )
+        
+        outcomes = sum(
+            1 for snap in snapshots
+            if snap['future_return_pct'] is not None
+        )
+        if len(date_positions) > 1:
+            logger.info(f"🎯 הושלמו {outcomes} תוצאות ל-{stock_data.index[outcome_idx].date()}")
+        
+        # שמירה ל-DB (upsert)
         if snapshots:
             logger.info(f"💾 שומר {len(snapshots)} snapshots ל-DB...")
             self.db_client.insert_correlation_snapshots(snapshots)
+            
+            # עדכון אינקרמנטלי של אינדקס הפטרנים (היום + התוצאה שהושלמה)
+            try:
+                updated = self.pattern_index.add_snapshots(snapshots)
+                logger.info(f"🔎 אינדקס פטרנים עודכן עבור {updated} מניות")
+            except Exception as e:
+                logger.warning(f"⚠️ שגיאה בעדכון אינדקס הפטרנים: {e}")
         
         logger.info(f"✅ נוצרו {len(snapshots)} snapshots")
         
@@ -13,6 +13,12 @@ from .config import SUPABASE_CONFIG, MULTIPROCESSING_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# מפתח ייחודי של snapshot: מניה, תאריך ופרמטרי החישוב (דורש unique index תואם בטבלה)
+SNAPSHOT_CONFLICT_COLUMNS = 'stock_symbol,snapshot_date,lookback_days,forward_days,correlation_threshold'
+
+# מספר השורות המקסימלי ש-PostgREST מחזיר בבקשה אחת (max-rows של Supabase)
+PAGE_SIZE = 1000
+
 
 class SupabaseClient:
     """
@@ -45,6 +51,9 @@ class SupabaseClient:
         """
         הכנסת correlation snapshots ל-DB
         
+        upsert על (stock_symbol, snapshot_date, פרמטרים) - ריצה חוזרת על אותו טווח
+        מעדכנת שורות קיימות במקום לשכפל אותן.
+        
         Args:
             snapshots: רשימת snapshots להכנסה
             
@@ -58,7 +67,7 @@ class SupabaseClient:
             # Batch inserts
             for i in range(0, len(snapshots), self.batch_size):
                 batch = snapshots[i:i + self.batch_size]
-                self._retry_insert('correlation_snapshots', batch)
+                self._retry_insert('correlation_snapshots', batch, upsert=True, on_conflict=SNAPSHOT_CONFLICT_COLUMNS)
             
             logger.info(f"✅ הוכנסו {len(snapshots)} correlation snapshots בהצלחה")
             return True
@@ -141,7 +150,10 @@ class SupabaseClient:
                                   stock_symbol: Optional[str] = None,
                                   start_date: Optional[str] = None,
                                   end_date: Optional[str] = None,
-                                  limit: int = 1000) -> List[Dict[str, Any]]:
+                                  limit: int = 1000,
+                                  lookback_days: Optional[int] = None,
+                                  forward_days: Optional[int] = None,
+                                  correlation_threshold: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         שליפת correlation snapshots
         
@@ -149,12 +161,16 @@ class SupabaseClient:
             stock_symbol: סינון לפי מניה ספציפית
             start_date: תאריך התחלה (YYYY-MM-DD)
             end_date: תאריך סיום (YYYY-MM-DD)
-            limit: מספר שורות מקסימלי
+            limit: מספר שורות מקסימלי (נשלף בעמודים של PAGE_SIZE)
+            lookback_days: סינון לפי שילוב פרמטרים (מ-Pre-Computation בסריקה)
+            forward_days: סינון לפי שילוב פרמטרים
+            correlation_threshold: סינון לפי שילוב פרמטרים
             
         Returns:
             רשימת snapshots
         """
-        try:
+        def page_query(offset: int, size: int):
+            # שאילתה חדשה לכל עמוד - range() על אותו builder מוסיף פרמטרים כפולים
             query = self.client.table('correlation_snapshots').select('*')
             
             if stock_symbol:
@@ -163,11 +179,33 @@ class SupabaseClient:
                 query = query.gte('snapshot_date', start_date)
             if end_date:
                 query = query.lte('snapshot_date', end_date)
+            if lookback_days is not None:
+                query = query.eq('lookback_days', lookback_days)
+            if forward_days is not None:
+                query = query.eq('forward_days', forward_days)
+            if correlation_threshold is not None:
+                query = query.eq('correlation_threshold', correlation_threshold)
             
-            query = query.order('snapshot_date', desc=True).limit(limit)
-            response = query.execute()
+            # סדר מלא (מפתח ה-snapshot) כדי שהעמודים לא יחפפו ולא ידלגו על שורות
+            query = query.order('snapshot_date', desc=True)
+            for column in ('stock_symbol', 'lookback_days', 'forward_days', 'correlation_threshold'):
+                query = query.order(column)
             
-            return response.data if response.data else []
+            return query.range(offset, offset + size - 1)
+        
+        try:
+            snapshots = []
+            while len(snapshots) < limit:
+                size = min(PAGE_SIZE, limit - len(snapshots))
+                response = page_query(len(snapshots), size).execute()
+                page = response.data if response.data else []
+                snapshots.extend(page)
+                
+                # עמוד קצר = אין עוד שורות
+                if len(page) < size:
+                    break
+            
+            return snapshots
         except Exception as e:
             logger.error(f"❌ שגיאה בשליפת correlation snapshots: {e}")
             return []
@@ -263,7 +301,12 @@ class SupabaseClient:
             logger.error(f"❌ שגיאה בשליפת קאש: {e}")
             return None
     
-    def _retry_insert(self, table: str, data: List[Dict], upsert: bool = False, max_retries: int = 3):
+    def _retry_insert(self,
+                      table: str,
+                      data: List[Dict],
+                      upsert: bool = False,
+                      max_retries: int = 3,
+                      on_conflict: Optional[str] = None):
         """
         הכנסת נתונים עם retry logic
         
@@ -272,10 +315,13 @@ class SupabaseClient:
             data: נתונים להכנסה
             upsert: האם לבצע upsert במקום insert
             max_retries: מספר ניסיונות מקסימלי
+            on_conflict: עמודות המפתח ל-upsert (ברירת מחדל: המפתח הראשי)
         """
         for attempt in range(max_retries):
             try:
-                if upsert:
+                if upsert and on_conflict:
+                    self.client.table(table).upsert(data, on_conflict=on_conflict).execute()
+                elif upsert:
                     self.client.table(table).upsert(data).execute()
                 else:
                     self.client.table(table).insert(data).execute()
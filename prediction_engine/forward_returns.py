@@ -0,0 +1,227 @@
+"""
+מטריצת תשואות עתידיות וסיווג תנועה (תאריך × מניה) - מחושבת פעם אחת ונשמרת ליד מאגר המחירים
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# הוספת נתיב למודולים
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_store import PriceStore
+from .config import COMPUTATION_PARAMS
+from .trading_calendar import TradingCalendar
+from .utils import classify_movement, calculate_forward_returns
+
+logger = logging.getLogger(__name__)
+
+# קודי הסיווג במטריצה (-1 = תשואה לא ידועה)
+MOVEMENT_TYPES = ['strong_down', 'moderate_down', 'neutral', 'moderate_up', 'strong_up']
+
+
+def classify_movements(returns: np.ndarray, thresholds: Dict[str, float]) -> np.ndarray:
+    """
+    סיווג וקטורי של תשואות - זהה ל-classify_movement לכל תא
+    
+    הספים מחלקים את הישר לקטעים פתוחים ולנקודות הספים עצמן (חלק מהתנאים כוללים את הקצה
+    וחלק לא). כל קטע מסווג פעם אחת ע"י classify_movement על נקודה מייצגת, וכל תא
+    ממופה לקטע שלו בשתי קריאות ל-np.digitize.
+    
+    Args:
+        returns: מערך תשואות באחוזים (NaN = לא ידועה)
+        thresholds: movement_thresholds
+        
+    Returns:
+        מערך int8 באותה צורה - אינדקס ב-MOVEMENT_TYPES, או -1
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    edges = np.unique(np.array(list(thresholds.values()), dtype=np.float64))
+    
+    # נקודות מייצגות: מתחת לספים, כל סף, בין ספים סמוכים ומעל הספים
+    probes = []
+    for i, edge in enumerate(edges):
+        probes.append(edge - 1.0 if i == 0 else (edges[i - 1] + edge) / 2)
+        probes.append(edge)
+    probes.append(edges[-1] + 1.0)
+    region_codes = np.array(
+        [MOVEMENT_TYPES.index(classify_movement(p, thresholds)) for p in probes],
+        dtype=np.int8
+    )
+    
+    # קטע k פתוח: שתי הספירות שוות ל-k (אינדקס 2k); בדיוק על סף k: k ו-k+1 (אינדקס 2k+1)
+    below = np.digitize(returns, edges, right=True)
+    at_or_below = np.digitize(returns, edges, right=False)
+    codes = region_codes[np.minimum(below + at_or_below, len(probes) - 1)]
+    
+    return np.where(np.isnan(returns), np.int8(-1), codes).astype(np.int8)
+
+
+def movement_labels(codes: np.ndarray) -> List[Optional[str]]:
+    """
+    קודי סיווג -> שמות (None לתשואה לא ידועה)
+    """
+    return [MOVEMENT_TYPES[c] if c >= 0 else None for c in np.asarray(codes).tolist()]
+
+
+class ForwardReturnMatrix:
+    """
+    תשואה עתידית באחוזים וסיווג תנועה לכל (תאריך, מניה) עבור forward_days אחד
+    
+    אותה סמנטיקה כמו calculate_future_return + classify_movement, אבל לכל התאים
+    בבת אחת: חלוקה אחת של המטריצה המוזזת ו-np.digitize לסיווג.
+    """
+    
+    def __init__(self,
+                 dates: pd.DatetimeIndex,
+                 symbols: List[str],
+                 forward_days: int,
+                 returns: np.ndarray,
+                 codes: np.ndarray):
+        """
+        Args:
+            dates: אינדקס תאריכים (שורות)
+            symbols: מניות (עמודות)
+            forward_days: ימים קדימה
+            returns: מערך (T, N) של תשואות באחוזים
+            codes: מערך (T, N) של קודי סיווג (ראה MOVEMENT_TYPES)
+        """
+        self.dates = pd.DatetimeIndex(dates)
+        self.calendar = TradingCalendar(self.dates)
+        self.symbols = list(symbols)
+        self.forward_days = forward_days
+        self.returns = returns
+        self.codes = codes
+        
+        self._symbol_pos = {symbol: i for i, symbol in enumerate(self.symbols)}
+    
+    @classmethod
+    def from_prices(cls,
+                    prices: pd.DataFrame,
+                    forward_days: int,
+                    thresholds: Optional[Dict[str, float]] = None) -> 'ForwardReturnMatrix':
+        """
+        בנייה ממטריצת מחירים (dates × symbols), למשל Adj Close מ-PriceStore.load
+        
+        Args:
+            prices: DataFrame של מחירים
+            forward_days: ימים קדימה
+            thresholds: movement_thresholds (ברירת מחדל: COMPUTATION_PARAMS)
+        """
+        thresholds = thresholds or COMPUTATION_PARAMS['movement_thresholds']
+        returns = calculate_forward_returns(prices.to_numpy(dtype=np.float64), forward_days)
+        
+        return cls(prices.index, prices.columns.tolist(), forward_days, returns, classify_movements(returns, thresholds))
+    
+    @classmethod
+    def from_store(cls,
+                   store: PriceStore,
+                   symbols: List[str],
+                   forward_days: int,
+                   thresholds: Optional[Dict[str, float]] = None,
+                   start_date: str = "2012-01-01",
+                   cache_dir: Optional[str] = None) -> 'ForwardReturnMatrix':
+        """
+        טעינה מהקאש שליד מאגר המחירים, או בנייה מ-Adj Close במאגר ושמירה לקאש
+        
+        מפתח הקאש כולל את מצב המאגר (טווח, שורות, גודל הקובץ וזמן הכתיבה של כל מניה),
+        כך שעדכון או restatement של מניה בונה את המטריצה מחדש.
+        
+        Args:
+            store: מאגר המחירים
+            symbols: מניות
+            forward_days: ימים קדימה
+            thresholds: movement_thresholds (ברירת מחדל: COMPUTATION_PARAMS)
+            start_date: תאריך התחלה
+            cache_dir: תיקיית הקאש (ברירת מחדל: forward_returns ליד תיקיית המאגר)
+        """
+        thresholds = thresholds or COMPUTATION_PARAMS['movement_thresholds']
+        cache_dir = cache_dir or os.path.join(os.path.dirname(store.root_dir), "forward_returns")
+        
+        index = store.index()
+        state = {
+            symbol: [index[symbol].get(key) for key in ('first_date', 'last_date', 'rows', 'bytes', 'written_at')]
+            for symbol in symbols if symbol in index
+        }
+        key = hashlib.md5(json.dumps({
+            'symbols': list(symbols),
+            'state': state,
+            'forward_days': forward_days,
+            'thresholds': thresholds,
+            'start_date': start_date,
+        }, sort_keys=True).encode()).hexdigest()
+        path = os.path.join(cache_dir, f"{key}.npz")
+        
+        if os.path.exists(path):
+            return cls.load(path)
+        
+        stock_data = store.load(symbols, ['Adj Close'], start_date=start_date)
+        prices = stock_data.xs('Adj Close', axis=1, level=1) if not stock_data.empty else pd.DataFrame()
+        matrix = cls.from_prices(prices, forward_days, thresholds)
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        matrix.save(path)
+        logger.info(f"💾 מטריצת תשואות ({forward_days} ימים) נשמרה: {path}")
+        
+        return matrix
+    
+    def save(self, path: str):
+        """
+        שמירה לקובץ npz (כתיבה לקובץ זמני ואז החלפה)
+        """
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            dates=self.dates.values.astype('datetime64[ns]'),
+            symbols=np.array(self.symbols, dtype=str),
+            forward_days=self.forward_days,
+            returns=self.returns,
+            codes=self.codes
+        )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'ForwardReturnMatrix':
+        with np.load(path) as data:
+            return cls(
+                pd.DatetimeIndex(data['dates']),
+                data['symbols'].tolist(),
+                int(data['forward_days']),
+                data['returns'],
+                data['codes']
+            )
+    
+    def get(self, symbol: str, date, snap: str = 'exact') -> Tuple[Optional[float], Optional[str]]:
+        """
+        תשואה וסיווג למניה בתאריך או במיקום שורה (None אם התאריך / המניה לא קיימים
+        או שהתשואה לא ידועה)
+        
+        Args:
+            symbol: סימול המניה
+            date: תאריך או מיקום שורה
+            snap: כלל הצמדה לתאריך שאינו יום מסחר ('exact' / 'previous' / 'next')
+        """
+        col = self._symbol_pos.get(symbol)
+        if isinstance(date, (int, np.integer)):
+            row = int(date) if 0 <= date < len(self.dates) else None
+        else:
+            row = self.calendar.position(date, snap)
+        if col is None or row is None:
+            return None, None
+        
+        code = int(self.codes[row, col])
+        if code < 0:
+            return None, None
+        return float(self.returns[row, col]), MOVEMENT_TYPES[code]
+    
+    def to_frame(self) -> pd.DataFrame:
+        """
+        תשואות כ-DataFrame (dates × symbols)
+        """
+        return pd.DataFrame(self.returns, index=self.dates, columns=self.symbols)
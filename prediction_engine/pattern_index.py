@@ -0,0 +1,405 @@
+"""
+אינדקס MinHash/LSH לחיפוש תאריכים היסטוריים דומים על כל ההיסטוריה של מניה
+"""
+
+import os
+import sys
+import zlib
+import logging
+import tempfile
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+# הוספת נתיב למודולים
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from .config import COMPUTATION_PARAMS, LSH_CONFIG, PATHS
+from .utils import calculate_similarity, hash_params
+
+logger = logging.getLogger(__name__)
+
+# ראשוני מרסן 2^31 - 1: (a * x + b) נשאר בתוך uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_BAND_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class PatternIndex:
+    """
+    חתימת MinHash לרשימת ההתאמות של כל snapshot + אינדקס LSH ב-bands
+    
+    קובץ npz לכל מניה תחת תיקייה לכל שילוב פרמטרים (hash_params), כך שהעדכון
+    היומי כותב מחדש רק את המניות שהשתנו. שאילתה אוספת מועמדים שחולקים band אחד
+    לפחות עם החתימה שלה (תת-לינארי באורך ההיסטוריה), ומדרגת אותם מחדש בדיוק
+    עם calculate_similarity. זהו חיפוש מקורב: זוג עם Jaccard נמוך עלול לא להיות מועמד
+    (ראה LSH_CONFIG).
+    """
+    
+    def __init__(self,
+                 index_dir: Optional[str] = None,
+                 params: Optional[Dict[str, Any]] = None,
+                 num_perm: Optional[int] = None,
+                 bands: Optional[int] = None,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            index_dir: תיקיית האינדקס (ברירת מחדל: PATHS['pattern_index'])
+            params: lookback_days, forward_days, correlation_threshold, window_type (ברירת מחדל: COMPUTATION_PARAMS)
+            num_perm: מספר פונקציות hash (ברירת מחדל: LSH_CONFIG)
+            bands: מספר bands (חייב לחלק את num_perm)
+            seed: seed לפונקציות ה-hash
+        """
+        params = params or COMPUTATION_PARAMS
+        self.params = {
+            'lookback_days': params['lookback_days'],
+            'forward_days': params['forward_days'],
+            'correlation_threshold': params['correlation_threshold'],
+            'window_type': params.get('window_type', COMPUTATION_PARAMS['window_type'])
+        }
+        self.num_perm = num_perm or LSH_CONFIG['num_perm']
+        self.bands = bands or LSH_CONFIG['bands']
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm ({self.num_perm}) חייב להתחלק במספר ה-bands ({self.bands})")
+        self.rows_per_band = self.num_perm // self.bands
+        
+        self.params_hash = hash_params(
+            self.params['lookback_days'],
+            self.params['forward_days'],
+            self.params['correlation_threshold'],
+            self.params['window_type']
+        )
+        self.index_dir = os.path.join(index_dir or PATHS['pattern_index'], self.params_hash)
+        
+        rng = np.random.default_rng(LSH_CONFIG['seed'] if seed is None else seed)
+        self._a = rng.integers(1, int(_PRIME), size=(self.num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=(self.num_perm, 1), dtype=np.uint64)
+        self._powers = _BAND_MULTIPLIER ** np.arange(self.rows_per_band, dtype=np.uint64)
+        
+        self._stocks: Dict[str, Dict[str, np.ndarray]] = {}
+    
+    def signature(self, matched_stocks: List[Dict[str, float]]) -> np.ndarray:
+        """
+        חתימת MinHash לקבוצת המניות (קבוצה ריקה = _PRIME בכל המקומות, לא דומה לאף קבוצה)
+        """
+        symbols = {m['symbol'] for m in matched_stocks}
+        if not symbols:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        
+        x = np.array([zlib.crc32(symbol.encode()) for symbol in symbols], dtype=np.uint64) % _PRIME
+        return ((self._a * x + self._b) % _PRIME).min(axis=1)
+    
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        חתימות (M, num_perm) -> מפתח uint64 לכל band (M, bands)
+        """
+        banded = signatures.reshape(len(signatures), self.bands, self.rows_per_band)
+        return (banded * self._powers).sum(axis=-1, dtype=np.uint64)
+    
+    def _path(self, stock_symbol: str) -> str:
+        return os.path.join(self.index_dir, f"{stock_symbol}.npz")
+    
+    def _get(self, stock_symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        טעינת האינדקס של מניה (פעם אחת), כולל מפתחות ה-bands ממוינים לחיפוש
+        """
+        if stock_symbol not in self._stocks:
+            path = self._path(stock_symbol)
+            if not os.path.exists(path):
+                return None
+            
+            with np.load(path) as data:
+                entry = {key: data[key] for key in data.files}
+            self._stocks[stock_symbol] = self._with_bands(entry)
+        
+        return self._stocks[stock_symbol]
+    
+    def _with_bands(self, entry: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        keys = self._band_keys(entry['signatures']).T
+        order = np.argsort(keys, axis=1, kind='stable')
+        entry['band_order'] = order
+        entry['band_keys'] = np.take_along_axis(keys, order, axis=1)
+        return entry
+    
+    def _matched_rows(self, entry: Dict[str, np.ndarray], rows) -> List[List[Dict[str, float]]]:
+        """
+        שחזור matched_stocks (symbol, corr_price) לשורות - לדירוג מחדש
+        """
+        vocabulary = entry['vocabulary'].tolist()
+        indptr = entry['indptr']
+        matched = []
+        for row in rows:
+            lo, hi = indptr[row], indptr[row + 1]
+            matched.append([
+                {'symbol': vocabulary[i], 'corr_price': corr}
+                for i, corr in zip(entry['indices'][lo:hi].tolist(), entry['corrs'][lo:hi].tolist())
+            ])
+        return matched
+    
+    def add_snapshots(self, snapshots: List[Dict[str, Any]]) -> int:
+        """
+        עדכון אינקרמנטלי: snapshots חדשים (או מעודכנים - אותו תאריך מחליף) לכל מניה
+        
+        רק לשורות החדשות מחושבות חתימות ומפתחות bands; בעדכון היומי (תאריכים אחרי
+        האחרון באינדקס) הן נוספות לסוף המערכים וה-buckets שלהן ממוזגים לאינדקס הממוין.
+        הקובץ של כל מניה שהשתנתה נכתב מחדש.
+        
+        Args:
+            snapshots: snapshots עם אותם פרמטרים כמו האינדקס
+        
+        Returns:
+            מספר המניות שעודכנו
+        """
+        by_stock: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for snapshot in snapshots:
+            by_stock.setdefault(snapshot['stock_symbol'], {})[snapshot['snapshot_date']] = snapshot
+        
+        os.makedirs(self.index_dir, exist_ok=True)
+        
+        for stock_symbol, new_rows in by_stock.items():
+            entry = self._get(stock_symbol)
+            entry = self._merge_rows(self._empty_entry() if entry is None else entry, new_rows)
+            self._save(stock_symbol, entry)
+            self._stocks[stock_symbol] = entry
+        
+        return len(by_stock)
+    
+    def _empty_entry(self) -> Dict[str, np.ndarray]:
+        return {
+            'dates': np.empty(0, dtype='U10'),
+            'future_returns': np.empty(0, dtype=np.float64),
+            'signatures': np.empty((0, self.num_perm), dtype=np.uint64),
+            'vocabulary': np.empty(0, dtype=str),
+            'indptr': np.zeros(1, dtype=np.int64),
+            'indices': np.empty(0, dtype=np.int32),
+            'corrs': np.empty(0, dtype=np.float64),
+            'band_order': np.empty((self.bands, 0), dtype=np.int64),
+            'band_keys': np.empty((self.bands, 0), dtype=np.uint64),
+        }
+    
+    def _merge_rows(self,
+                    entry: Dict[str, np.ndarray],
+                    new_rows: Dict[str, Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        הוספת snapshots (תאריך -> snapshot) לאינדקס של מניה
+        """
+        new_dates = np.array(sorted(new_rows), dtype='U10')
+        matched = [new_rows[date].get('matched_stocks') or [] for date in new_dates.tolist()]
+        returns = np.array([
+            np.nan if new_rows[date].get('future_return_pct') is None else new_rows[date]['future_return_pct']
+            for date in new_dates.tolist()
+        ], dtype=np.float64)
+        signatures = np.array([self.signature(m) for m in matched], dtype=np.uint64).reshape(-1, self.num_perm)
+        
+        # אוצר המניות רק גדל, כך שהמזהים בשורות הקיימות לא משתנים
+        vocabulary = entry['vocabulary'].tolist()
+        vocabulary.extend(sorted({m['symbol'] for stock_matches in matched for m in stock_matches} - set(vocabulary)))
+        positions = {symbol: i for i, symbol in enumerate(vocabulary)}
+        counts = np.array([len(stock_matches) for stock_matches in matched], dtype=np.int64)
+        indices = np.array([positions[m['symbol']] for stock_matches in matched for m in stock_matches], dtype=np.int32)
+        corrs = np.array([m.get('corr_price', 0) for stock_matches in matched for m in stock_matches], dtype=np.float64)
+        
+        old_dates = entry['dates']
+        keep = ~np.isin(old_dates, new_dates)
+        
+        if keep.all() and (len(old_dates) == 0 or old_dates[-1] < new_dates[0]):
+            # תאריכים חדשים בסוף: הוספה למערכים ומיזוג ה-buckets של השורות החדשות בלבד
+            new_keys = self._band_keys(signatures).T
+            new_order = np.argsort(new_keys, axis=1, kind='stable')
+            new_keys = np.take_along_axis(new_keys, new_order, axis=1)
+            
+            band_keys, band_order = [], []
+            for band in range(self.bands):
+                at = np.searchsorted(entry['band_keys'][band], new_keys[band], side='right')
+                band_keys.append(np.insert(entry['band_keys'][band], at, new_keys[band]))
+                band_order.append(np.insert(entry['band_order'][band], at, new_order[band] + len(old_dates)))
+            
+            return {
+                'dates': np.concatenate([old_dates, new_dates]),
+                'future_returns': np.concatenate([entry['future_returns'], returns]),
+                'signatures': np.concatenate([entry['signatures'], signatures]),
+                'vocabulary': np.array(vocabulary, dtype=str),
+                'indptr': np.concatenate([entry['indptr'], entry['indptr'][-1] + np.cumsum(counts)]),
+                'indices': np.concatenate([entry['indices'], indices]),
+                'corrs': np.concatenate([entry['corrs'], corrs]),
+                'band_order': np.stack(band_order),
+                'band_keys': np.stack(band_keys),
+            }
+        
+        # החלפת תאריכים קיימים או תאריכים מוקדמים: סידור מחדש של השורות (CSR) ומיון ה-bands מהחתימות
+        old_counts = np.diff(entry['indptr'])
+        row_counts = np.concatenate([old_counts[keep], counts])
+        all_indices = np.concatenate([entry['indices'][np.repeat(keep, old_counts)], indices])
+        all_corrs = np.concatenate([entry['corrs'][np.repeat(keep, old_counts)], corrs])
+        dates = np.concatenate([old_dates[keep], new_dates])
+        
+        order = np.argsort(dates, kind='stable')
+        starts = np.cumsum(row_counts) - row_counts
+        lengths = row_counts[order]
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        source = np.repeat(starts[order], lengths) + offsets
+        
+        return self._with_bands({
+            'dates': dates[order],
+            'future_returns': np.concatenate([entry['future_returns'][keep], returns])[order],
+            'signatures': np.concatenate([entry['signatures'][keep], signatures])[order],
+            'vocabulary': np.array(vocabulary, dtype=str),
+            'indptr': np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            'indices': all_indices[source],
+            'corrs': all_corrs[source],
+        })
+    
+    def _save(self, stock_symbol: str, entry: Dict[str, np.ndarray]):
+        """
+        שמירה לקובץ npz (כתיבה לקובץ זמני ייחודי באותה תיקייה ואז החלפה)
+        
+        העדכון היומי ובנייה מחדש של האינדקס יכולים לכתוב את אותה מניה במקביל -
+        לכל כותב קובץ זמני משלו, והחלפה אחרונה גוברת.
+        """
+        path = self._path(stock_symbol)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp.npz", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **{key: value for key, value in entry.items() if key not in ('band_order', 'band_keys')})
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def matched_stocks(self, stock_symbol: str, date: str) -> Optional[List[Dict[str, float]]]:
+        """
+        רשימת ההתאמות של מניה בתאריך (None אם אין snapshot)
+        """
+        entry = self._get(stock_symbol)
+        if entry is None:
+            return None
+        
+        row = int(np.searchsorted(entry['dates'], date))
+        if row >= len(entry['dates']) or entry['dates'][row] != date:
+            return None
+        return self._matched_rows(entry, [row])[0]
+    
+    def snapshot_dates(self, stock_symbol: str) -> np.ndarray:
+        """
+        תאריכי ה-snapshots של מניה באינדקס (ממוינים)
+        """
+        entry = self._get(stock_symbol)
+        return np.empty(0, dtype='U10') if entry is None else entry['dates']
+    
+    def query(self,
+              stock_symbol: str,
+              matched_stocks: List[Dict[str, float]],
+              top_k: Optional[int] = 5,
+              before_date: Optional[str] = None,
+              min_similarity: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        התאריכים ההיסטוריים הדומים ביותר לרשימת התאמות
+        
+        Args:
+            stock_symbol: סימול המניה
+            matched_stocks: רשימת ההתאמות של השאילתה
+            top_k: מספר תוצאות (None = כל המועמדים מעל הסף)
+            before_date: רק תאריכים שלפני התאריך הזה (YYYY-MM-DD)
+            min_similarity: דמיון מינימלי (אי-שוויון חזק)
+        
+        Returns:
+            רשימת {'date', 'similarity', 'future_return'} מהדומה ביותר
+        """
+        entry = self._get(stock_symbol)
+        if entry is None or not matched_stocks:
+            return []
+        
+        stop = len(entry['dates']) if before_date is None else int(np.searchsorted(entry['dates'], before_date))
+        
+        # מועמדים: שורות עם band זהה לפחות באחד ה-bands
+        query_keys = self._band_keys(self.signature(matched_stocks)[None, :])[0]
+        candidates = []
+        for band, key in enumerate(query_keys):
+            lo = np.searchsorted(entry['band_keys'][band], key, side='left')
+            hi = np.searchsorted(entry['band_keys'][band], key, side='right')
+            candidates.append(entry['band_order'][band][lo:hi])
+        candidates = np.unique(np.concatenate(candidates))
+        candidates = candidates[candidates < stop]
+        
+        # דירוג מחדש מדויק
+        results = []
+        for row, hist_matches in zip(candidates.tolist(), self._matched_rows(entry, candidates.tolist())):
+            similarity = calculate_similarity(matched_stocks, hist_matches)
+            if similarity > min_similarity:
+                future_return = entry['future_returns'][row]
+                results.append({
+                    'date': str(entry['dates'][row]),
+                    'similarity': similarity,
+                    'future_return': None if np.isnan(future_return) else float(future_return)
+                })
+        
+        results.sort(key=lambda r: (r['similarity'], r['date']), reverse=True)
+        
+        return results if top_k is None else results[:top_k]
+    
+    def build_from_db(self, db_client, stock_symbols: List[str], limit: int = 10000) -> int:
+        """
+        בנייה מלאה מה-DB (ה-snapshots של שילוב הפרמטרים של האינדקס)
+        
+        Args:
+            db_client: SupabaseClient
+            stock_symbols: רשימת מניות
+            limit: מספר snapshots מקסימלי למניה (~252 לשנה)
+        
+        Returns:
+            מספר ה-snapshots שנוספו
+        """
+        total = 0
+        for stock_symbol in stock_symbols:
+            snapshots = db_client.get_correlation_snapshots(
+                stock_symbol=stock_symbol,
+                limit=limit,
+                lookback_days=self.params['lookback_days'],
+                forward_days=self.params['forward_days'],
+                correlation_threshold=self.params['correlation_threshold']
+            )
+            if snapshots:
+                self.add_snapshots(snapshots)
+                total += len(snapshots)
+            logger.info(f"🔎 {stock_symbol}: {len(snapshots)} snapshots באינדקס")
+        
+        return total
+
+
+def main():
+    """Main function"""
+    import argparse
+    from .db_client import SupabaseClient
+    
+    parser = argparse.ArgumentParser(description='DeltaMix 2.0 Pattern Index (MinHash/LSH)')
+    parser.add_argument('--stocks', nargs='+', help='רשימת מניות (אם לא מוגדר, משתמש בכל המניות)')
+    parser.add_argument('--lookback-days', type=int, default=COMPUTATION_PARAMS['lookback_days'], help='ימים אחורה')
+    parser.add_argument('--forward-days', type=int, default=COMPUTATION_PARAMS['forward_days'], help='ימים קדימה')
+    parser.add_argument('--correlation-threshold', type=float, default=COMPUTATION_PARAMS['correlation_threshold'], help='סף קורלציה')
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    db_client = SupabaseClient()
+    if args.stocks:
+        stock_symbols = args.stocks
+    else:
+        stock_symbols = [s['symbol'] for s in db_client.get_stock_list(active_only=True)]
+    
+    index = PatternIndex(params={
+        'lookback_days': args.lookback_days,
+        'forward_days': args.forward_days,
+        'correlation_threshold': args.correlation_threshold,
+        'window_type': COMPUTATION_PARAMS['window_type']
+    })
+    total = index.build_from_db(db_client, stock_symbols)
+    
+    print(f"✅ נבנה אינדקס עם {total} snapshots עבור {len(stock_symbols)} מניות ({index.index_dir})")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,9 @@ import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-import pickle
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+from collections import deque
 from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
 import time
@@ -19,13 +19,21 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from data_fetcher import DataFetcher
 from correlation_engine import CorrelationEngine
-from .config import COMPUTATION_PARAMS, MULTIPROCESSING_CONFIG, PATHS
+from price_store import PriceCube
+from .config import COMPUTATION_PARAMS, SWEEP_PARAMS, MULTIPROCESSING_CONFIG, PATHS, CACHE_CONFIG
 from .db_client import SupabaseClient
+from .checkpoint import SnapshotJournal
+from .forward_returns import classify_movements, movement_labels
+from .trading_calendar import TradingCalendar
 from .utils import (
     classify_movement,
     calculate_correlation_for_date,
+    calculate_correlation_matrix_for_date,
+    calculate_correlation_matrices_for_date,
+    calculate_forward_returns,
     calculate_future_return,
-    create_pattern_signature
+    create_pattern_signature,
+    prepare_correlation_panel
 )
 
 logging.basicConfig(
@@ -40,63 +48,82 @@ class PreComputeEngine:
     מנוע Pre-Computation לחישוב כל הקורלציות ההיסטוריות
     """
     
-    def __init__(self):
-        """אתחול"""
-        self.data_fetcher = DataFetcher(cache_dir=PATHS['data_cache'])
-        self.db_client = SupabaseClient()
-        self.params = COMPUTATION_PARAMS
+    def __init__(self, connect: bool = True):
+        """
+        אתחול
         
-    def load_stock_data(self, symbols: List[str], start_date: str = "2012-01-01") -> pd.DataFrame:
+        Args:
+            connect: False = בלי DB ובלי DataFetcher (תהליכי worker שרק מחשבים)
+        """
+        self.params = COMPUTATION_PARAMS
+        self.data_fetcher = None
+        self.db_client = None
+        
+        if connect:
+            self.data_fetcher = DataFetcher(
+                cache_dir=PATHS['data_cache'],
+                max_cache_bytes=CACHE_CONFIG['price_store_max_bytes']
+            )
+            self.db_client = SupabaseClient()
+        
+    def load_stock_data(self,
+                        symbols: List[str],
+                        start_date: str = "2012-01-01",
+                        end_date: Optional[str] = None,
+                        fetch_missing: bool = True) -> pd.DataFrame:
         """
-        טעינת נתוני מניות מ-cache
+        טעינת נתוני מניות ממאגר המחירים, עם השלמה של טווחים חסרים
         
         Args:
             symbols: רשימת סימולים
             start_date: תאריך התחלה
+            end_date: תאריך סיום, לא כולל (None = עד הבר האחרון)
+            fetch_missing: האם להוריד מניות/טווחים שלא מכוסים במאגר
             
         Returns:
             DataFrame עם MultiIndex (symbol, field)
         """
         logger.info(f"📂 טוען נתונים עבור {len(symbols)} מניות...")
         
-        all_data = {}
-        failed = []
+        # הכיסוי נבדק לפי האינדקס של המאגר (לא לפי שם קובץ) ורק הפערים מורדים
+        stock_data = self.data_fetcher.resolve_history(
+            symbols, start_date, end_date, fetch_missing=fetch_missing
+        )
         
-        for symbol in tqdm(symbols, desc="טעינת נתונים"):
-            cache_file = os.path.join(PATHS['data_cache'], f"{symbol}_{start_date}_None.pkl")
-            
-            if os.path.exists(cache_file):
-                try:
-                    with open(cache_file, 'rb') as f:
-                        df = pickle.load(f)
-                    
-                    if df is not None and not df.empty:
-                        # שמירת רק שדות רלוונטיים
-                        for field in ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']:
-                            if field in df.columns:
-                                all_data[(symbol, field)] = df[field]
-                except Exception as e:
-                    logger.warning(f"⚠️ שגיאה בטעינת {symbol}: {e}")
-                    failed.append(symbol)
-            else:
-                failed.append(symbol)
+        loaded = set(stock_data.columns.get_level_values(0)) if not stock_data.empty else set()
+        failed = [s for s in symbols if s not in loaded]
         
         if failed:
             logger.warning(f"⚠️ {len(failed)} מניות לא נטענו: {failed[:10]}...")
         
-        if not all_data:
+        if stock_data.empty:
             raise ValueError("לא נמצאו נתונים!")
         
-        # יצירת DataFrame
-        stock_data = pd.DataFrame(all_data)
-        stock_data.index = pd.to_datetime(stock_data.index)
-        stock_data = stock_data.sort_index()
-        
         logger.info(f"✅ נטענו נתונים עבור {len(symbols) - len(failed)} מניות")
         logger.info(f"📅 טווח תאריכים: {stock_data.index[0]} עד {stock_data.index[-1]}")
         
         return stock_data
     
+    def build_price_cube(self, symbols: List[str], start_date: str = "2012-01-01") -> PriceCube:
+        """
+        ייצוא הנתונים לקובייה ממופת-זיכרון (float32) ש-workers יכולים לפתוח בלי pickle
+        
+        Args:
+            symbols: רשימת סימולים
+            start_date: תאריך התחלה
+            
+        Returns:
+            PriceCube פתוחה על PATHS['price_cube']
+        """
+        logger.info(f"🧊 מייצא קובייה עבור {len(symbols)} מניות...")
+        
+        cube = self.data_fetcher.store.export_cube(PATHS['price_cube'], symbols, start_date=start_date)
+        
+        n_fields, n_dates, n_symbols = cube.shape
+        logger.info(f"✅ קובייה נשמרה: {n_symbols} מניות × {n_dates} ימים × {n_fields} שדות ({PATHS['price_cube']}.npy)")
+        
+        return cube
+    
     def compute_snapshots_for_stock(self, 
                                     stock_data: pd.DataFrame,
                                     stock: str,
@@ -121,9 +148,16 @@ class PreComputeEngine:
             רשימת snapshots
         """
         snapshots = []
+        calendar = TradingCalendar.from_frame(stock_data)
         
         for date in dates:
             try:
+                # מיקום השורה פעם אחת לתאריך
+                date_idx = calendar.position(date)
+                if date_idx is None:
+                    logger.warning(f"⚠️ {date} אינו יום מסחר בנתונים - מדלג")
+                    continue
+                
                 # חישוב קורלציות עם כל המניות האחרות
                 matched_stocks = []
                 
@@ -133,13 +167,13 @@ class PreComputeEngine:
                     
                     # קורלציית מחיר
                     corr_price = calculate_correlation_for_date(
-                        stock_data, stock, other_stock, date,
+                        stock_data, stock, other_stock, date_idx,
                         lookback_days, 'Adj Close'
                     )
                     
                     # קורלציית נפח
                     corr_volume = calculate_correlation_for_date(
-                        stock_data, stock, other_stock, date,
+                        stock_data, stock, other_stock, date_idx,
                         lookback_days, 'Volume'
                     )
                     
@@ -159,7 +193,7 @@ class PreComputeEngine:
                 
                 # חישוב תנועה עתידית
                 future_return = calculate_future_return(
-                    stock_data, stock, date, forward_days, 'Adj Close'
+                    stock_data, stock, date_idx, forward_days, 'Adj Close'
                 )
                 
                 movement_type = None
@@ -190,15 +224,234 @@ class PreComputeEngine:
         
         return snapshots
     
+    def build_correlation_panels(self,
+                                 stock_data: pd.DataFrame,
+                                 symbols: List[str]) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        הכנת מטריצות Adj Close ו-Volume (dates × symbols) לקרנל הקורלציה לפי תאריך
+        
+        Args:
+            stock_data: DataFrame עם MultiIndex (symbol, field)
+            symbols: סדר המניות (שורות ועמודות של מטריצות הקורלציה)
+            
+        Returns:
+            Dict שדה -> פלט של prepare_correlation_panel
+        """
+        panels = {}
+        for field in ('Adj Close', 'Volume'):
+            # מניה בלי השדה = עמודה של NaN (כמו None ב-calculate_correlation_for_date)
+            columns = pd.MultiIndex.from_tuples([(symbol, field) for symbol in symbols])
+            values = stock_data.reindex(columns=columns).to_numpy(dtype=np.float64)
+            panels[field] = prepare_correlation_panel(values)
+        return panels
+    
+    def _snapshots_for_date(self,
+                            date: datetime,
+                            symbols: List[str],
+                            corr_price: Optional[np.ndarray],
+                            corr_volume: Optional[np.ndarray],
+                            future_returns: Dict[int, Tuple[np.ndarray, np.ndarray]],
+                            lookback_days: int,
+                            thresholds: List[float]) -> List[Dict[str, Any]]:
+        """
+        בניית snapshots לתאריך אחד ו-lookback אחד מתוך מטריצות הקורלציה
+        
+        רשימות ההתאמות תלויות רק בסף, והתוצאה רק באופק - לכן כל רשימה נבנית פעם אחת
+        לכל סף ומשותפת לכל ה-forward_days.
+        
+        Args:
+            date: תאריך ה-snapshot
+            symbols: רשימת כל הסימולים
+            corr_price: מטריצת קורלציית מחיר (None = אין מספיק היסטוריה)
+            corr_volume: מטריצת קורלציית נפח
+            future_returns: forward_days -> (תשואה עתידית, קוד סיווג) לכל מניה (NaN / -1 = לא ידועה)
+            lookback_days: ימים אחורה
+            thresholds: ספי קורלציה
+            
+        Returns:
+            רשימת snapshots (מניה × סף × אופק)
+        """
+        if corr_price is None:
+            # אין מספיק היסטוריה - אף זוג לא עובר
+            corr_price = corr_volume = np.full((len(symbols), len(symbols)), np.nan)
+        
+        # NaN לא עובר את הסף; בהתאמה מדווח 0.0 לקורלציה לא מוגדרת
+        price_values = np.nan_to_num(corr_price)
+        volume_values = np.nan_to_num(corr_volume)
+        
+        # תוצאה לכל אופק - פעם אחת לכל מניה
+        outcomes = {}
+        for forward_days, (returns, codes) in future_returns.items():
+            outcomes[forward_days] = [
+                (None, None) if movement_type is None else (value, movement_type)
+                for value, movement_type in zip(returns.tolist(), movement_labels(codes))
+            ]
+        
+        snapshot_date = date.strftime('%Y-%m-%d')
+        snapshots = []
+        
+        for correlation_threshold in thresholds:
+            matches = (corr_price >= correlation_threshold) | (corr_volume >= correlation_threshold)
+            
+            # קורלציה סימטרית - כל זוג (i < j) נבדק פעם אחת וממלא את רשימות שתי המניות.
+            # הזוגות ממוינים לפי (i, j), כך שכל רשימה נבנית לפי סדר הסימולים.
+            matched_lists = [[] for _ in symbols]
+            rows, cols = np.nonzero(np.triu(matches, k=1))
+            for i, j in zip(rows.tolist(), cols.tolist()):
+                corr_p = float(price_values[i, j])
+                corr_v = float(volume_values[i, j])
+                matched_lists[i].append({'symbol': symbols[j], 'corr_price': corr_p, 'corr_volume': corr_v})
+                matched_lists[j].append({'symbol': symbols[i], 'corr_price': corr_p, 'corr_volume': corr_v})
+            
+            for forward_days, stock_outcomes in outcomes.items():
+                for stock, matched_stocks, (future_return, movement_type) in zip(symbols, matched_lists, stock_outcomes):
+                    snapshots.append({
+                        'snapshot_date': snapshot_date,
+                        'stock_symbol': stock,
+                        'matched_stocks': matched_stocks,
+                        'num_matches': len(matched_stocks),
+                        'future_return_pct': future_return,
+                        'movement_type': movement_type,
+                        'lookback_days': lookback_days,
+                        'forward_days': forward_days,
+                        'correlation_threshold': correlation_threshold
+                    })
+        
+        return snapshots
+    
+    def compute_snapshots_for_date(self,
+                                   stock_data: pd.DataFrame,
+                                   panels: Dict[str, Dict[str, np.ndarray]],
+                                   date_idx: int,
+                                   symbols: List[str],
+                                   lookback_days: int,
+                                   forward_days: int,
+                                   correlation_threshold: float) -> List[Dict[str, Any]]:
+        """
+        חישוב snapshots לכל המניות בתאריך אחד מתוך מטריצת קורלציות N×N
+        
+        תוצאה זהה ל-compute_snapshots_for_stock לכל מניה, אבל כל הקורלציות של התאריך
+        מחושבות בבת אחת (מחיר ונפח), ורשימת ההתאמות של מניה היא סף על השורה שלה.
+        
+        Args:
+            stock_data: DataFrame עם כל הנתונים
+            panels: פלט של build_correlation_panels עבור symbols
+            date_idx: מיקום התאריך באינדקס של stock_data
+            symbols: רשימת כל הסימולים
+            lookback_days: ימים אחורה
+            forward_days: ימים קדימה
+            correlation_threshold: סף קורלציה
+            
+        Returns:
+            רשימת snapshots (אחד לכל מניה)
+        """
+        # מחיר בתאריך ובעוד forward_days שורות
+        columns = pd.MultiIndex.from_tuples([(symbol, 'Adj Close') for symbol in symbols])
+        prices = stock_data.iloc[date_idx:date_idx + forward_days + 1].reindex(columns=columns).to_numpy(dtype=np.float64)
+        returns = calculate_forward_returns(prices, forward_days)[0]
+        
+        return self._snapshots_for_date(
+            stock_data.index[date_idx], symbols,
+            calculate_correlation_matrix_for_date(panels['Adj Close'], date_idx, lookback_days),
+            calculate_correlation_matrix_for_date(panels['Volume'], date_idx, lookback_days),
+            {forward_days: (returns, classify_movements(returns, self.params['movement_thresholds']))},
+            lookback_days, [correlation_threshold]
+        )
+    
+    def compute_sweep_chunk(self,
+                            stock_data: pd.DataFrame,
+                            symbols: List[str],
+                            date_positions: List[int],
+                            lookbacks: List[int],
+                            forwards: List[int],
+                            thresholds: List[float]) -> List[Dict[str, Any]]:
+        """
+        חישוב snapshots לטווח תאריכים (chunk אחד) לכל שילובי הפרמטרים
+        
+        לכל תאריך הסכומים של החלון מצטברים פעם אחת לכל ה-lookbacks, הספים הם רק סינון
+        של אותן מטריצות, והתשואות וסיווג התנועה לכל אופק מחושבים פעם אחת ל-chunk.
+        המטריצות נבנות רק על השורות שה-chunk צריך: ה-lookback הארוך לפני התאריך הראשון
+        ועד האופק הארוך אחרי האחרון.
+        
+        Args:
+            stock_data: DataFrame עם כל הנתונים
+            symbols: רשימת כל הסימולים
+            date_positions: מיקומי התאריכים באינדקס של stock_data (עולים)
+            lookbacks: ימים אחורה
+            forwards: ימים קדימה
+            thresholds: ספי קורלציה
+            
+        Returns:
+            רשימת snapshots
+        """
+        first = max(0, date_positions[0] - max(lookbacks) + 1)
+        last = min(len(stock_data.index), date_positions[-1] + max(forwards) + 1)
+        window_data = stock_data.iloc[first:last]
+        panels = self.build_correlation_panels(window_data, symbols)
+        
+        columns = pd.MultiIndex.from_tuples([(symbol, 'Adj Close') for symbol in symbols])
+        prices = window_data.reindex(columns=columns).to_numpy(dtype=np.float64)
+        forward_returns = {}
+        for forward_days in forwards:
+            returns = calculate_forward_returns(prices, forward_days)
+            forward_returns[forward_days] = (returns, classify_movements(returns, self.params['movement_thresholds']))
+        
+        snapshots = []
+        for date_idx in date_positions:
+            local_idx = date_idx - first
+            try:
+                corr_price = calculate_correlation_matrices_for_date(panels['Adj Close'], local_idx, lookbacks)
+                corr_volume = calculate_correlation_matrices_for_date(panels['Volume'], local_idx, lookbacks)
+                future_returns = {f: (returns[local_idx], codes[local_idx]) for f, (returns, codes) in forward_returns.items()}
+                
+                for lookback_days in lookbacks:
+                    snapshots.extend(self._snapshots_for_date(
+                        window_data.index[local_idx], symbols,
+                        corr_price[lookback_days], corr_volume[lookback_days],
+                        future_returns, lookback_days, thresholds
+                    ))
+            except Exception as e:
+                logger.warning(f"⚠️ שגיאה בחישוב snapshots ב-{stock_data.index[date_idx]}: {e}")
+        
+        return snapshots
+    
+    def compute_snapshot_chunk(self,
+                               stock_data: pd.DataFrame,
+                               symbols: List[str],
+                               date_positions: List[int],
+                               lookback_days: int,
+                               forward_days: int,
+                               correlation_threshold: float) -> List[Dict[str, Any]]:
+        """
+        חישוב snapshots לטווח תאריכים (chunk אחד) עם שילוב פרמטרים אחד
+        
+        Args:
+            stock_data: DataFrame עם כל הנתונים
+            symbols: רשימת כל הסימולים
+            date_positions: מיקומי התאריכים באינדקס של stock_data (עולים)
+            lookback_days: ימים אחורה
+            forward_days: ימים קדימה
+            correlation_threshold: סף קורלציה
+            
+        Returns:
+            רשימת snapshots
+        """
+        return self.compute_sweep_chunk(
+            stock_data, symbols, date_positions,
+            [lookback_days], [forward_days], [correlation_threshold]
+        )
+    
     def compute_all_snapshots(self,
                             stock_data: pd.DataFrame,
                             start_date: Optional[str] = None,
                             end_date: Optional[str] = None,
                             lookback_days: Optional[int] = None,
                             forward_days: Optional[int] = None,
-                            correlation_threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+                            correlation_threshold: Optional[float] = None,
+                            max_workers: Optional[int] = None,
+                            resume: bool = False) -> Dict[str, int]:
         """
-        חישוב כל ה-snapshots
+        חישוב ושמירה של כל ה-snapshots לשילוב פרמטרים אחד (ברירת מחדל: COMPUTATION_PARAMS)
         
         Args:
             stock_data: DataFrame עם כל הנתונים
@@ -207,84 +460,232 @@ class PreComputeEngine:
             lookback_days: ימים אחורה
             forward_days: ימים קדימה
             correlation_threshold: סף קורלציה
+            max_workers: מספר תהליכים (ברירת מחדל: MULTIPROCESSING_CONFIG, 1 = בתהליך הנוכחי)
+            resume: המשך ריצה קודמת עם אותם פרמטרים ומניות (דילוג על chunks שהושלמו)
             
         Returns:
-            רשימת כל ה-snapshots
+            ספירות (ראה compute_parameter_sweep)
+        """
+        return self.compute_parameter_sweep(
+            stock_data,
+            [lookback_days or self.params['lookback_days']],
+            [forward_days or self.params['forward_days']],
+            [correlation_threshold or self.params['correlation_threshold']],
+            start_date=start_date,
+            end_date=end_date,
+            max_workers=max_workers,
+            resume=resume
+        )
+    
+    def compute_parameter_sweep(self,
+                                stock_data: pd.DataFrame,
+                                lookbacks: List[int],
+                                forwards: List[int],
+                                thresholds: List[float],
+                                start_date: Optional[str] = None,
+                                end_date: Optional[str] = None,
+                                max_workers: Optional[int] = None,
+                                resume: bool = False) -> Dict[str, int]:
         """
-        # פרמטרים
-        lookback_days = lookback_days or self.params['lookback_days']
-        forward_days = forward_days or self.params['forward_days']
-        correlation_threshold = correlation_threshold or self.params['correlation_threshold']
+        חישוב ושמירה של snapshots לכל שילובי הפרמטרים (lookback × forward × סף) בריצה אחת
+        
+        לכל תאריך הסכומים של החלון מצטברים פעם אחת לכל ה-lookbacks, והספים והאופקים
+        הם סינון זול של אותן מטריצות ותשואות. כל שילוב נשמר בשורות משלו (המפתח כולל את
+        הפרמטרים), כך שה-API יכול להגיש כל בחירה של הסליידרים מנתונים מחושבים מראש.
+        
+        התאריכים מחולקים ל-chunks רציפים; בסריקה של כמה שילובים ה-chunk קטן פי מספר
+        השילובים, כך שמספר ה-snapshots ל-chunk נשאר כמו בשילוב יחיד. עם יותר מ-worker
+        אחד, ה-chunks רצים ב-Pool של תהליכים שפותחים את הנתונים מקובייה ממופת-זיכרון
+        (PATHS['price_cube']) במקום לקבל את ה-DataFrame ב-pickle, ולכל היותר שני chunks
+        לכל worker ממתינים לכתיבה. התהליך הראשי הוא הכותב היחיד ל-DB.
         
-        # תאריכים
-        all_dates = stock_data.index.tolist()
+        כל chunk נשמר ב-DB ונרשם ביומן (SnapshotJournal, לפי hash_params) ברגע שהושלם,
+        ואז משוחרר - שום דבר לא מצטבר לאורך הריצה. resume=True מדלג על chunks שהושלמו.
+        השמירה היא upsert, ולכן chunk שמחושב שוב לא משכפל שורות.
+        
+        Args:
+            stock_data: DataFrame עם כל הנתונים
+            lookbacks: ימים אחורה
+            forwards: ימים קדימה
+            thresholds: ספי קורלציה
+            start_date: תאריך התחלה (ברירת מחדל: אחרי ה-lookback הארוך)
+            end_date: תאריך סיום (ברירת מחדל: היום)
+            max_workers: מספר תהליכים (ברירת מחדל: MULTIPROCESSING_CONFIG, 1 = בתהליך הנוכחי)
+            resume: המשך ריצה קודמת עם אותם פרמטרים ומניות (דילוג על chunks שהושלמו)
+            
+        Returns:
+            Dict עם snapshots (נשמרו), chunks (חושבו), skipped_chunks (הושלמו בריצה קודמת)
+            ו-failed_chunks
+        """
+        lookbacks = sorted(set(lookbacks))
+        forwards = sorted(set(forwards))
+        thresholds = sorted(set(thresholds))
+        
+        combos = len(lookbacks) * len(forwards) * len(thresholds)
+        if combos > 1:
+            logger.info(f"🧮 סריקת פרמטרים: lookback {lookbacks}, forward {forwards}, סף {thresholds}")
+        
+        # תאריכים - מיקומי שורות מלוח ימי המסחר
+        calendar = TradingCalendar.from_frame(stock_data)
         
         if start_date:
             start_date = pd.to_datetime(start_date)
         else:
             # יום 16 (צריך lookback_days נתונים)
-            start_date = all_dates[lookback_days - 1] if len(all_dates) > lookback_days else all_dates[0]
+            start_date = calendar.date(max(lookbacks) - 1) if len(calendar) > max(lookbacks) else calendar.date(0)
         
         if end_date:
             end_date = pd.to_datetime(end_date)
         else:
-            end_date = all_dates[-1]
-        
-        # סינון תאריכים
-        dates = [d for d in all_dates if start_date <= d <= end_date]
+            end_date = calendar.date(-1)
         
         # צריך לפחות forward_days אחרי התאריך האחרון
-        if len(all_dates) > 0:
-            last_available_date = all_dates[-1]
-            max_date = last_available_date - timedelta(days=forward_days)
-            dates = [d for d in dates if d <= max_date]
+        end_date = min(end_date, calendar.date(-1) - timedelta(days=max(forwards)))
         
-        logger.info(f"📅 מחשב snapshots עבור {len(dates)} תאריכים")
-        logger.info(f"   מ-{dates[0]} עד {dates[-1]}")
+        date_positions = calendar.between(start_date, end_date).tolist()
+        
+        logger.info(f"📅 מחשב snapshots עבור {len(date_positions)} תאריכים")
+        logger.info(f"   מ-{calendar.date(date_positions[0])} עד {calendar.date(date_positions[-1])}")
         
         # מניות
         symbols = stock_data.columns.get_level_values(0).unique().tolist()
         logger.info(f"📊 מחשב עבור {len(symbols)} מניות")
         
-        # חישוב
-        all_snapshots = []
-        
         # Multiprocessing
-        max_workers = MULTIPROCESSING_CONFIG['max_workers']
-        chunk_size = MULTIPROCESSING_CONFIG['chunk_size']
-        
-        # חלוקה ל-chunks
-        stock_chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
-        
-        logger.info(f"⚙️ משתמש ב-{max_workers} workers, {len(stock_chunks)} chunks")
+        max_workers = max_workers or MULTIPROCESSING_CONFIG['max_workers']
+        chunk_size = max(1, MULTIPROCESSING_CONFIG['chunk_size'] // combos)
+        
+        # חלוקה ל-chunks של תאריכים (כל תאריך = snapshots לכל המניות ולכל שילובי הפרמטרים)
+        date_chunks = [date_positions[i:i + chunk_size] for i in range(0, len(date_positions), chunk_size)]
+        units = [
+            f"{stock_data.index[chunk[0]]:%Y-%m-%d}:{stock_data.index[chunk[-1]]:%Y-%m-%d}"
+            for chunk in date_chunks
+        ]
+        
+        # יומן checkpoints לפי hash_params - chunk שהושלם בריצה קודמת לא מחושב שוב.
+        # שילוב יחיד נרשם עם הערכים עצמם, כך שה-hash זהה ל-hash_params של אותו שילוב.
+        def grid_value(values):
+            return values[0] if len(values) == 1 else values
+        
+        journal = SnapshotJournal(
+            PATHS['precompute_journal'],
+            {
+                'lookback_days': grid_value(lookbacks),
+                'forward_days': grid_value(forwards),
+                'correlation_threshold': grid_value(thresholds),
+                'window_type': self.params['window_type']
+            },
+            symbols,
+            resume=resume
+        )
         
-        for chunk_idx, stock_chunk in enumerate(stock_chunks):
-            logger.info(f"📦 מעבד chunk {chunk_idx + 1}/{len(stock_chunks)} ({len(stock_chunk)} מניות)")
-            
-            chunk_snapshots = []
+        tasks = [
+            (chunk_idx, chunk, lookbacks, forwards, thresholds)
+            for chunk_idx, chunk in enumerate(date_chunks)
+            if not journal.is_done(units[chunk_idx])
+        ]
+        if len(tasks) < len(date_chunks):
+            logger.info(f"⏭️ מדלג על {len(date_chunks) - len(tasks)} chunks שהושלמו")
+        
+        workers = max(1, min(max_workers, len(tasks)))
+        logger.info(f"⚙️ משתמש ב-{workers} workers, {len(tasks)} chunks")
+        
+        if not tasks:
+            pool = None
+            results = iter(())
+        elif workers > 1:
+            # קובייה ממופת-זיכרון שכל ה-workers פותחים לקריאה בלבד. float64 - כמו stock_data
+            # בתהליך הנוכחי, כך שה-snapshots לא תלויים במספר ה-workers (קורלציה ליד הסף,
+            # ונפחים בסדר גודל 1e9 שמאבדים ספרות ב-float32)
+            cube = PriceCube.build(PATHS['price_cube'], stock_data, ['Adj Close', 'Volume'], dtype=np.float64)
+            pool = Pool(
+                processes=workers,
+                initializer=_init_snapshot_worker,
+                initargs=(cube.path, symbols, self.params)
+            )
+            results = _bounded_imap(pool, _compute_snapshot_chunk, tasks, 2 * workers)
+        else:
+            pool = None
             
-            for stock in tqdm(stock_chunk, desc=f"Chunk {chunk_idx + 1}"):
-                snapshots = self.compute_snapshots_for_stock(
-                    stock_data, stock, dates, symbols,
-                    lookback_days, forward_days, correlation_threshold
-                )
-                chunk_snapshots.extend(snapshots)
+            def run_chunk(task):
+                try:
+                    return task[0], self.compute_sweep_chunk(stock_data, symbols, *task[1:]), None
+                except Exception as e:
+                    return task[0], [], str(e)
             
-            # שמירה ל-DB
-            if chunk_snapshots:
-                logger.info(f"💾 שומר {len(chunk_snapshots)} snapshots ל-DB...")
-                self.db_client.insert_correlation_snapshots(chunk_snapshots)
-                all_snapshots.extend(chunk_snapshots)
+            results = map(run_chunk, tasks)
+        
+        # כותב יחיד: כל chunk נשמר ונרשם ביומן ברגע שהושלם
+        saved = 0
+        failed_chunks = []
         
-        logger.info(f"✅ הושלם! נוצרו {len(all_snapshots)} snapshots")
+        try:
+            for done, (chunk_idx, chunk_snapshots, error) in enumerate(tqdm(results, total=len(tasks), desc="Chunks"), 1):
+                chunk_dates = date_chunks[chunk_idx]
+                date_range = f"{stock_data.index[chunk_dates[0]].date()} - {stock_data.index[chunk_dates[-1]].date()}"
+                
+                if error:
+                    failed_chunks.append(chunk_idx)
+                    journal.mark_failed([units[chunk_idx]], error)
+                    logger.error(f"❌ chunk {chunk_idx + 1} ({date_range}) נכשל: {error}")
+                    continue
+                
+                logger.info(f"📦 chunk {chunk_idx + 1} ({date_range}) הושלם - {len(chunk_snapshots)} snapshots [{done}/{len(tasks)}]")
+                
+                # chunk נרשם כהושלם רק אחרי שנשמר; מה שנכשל פעמיים יחושב מחדש ב---resume
+                stored = self._flush_snapshots(chunk_snapshots)
+                if not stored:
+                    logger.info(f"🔁 מנסה שוב לשמור {len(chunk_snapshots)} snapshots...")
+                    stored = self._flush_snapshots(chunk_snapshots)
+                
+                if stored:
+                    journal.mark_done({units[chunk_idx]: len(chunk_snapshots)})
+                    saved += len(chunk_snapshots)
+                else:
+                    failed_chunks.append(chunk_idx)
+                    journal.mark_failed([units[chunk_idx]], 'insert failed')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        
+        if failed_chunks:
+            logger.warning(f"⚠️ {len(failed_chunks)} chunks נכשלו: {sorted(i + 1 for i in failed_chunks)}")
+            logger.warning(f"   הרץ שוב עם --resume כדי להשלים רק אותם ({journal.path})")
+        
+        logger.info(f"✅ הושלם! נשמרו {saved} snapshots")
+        
+        return {
+            'snapshots': saved,
+            'chunks': len(tasks),
+            'skipped_chunks': len(date_chunks) - len(tasks),
+            'failed_chunks': len(failed_chunks),
+        }
+    
+    def _flush_snapshots(self, snapshots: List[Dict[str, Any]]) -> bool:
+        """
+        שמירת batch של snapshots ל-DB
         
-        return all_snapshots
+        Returns:
+            True אם נשמר (או שאין מה לשמור)
+        """
+        if not snapshots:
+            return True
+        
+        logger.info(f"💾 שומר {len(snapshots)} snapshots ל-DB...")
+        if not self.db_client.insert_correlation_snapshots(snapshots):
+            logger.error(f"❌ שמירת {len(snapshots)} snapshots נכשלה")
+            return False
+        return True
     
     def run(self, 
            symbols: Optional[List[str]] = None,
            start_date: Optional[str] = None,
            end_date: Optional[str] = None,
-           test_mode: bool = False):
+           test_mode: bool = False,
+           max_workers: Optional[int] = None,
+           resume: bool = False,
+           sweep: Optional[Dict[str, List]] = None):
         """
         הרצת Pre-Computation מלא
         
@@ -293,6 +694,9 @@ class PreComputeEngine:
             start_date: תאריך התחלה
             end_date: תאריך סיום
             test_mode: אם True, רץ רק על 10 מניות לבדיקה
+            max_workers: מספר תהליכים (ברירת מחדל: MULTIPROCESSING_CONFIG)
+            resume: המשך ריצה קודמת שנקטעה (לפי יומן ה-checkpoints)
+            sweep: רשת פרמטרים (lookbacks, forwards, thresholds) במקום COMPUTATION_PARAMS
         """
         logger.info("🚀 מתחיל Pre-Computation Engine...")
         
@@ -313,17 +717,92 @@ class PreComputeEngine:
         # טעינת נתונים
         stock_data = self.load_stock_data(symbols, start_date or "2012-01-01")
         
-        # חישוב snapshots
-        snapshots = self.compute_all_snapshots(
-            stock_data,
-            start_date=start_date,
-            end_date=end_date
-        )
+        # חישוב ושמירת snapshots
+        if sweep:
+            stats = self.compute_parameter_sweep(
+                stock_data,
+                sweep['lookbacks'],
+                sweep['forwards'],
+                sweep['thresholds'],
+                start_date=start_date,
+                end_date=end_date,
+                max_workers=max_workers,
+                resume=resume
+            )
+        else:
+            stats = self.compute_all_snapshots(
+                stock_data,
+                start_date=start_date,
+                end_date=end_date,
+                max_workers=max_workers,
+                resume=resume
+            )
         
         logger.info(f"✅ Pre-Computation הושלם בהצלחה!")
-        logger.info(f"   📊 {len(snapshots)} snapshots נשמרו ב-DB")
+        logger.info(f"   📊 {stats['snapshots']} snapshots נשמרו ב-DB")
         
-        return snapshots
+        return stats
+
+
+def _bounded_imap(pool: Pool, func, tasks: List[tuple], limit: int):
+    """
+    כמו pool.imap, אבל עם לכל היותר limit משימות שנשלחו ועוד לא נקראו
+    
+    imap רגיל שולח את כל המשימות מראש, ואם הכתיבה ל-DB איטית מהחישוב - כל התוצאות
+    מצטברות בזיכרון של התהליך הראשי.
+    """
+    in_flight = deque()
+    for task in tasks:
+        in_flight.append(pool.apply_async(func, (task,)))
+        if len(in_flight) >= limit:
+            yield in_flight.popleft().get()
+    while in_flight:
+        yield in_flight.popleft().get()
+
+
+# מצב של תהליך worker - נפתח פעם אחת ב-initializer ומשמש את כל ה-chunks שלו
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_snapshot_worker(cube_path: str, symbols: List[str], params: Dict[str, Any]):
+    """
+    אתחול תהליך worker: פתיחת הקובייה (mmap, קריאה בלבד) ומנוע בלי DB
+    """
+    engine = PreComputeEngine(connect=False)
+    engine.params = params
+    
+    _WORKER_STATE['cube'] = PriceCube(cube_path)
+    _WORKER_STATE['symbols'] = symbols
+    _WORKER_STATE['engine'] = engine
+
+
+def _compute_snapshot_chunk(task: tuple) -> tuple:
+    """
+    חישוב chunk של תאריכים בתהליך worker
+    
+    Args:
+        task: (chunk_idx, date_positions, lookbacks, forwards, thresholds)
+        
+    Returns:
+        (chunk_idx, snapshots, שגיאה או None)
+    """
+    chunk_idx, date_positions, lookbacks, forwards, thresholds = task
+    cube = _WORKER_STATE['cube']
+    symbols = _WORKER_STATE['symbols']
+    
+    try:
+        # רק השורות שה-chunk צריך מועתקות מה-mmap
+        first = max(0, date_positions[0] - max(lookbacks) + 1)
+        last = min(len(cube.dates), date_positions[-1] + max(forwards) + 1)
+        stock_data = cube.to_frame(['Adj Close', 'Volume'], symbols, rows=slice(first, last))
+        
+        snapshots = _WORKER_STATE['engine'].compute_sweep_chunk(
+            stock_data, symbols, [p - first for p in date_positions],
+            lookbacks, forwards, thresholds
+        )
+        return chunk_idx, snapshots, None
+    except Exception as e:
+        return chunk_idx, [], str(e)
 
 
 def main():
@@ -335,15 +814,39 @@ def main():
     parser.add_argument('--start-date', type=str, help='תאריך התחלה (YYYY-MM-DD)')
     parser.add_argument('--end-date', type=str, help='תאריך סיום (YYYY-MM-DD)')
     parser.add_argument('--symbols', nargs='+', help='רשימת מניות ספציפית')
+    parser.add_argument('--workers', type=int, help='מספר תהליכים (1 = בלי Pool)')
+    parser.add_argument('--resume', action='store_true', help='המשך ריצה שנקטעה (מדלג על chunks שהושלמו)')
+    parser.add_argument('--sweep', action='store_true', help='חישוב כל רשת הפרמטרים (SWEEP_PARAMS)')
+    parser.add_argument('--lookbacks', type=int, nargs='+', help='ערכי lookback לסריקה')
+    parser.add_argument('--forwards', type=int, nargs='+', help='ערכי forward לסריקה')
+    parser.add_argument('--thresholds', type=float, nargs='+', help='ספי קורלציה לסריקה')
+    parser.add_argument('--build-cube', action='store_true', help='רק ייצוא קובייה ממופת-זיכרון מהמאגר')
     
     args = parser.parse_args()
     
     engine = PreComputeEngine()
+    
+    if args.build_cube:
+        symbols = args.symbols or engine.data_fetcher.store.symbols()
+        engine.build_price_cube(symbols, args.start_date or "2012-01-01")
+        return
+    
+    sweep = None
+    if args.sweep:
+        sweep = {
+            'lookbacks': args.lookbacks or SWEEP_PARAMS['lookbacks'],
+            'forwards': args.forwards or SWEEP_PARAMS['forwards'],
+            'thresholds': args.thresholds or SWEEP_PARAMS['thresholds'],
+        }
+    
     engine.run(
         symbols=args.symbols,
         start_date=args.start_date,
         end_date=args.end_date,
-        test_mode=args.test
+        test_mode=args.test,
+        max_workers=args.workers,
+        resume=args.resume,
+        sweep=sweep
     )
 
 
@@ -0,0 +1,224 @@
+"""
+אינדקס דמיון מקומי ל-snapshots - חיפוש מקרים דומים בלי calculate_similarity לכל snapshot
+"""
+
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+# משקלי calculate_similarity: 0.6 * Jaccard + 0.4 * קרבת קורלציות
+JACCARD_WEIGHT = 0.6
+CORR_WEIGHT = 0.4
+
+# טווח שורות קטן מזה נסרק ישירות עם popcount במקום דרך ה-postings
+SCAN_ROWS = 4096
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return _BYTE_POPCOUNT[words.view(np.uint8)].reshape(words.shape[:-1] + (-1,)).sum(axis=-1, dtype=np.int64)
+
+
+def _encode(symbol_bit: Dict[str, int], matched: List[Dict[str, float]]) -> Dict[int, float]:
+    """
+    matched_stocks -> {ביט: corr_price} ממוין (מניה שמופיעה פעמיים - הערך האחרון, כמו ב-calculate_similarity)
+    """
+    encoded = {}
+    for m in matched:
+        bit = symbol_bit.get(m['symbol'])
+        if bit is not None:
+            encoded[bit] = m.get('corr_price', 0)
+    return dict(sorted(encoded.items()))
+
+
+class SimilarityIndex:
+    """
+    אינדקס של רשימות התאמות (matched_stocks) עבור חיפוש דמיון
+    
+    כל snapshot נשמר כ-bitset (ביט לכל מניה ביקום) ובנוסף ב-postings הפוכים
+    מניה -> snapshots. שאילתה מוצאת מועמדים דרך ה-postings, מחשבת Jaccard עם
+    popcount על ה-bitsets, ומחשבת את רכיב הקורלציות רק לשורדים:
+    מכיוון שרכיב הקורלציות ≤ 1, דמיון > min_similarity מחייב
+    Jaccard > (min_similarity - 0.4) / 0.6.
+    הציון זהה ל-calculate_similarity.
+    """
+    
+    def __init__(self,
+                 universe: List[str],
+                 indptr: np.ndarray,
+                 indices: np.ndarray,
+                 corrs: np.ndarray,
+                 snapshot_dates: Optional[np.ndarray] = None,
+                 future_returns: Optional[np.ndarray] = None):
+        """
+        בנייה ממערכים עמודתיים (CSR): ההתאמות של snapshot k הן indices[indptr[k]:indptr[k + 1]]
+        
+        Args:
+            universe: כל המניות האפשריות ב-matched_stocks (מזהה = מיקום ברשימה)
+            indptr: גבולות השורות (size + 1)
+            indices: מזהי המניות המותאמות - ממוינים וללא כפילויות בכל שורה
+            corrs: corr_price לכל התאמה
+            snapshot_dates: תאריך לכל snapshot (YYYY-MM-DD, ממוינים אם מחפשים לפי תאריך)
+            future_returns: future_return_pct לכל snapshot (NaN = לא ידועה)
+        """
+        self.universe = list(universe)
+        self._symbol_bit = {symbol: i for i, symbol in enumerate(self.universe)}
+        self.words = max(1, (len(self.universe) + 63) // 64)
+        
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.corrs = np.asarray(corrs, dtype=np.float64)
+        self.counts = np.diff(self.indptr)
+        
+        size = len(self.counts)
+        self.snapshot_dates = np.asarray(snapshot_dates if snapshot_dates is not None else [''] * size, dtype=str)
+        self.future_returns = np.asarray(
+            future_returns if future_returns is not None else np.full(size, np.nan),
+            dtype=np.float64
+        )
+        
+        # bitsets (ביט לכל מניה ביקום)
+        rows = np.repeat(np.arange(size, dtype=np.int64), self.counts)
+        self.bits = np.zeros((size, self.words), dtype=np.uint64)
+        np.bitwise_or.at(self.bits, (rows, self.indices >> 6), np.uint64(1) << (self.indices & 63).astype(np.uint64))
+        
+        # postings נבנים רק בשאילתה הראשונה שצריכה אותם
+        self._postings_rows: Optional[np.ndarray] = None
+        self._postings_ptr: Optional[np.ndarray] = None
+    
+    @classmethod
+    def from_snapshots(cls,
+                       snapshots: List[Dict[str, Any]],
+                       universe: Optional[List[str]] = None) -> 'SimilarityIndex':
+        """
+        בנייה מ-snapshots (כמו שחוזרים מ-get_correlation_snapshots)
+        
+        Args:
+            snapshots: רשימת snapshots
+            universe: יקום המניות (ברירת מחדל: כל המניות שמופיעות ב-matched_stocks)
+        """
+        matched_lists = [s.get('matched_stocks') or [] for s in snapshots]
+        if universe is None:
+            universe = sorted({m['symbol'] for matched in matched_lists for m in matched})
+        symbol_bit = {symbol: i for i, symbol in enumerate(universe)}
+        
+        indptr = np.zeros(len(matched_lists) + 1, dtype=np.int64)
+        indices = []
+        corrs = []
+        for row, matched in enumerate(matched_lists):
+            encoded = _encode(symbol_bit, matched)
+            indices.extend(encoded)
+            corrs.extend(encoded.values())
+            indptr[row + 1] = len(indices)
+        
+        return cls(
+            universe, indptr, indices, corrs,
+            [s['snapshot_date'] for s in snapshots],
+            [np.nan if s.get('future_return_pct') is None else s['future_return_pct'] for s in snapshots]
+        )
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+    
+    def _build_postings(self):
+        """
+        postings: מניה -> שורות (ממוינות)
+        """
+        rows = np.repeat(np.arange(len(self), dtype=np.int64), self.counts)
+        order = np.argsort(self.indices, kind='stable')
+        self._postings_rows = rows[order]
+        self._postings_ptr = np.searchsorted(self.indices[order], np.arange(len(self.universe) + 1))
+    
+    def matched_stocks(self, row: int) -> List[Dict[str, float]]:
+        """
+        רשימת ההתאמות של snapshot (symbol, corr_price)
+        """
+        lo, hi = self.indptr[row], self.indptr[row + 1]
+        return [
+            {'symbol': self.universe[i], 'corr_price': corr}
+            for i, corr in zip(self.indices[lo:hi].tolist(), self.corrs[lo:hi].tolist())
+        ]
+    
+    def query(self,
+              matched_stocks: List[Dict[str, float]],
+              min_similarity: float = 0.7,
+              start: int = 0,
+              stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        snapshots עם דמיון > min_similarity לרשימת התאמות
+        
+        Args:
+            matched_stocks: רשימת ההתאמות של השאילתה
+            min_similarity: סף דמיון (אי-שוויון חזק, כמו ב-backtest)
+            start: שורה ראשונה לחיפוש
+            stop: שורה אחרי האחרונה לחיפוש (ברירת מחדל: סוף האינדקס)
+        
+        Returns:
+            (שורות, ציוני דמיון) ממוינים לפי שורה
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        
+        encoded = _encode(self._symbol_bit, matched_stocks)
+        unknown = len({m['symbol'] for m in matched_stocks}) - len(encoded)
+        if not encoded or start >= stop:
+            return empty
+        
+        query_bits = np.array(list(encoded), dtype=np.int64)
+        query_words = np.zeros(self.words, dtype=np.uint64)
+        np.bitwise_or.at(query_words, query_bits >> 6, np.uint64(1) << (query_bits & 63).astype(np.uint64))
+        
+        # מועמדים: snapshots שחולקים לפחות מניה אחת עם השאילתה (אחרת Jaccard = 0).
+        # טווח קצר נסרק ישירות; אחרת דרך ה-postings (ממוינים לפי שורה - החיתוך לטווח הוא searchsorted)
+        if stop - start <= SCAN_ROWS:
+            intersection = _popcount(self.bits[start:stop] & query_words)
+            candidates = np.flatnonzero(intersection) + start
+            intersection = intersection[candidates - start]
+        else:
+            if self._postings_rows is None:
+                self._build_postings()
+            hit = np.zeros(stop - start, dtype=bool)
+            for bit in query_bits.tolist():
+                postings = self._postings_rows[self._postings_ptr[bit]:self._postings_ptr[bit + 1]]
+                lo, hi = np.searchsorted(postings, (start, stop))
+                hit[postings[lo:hi] - start] = True
+            candidates = np.flatnonzero(hit) + start
+            intersection = _popcount(self.bits[candidates] & query_words)
+        
+        if len(candidates) == 0:
+            return empty
+        
+        # Jaccard עם popcount (מניות שלא ביקום נספרות רק באיחוד)
+        union = self.counts[candidates] + len(encoded) + unknown - intersection
+        jaccard = intersection / union
+        
+        min_jaccard = (min_similarity - CORR_WEIGHT) / JACCARD_WEIGHT
+        survivors = jaccard > min_jaccard - 1e-12
+        candidates = candidates[survivors]
+        jaccard = jaccard[survivors]
+        intersection = intersection[survivors]
+        if len(candidates) == 0:
+            return empty
+        
+        # רכיב הקורלציות רק לשורדים: ממוצע 1 - min(|Δcorr|, 1) על המניות המשותפות
+        query_corr = np.full(len(self.universe), np.nan)
+        query_corr[query_bits] = list(encoded.values())
+        
+        lengths = self.counts[candidates]
+        owner = np.repeat(np.arange(len(candidates)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = np.repeat(self.indptr[candidates], lengths) + offsets
+        
+        other_corr = query_corr[self.indices[positions]]
+        shared = ~np.isnan(other_corr)
+        closeness = 1.0 - np.minimum(np.abs(other_corr[shared] - self.corrs[positions][shared]), 1.0)
+        corr_similarity = np.bincount(owner[shared], weights=closeness, minlength=len(candidates)) / intersection
+        
+        similarity = jaccard * JACCARD_WEIGHT + corr_similarity * CORR_WEIGHT
+        keep = similarity > min_similarity
+        
+        return candidates[keep], similarity[keep]
@@ -0,0 +1,128 @@
+"""
+לוח ימי מסחר - מיפוי תאריך -> מיקום שורה, נבנה פעם אחת לכל dataset
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# כללי הצמדה לתאריך שאינו יום מסחר
+SNAP_RULES = ('exact', 'previous', 'next')
+
+# לוחות שנבנו מ-from_frame, לפי אובייקט האינדקס (אינדקס של pandas לא משתנה במקום)
+_FRAME_CALENDARS_SIZE = 8
+_FRAME_CALENDARS: 'OrderedDict[int, tuple]' = OrderedDict()
+_FRAME_CALENDARS_LOCK = threading.Lock()
+
+
+class TradingCalendar:
+    """
+    מיפוי תאריכים למיקומי שורות באינדקס של DataFrame מחירים
+    
+    תאריך שאינו יום מסחר (סוף שבוע, חג, יום בלי נתונים) מטופל לפי כלל מפורש:
+    - 'exact': רק יום מסחר בדיוק, אחרת None
+    - 'previous': יום המסחר האחרון עד התאריך (כולל) - בלי הצצה קדימה
+    - 'next': יום המסחר הראשון מהתאריך (כולל)
+    """
+    
+    def __init__(self, dates: Union[pd.DatetimeIndex, List[datetime]]):
+        """
+        Args:
+            dates: אינדקס התאריכים של ה-dataset (ממוין, ללא כפילויות)
+        """
+        self.dates = pd.DatetimeIndex(dates)
+        if not self.dates.is_monotonic_increasing or not self.dates.is_unique:
+            raise ValueError("לוח ימי המסחר דורש אינדקס תאריכים ממוין וללא כפילויות")
+        
+        self._values = self.dates.values
+        self._positions: Dict[pd.Timestamp, int] = {date: i for i, date in enumerate(self.dates)}
+    
+    @classmethod
+    def from_frame(cls, stock_data: pd.DataFrame) -> 'TradingCalendar':
+        """
+        הלוח של אינדקס ה-DataFrame - נבנה פעם אחת לכל אובייקט אינדקס
+        
+        הקאש מחזיק את האינדקס עצמו, כך שה-id שלו לא ממוחזר לאינדקס אחר כל עוד הוא בקאש.
+        """
+        index = stock_data.index
+        with _FRAME_CALENDARS_LOCK:
+            cached = _FRAME_CALENDARS.get(id(index))
+            if cached is not None and cached[0] is index:
+                _FRAME_CALENDARS.move_to_end(id(index))
+                return cached[1]
+        
+        calendar = cls(index)
+        with _FRAME_CALENDARS_LOCK:
+            _FRAME_CALENDARS[id(index)] = (index, calendar)
+            while len(_FRAME_CALENDARS) > _FRAME_CALENDARS_SIZE:
+                _FRAME_CALENDARS.popitem(last=False)
+        return calendar
+    
+    def __len__(self) -> int:
+        return len(self.dates)
+    
+    def __contains__(self, date) -> bool:
+        return pd.Timestamp(date) in self._positions
+    
+    def position(self, date, snap: str = 'exact') -> Optional[int]:
+        """
+        מיקום השורה של תאריך
+        
+        Args:
+            date: תאריך
+            snap: 'exact' / 'previous' / 'next'
+        
+        Returns:
+            מיקום שורה, או None אם אין יום מסחר מתאים
+        """
+        date = pd.Timestamp(date)
+        pos = self._positions.get(date)
+        if pos is not None:
+            return pos
+        
+        if snap == 'exact':
+            return None
+        if snap == 'previous':
+            pos = int(np.searchsorted(self._values, date.to_datetime64(), side='right')) - 1
+            return pos if pos >= 0 else None
+        if snap == 'next':
+            pos = int(np.searchsorted(self._values, date.to_datetime64(), side='left'))
+            return pos if pos < len(self._values) else None
+        
+        raise ValueError(f"כלל הצמדה לא מוכר: {snap} (אפשרויות: {', '.join(SNAP_RULES)})")
+    
+    def positions(self, dates, snap: str = 'exact') -> np.ndarray:
+        """
+        מיקומי שורות לרשימת תאריכים (וקטורי)
+        
+        Returns:
+            מערך int64, -1 לתאריך בלי יום מסחר מתאים
+        """
+        if snap not in SNAP_RULES:
+            raise ValueError(f"כלל הצמדה לא מוכר: {snap} (אפשרויות: {', '.join(SNAP_RULES)})")
+        
+        values = pd.DatetimeIndex(dates).values.astype(self._values.dtype)
+        left = np.searchsorted(self._values, values, side='left')
+        right = np.searchsorted(self._values, values, side='right')
+        exact = right > left
+        
+        if snap == 'exact':
+            return np.where(exact, left, -1).astype(np.int64)
+        if snap == 'previous':
+            return (right - 1).astype(np.int64)
+        return np.where(left < len(self._values), left, -1).astype(np.int64)
+    
+    def date(self, position: int) -> pd.Timestamp:
+        return self.dates[position]
+    
+    def between(self, start_date=None, end_date=None) -> np.ndarray:
+        """
+        מיקומי ימי המסחר בטווח [start_date, end_date] (None = בלי גבול)
+        """
+        start = 0 if start_date is None else np.searchsorted(self._values, pd.Timestamp(start_date).to_datetime64(), side='left')
+        end = len(self._values) if end_date is None else np.searchsorted(self._values, pd.Timestamp(end_date).to_datetime64(), side='right')
+        return np.arange(start, end, dtype=np.int64)
@@ -4,11 +4,13 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 from datetime import datetime, timedelta
 import hashlib
 import json
 
+from .trading_calendar import TradingCalendar
+
 
 def classify_movement(future_return: float, thresholds: Dict[str, float]) -> str:
     """
@@ -33,12 +35,41 @@ def classify_movement(future_return: float, thresholds: Dict[str, float]) -> str
         return 'strong_down'
 
 
+def resolve_row(stock_data: pd.DataFrame,
+                date: Union[datetime, int],
+                calendar: Optional[TradingCalendar] = None,
+                snap: str = 'exact') -> Optional[int]:
+    """
+    מיקום שורה לתאריך או מיקום שורה
+    
+    מיקום (int) מוחזר כמו שהוא. תאריך ממופה דרך calendar; בלי calendar נלקח הלוח
+    של stock_data מהקאש של TradingCalendar.from_frame (נבנה פעם אחת לכל אינדקס).
+    
+    Args:
+        stock_data: DataFrame עם הנתונים
+        date: תאריך או מיקום שורה
+        calendar: לוח ימי מסחר של stock_data
+        snap: כלל הצמדה לתאריך שאינו יום מסחר ('exact' / 'previous' / 'next')
+        
+    Returns:
+        מיקום שורה או None
+    """
+    if isinstance(date, (int, np.integer)):
+        return int(date) if 0 <= date < len(stock_data.index) else None
+    
+    if calendar is None:
+        calendar = TradingCalendar.from_frame(stock_data)
+    return calendar.position(date, snap)
+
+
 def calculate_correlation_for_date(stock_data: pd.DataFrame,
                                    stock1: str,
                                    stock2: str,
-                                   date: datetime,
+                                   date: Union[datetime, int],
                                    lookback_days: int,
-                                   field: str = 'Adj Close') -> Optional[float]:
+                                   field: str = 'Adj Close',
+                                   calendar: Optional[TradingCalendar] = None,
+                                   snap: str = 'exact') -> Optional[float]:
     """
     חישוב קורלציה בין שתי מניות לתאריך ספציפי
     
@@ -46,9 +77,11 @@ def calculate_correlation_for_date(stock_data: pd.DataFrame,
         stock_data: DataFrame עם MultiIndex (symbol, field)
         stock1: סימול מניה ראשונה
         stock2: סימול מניה שנייה
-        date: תאריך לחישוב
+        date: תאריך לחישוב או מיקום השורה שלו
         lookback_days: מספר ימים אחורה
         field: שדה לחישוב ('Adj Close' או 'Volume')
+        calendar: לוח ימי מסחר של stock_data (לתאריך)
+        snap: כלל הצמדה לתאריך שאינו יום מסחר ('exact' / 'previous' / 'next')
         
     Returns:
         קורלציה או None אם אין מספיק נתונים
@@ -66,9 +99,9 @@ def calculate_correlation_for_date(stock_data: pd.DataFrame,
         else:
             return None
         
-        # מציאת אינדקס התאריך
-        date_idx = series1.index.get_indexer([date], method='nearest')[0]
-        if date_idx < 0 or date_idx < lookback_days - 1:
+        # מיקום השורה של התאריך
+        date_idx = resolve_row(stock_data, date, calendar, snap)
+        if date_idx is None or date_idx < lookback_days - 1:
             return None
         
         # חלון נתונים
@@ -103,20 +136,170 @@ def calculate_correlation_for_date(stock_data: pd.DataFrame,
         return None
 
 
+def prepare_correlation_panel(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    הכנת מטריצת (dates × symbols) לחישוב מטריצות קורלציה לפי תאריך
+    
+    מחושב פעם אחת לכל הריצה: ערכים ממורכזים לפי ממוצע העמודה (לדיוק נומרי),
+    אפסים במקום NaN, הריבועים שלהם ומסכת ערכים תקינים. לכל תאריך נשאר רק
+    לחתוך את שורות החלון ולהכפיל מטריצות.
+    
+    Args:
+        values: מערך (T, N) עם NaN לנתונים חסרים
+        
+    Returns:
+        Dict עם 'x' (ממורכז, 0 ב-NaN), 'xx' (ריבועים) ו-'valid' (0/1)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    
+    with np.errstate(invalid='ignore'):
+        mean = np.nan_to_num(np.nanmean(np.where(valid, values, np.nan), axis=0))
+    x = np.where(valid, values - mean, 0.0)
+    
+    return {
+        'x': x,
+        'xx': x * x,
+        'valid': valid.astype(np.float64),
+    }
+
+
+def _correlation_from_sums(n: np.ndarray,
+                           sx: np.ndarray,
+                           sxx: np.ndarray,
+                           sxy: np.ndarray,
+                           lookback_days: int) -> np.ndarray:
+    """
+    מטריצת קורלציות מתוך הסכומים לכל זוג (נקודות משותפות, Σx, Σx², Σxy)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var_x = sxx - sx * sx / n
+        var_y = var_x.T
+        corr = cov / np.sqrt(var_x * var_y)
+    
+    # פחות מדי נקודות משותפות, או חלון קבוע (שונות זניחה) - קורלציה לא מוגדרת
+    enough = (n >= lookback_days * 0.8) & (n >= 10)
+    degenerate = (var_x <= 1e-12 * sxx) | (var_y <= 1e-12 * sxx.T)
+    corr = np.where(enough & ~degenerate, np.clip(corr, -1.0, 1.0), np.nan)
+    np.fill_diagonal(corr, np.nan)
+    
+    return corr
+
+
+def calculate_correlation_matrices_for_date(panel: Dict[str, np.ndarray],
+                                            date_idx: int,
+                                            lookbacks: List[int]) -> Dict[int, Optional[np.ndarray]]:
+    """
+    מטריצות קורלציה N×N לכמה אורכי lookback שמסתיימים באותה שורה
+    
+    הסכומים מצטברים מהשורה date_idx אחורה: כל lookback מוסיף רק את השורות שבינו
+    לבין ה-lookback הקצר הקודם. כל ה-lookbacks יחד עולים כמו lookback אחד - הארוך ביותר.
+    
+    Args:
+        panel: פלט של prepare_correlation_panel
+        date_idx: מיקום התאריך (שורה) במטריצה
+        lookbacks: אורכי חלון
+        
+    Returns:
+        Dict lookback -> מטריצה (כמו ב-calculate_correlation_matrix_for_date), או None אם אין מספיק היסטוריה
+    """
+    result: Dict[int, Optional[np.ndarray]] = {lookback: None for lookback in lookbacks}
+    size = panel['x'].shape[1]
+    
+    n = np.zeros((size, size))
+    sx = np.zeros((size, size))
+    sxx = np.zeros((size, size))
+    sxy = np.zeros((size, size))
+    covered = 0
+    
+    for lookback in sorted(set(lookbacks)):
+        if date_idx < lookback - 1:
+            break
+        
+        # השורות החדשות: lookback ימים אחורה, בלי מה שכבר נסכם
+        rows = slice(date_idx - lookback + 1, date_idx - covered + 1)
+        x = panel['x'][rows]
+        xx = panel['xx'][rows]
+        valid = panel['valid'][rows]
+        
+        # סכומים על הנקודות המשותפות לכל זוג (i, j)
+        n += valid.T @ valid
+        sx += x.T @ valid           # sx[i, j] = סכום x_i בנקודות שתקינות גם ב-j
+        sxx += xx.T @ valid
+        sxy += x.T @ x
+        covered = lookback
+        
+        result[lookback] = _correlation_from_sums(n, sx, sxx, sxy, lookback)
+    
+    return result
+
+
+def calculate_correlation_matrix_for_date(panel: Dict[str, np.ndarray],
+                                          date_idx: int,
+                                          lookback_days: int) -> Optional[np.ndarray]:
+    """
+    מטריצת קורלציות N×N בחלון lookback_days שמסתיים בשורה date_idx
+    
+    אותה סמנטיקה כמו calculate_correlation_for_date לכל זוג: הסרת NaN לפי זוג,
+    לפחות 80% ולפחות 10 נקודות משותפות, ו-NaN כשהקורלציה לא מוגדרת.
+    הסכומים לכל הזוגות מתקבלים מארבע מכפלות מטריצות על החלון.
+    
+    Args:
+        panel: פלט של prepare_correlation_panel
+        date_idx: מיקום התאריך (שורה) במטריצה
+        lookback_days: מספר ימים אחורה
+        
+    Returns:
+        np.ndarray (N, N) עם NaN לזוגות לא תקינים ועל האלכסון, או None אם אין מספיק היסטוריה
+    """
+    return calculate_correlation_matrices_for_date(panel, date_idx, [lookback_days])[lookback_days]
+
+
+def calculate_forward_returns(prices: np.ndarray, forward_days: int) -> np.ndarray:
+    """
+    תשואה עתידית באחוזים לכל (תאריך, מניה) - חלוקה אחת של המטריצה המוזזת
+    
+    אותה סמנטיקה כמו calculate_future_return: NaN כשאין forward_days שורות קדימה,
+    כשאחד המחירים חסר או כשמחיר ההתחלה 0.
+    
+    Args:
+        prices: מערך (T, N) של מחירים
+        forward_days: מספר ימים קדימה
+        
+    Returns:
+        np.ndarray (T, N)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.full(prices.shape, np.nan)
+    
+    if forward_days < len(prices):
+        start = prices[:len(prices) - forward_days]
+        end = prices[forward_days:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[:len(prices) - forward_days] = np.where(start != 0, ((end - start) / start) * 100, np.nan)
+    
+    return returns
+
+
 def calculate_future_return(stock_data: pd.DataFrame,
                             stock: str,
-                            date: datetime,
+                            date: Union[datetime, int],
                             forward_days: int,
-                            field: str = 'Adj Close') -> Optional[float]:
+                            field: str = 'Adj Close',
+                            calendar: Optional[TradingCalendar] = None,
+                            snap: str = 'exact') -> Optional[float]:
     """
     חישוב תשואה עתידית
     
     Args:
         stock_data: DataFrame עם MultiIndex
         stock: סימול המניה
-        date: תאריך התחלה
+        date: תאריך התחלה או מיקום השורה שלו
         forward_days: מספר ימים קדימה
         field: שדה מחיר
+        calendar: לוח ימי מסחר של stock_data (לתאריך)
+        snap: כלל הצמדה לתאריך שאינו יום מסחר ('exact' / 'previous' / 'next')
         
     Returns:
         תשואה באחוזים או None
@@ -127,9 +310,9 @@ def calculate_future_return(stock_data: pd.DataFrame,
         
         prices = stock_data[(stock, field)]
         
-        # מציאת אינדקסים
-        date_idx = prices.index.get_indexer([date], method='nearest')[0]
-        if date_idx < 0:
+        # מיקומי שורות
+        date_idx = resolve_row(stock_data, date, calendar, snap)
+        if date_idx is None:
             return None
         
         future_idx = date_idx + forward_days
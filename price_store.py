@@ -0,0 +1,914 @@
+"""
+מאגר מחירים עמודתי - קובץ Parquet אחד לכל מניה במקום pickle לכל טווח תאריכים
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import pickle
+import tempfile
+import threading
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+
+# השדות שנשמרים לכל מניה (כל השדות כ-float64 כדי לאפשר NaN אחרי יישור)
+STORE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+# מפתח ה-metadata בקובץ ה-Parquet (כיסוי הטווח שהורד)
+_METADATA_KEY = b'deltamix'
+
+_FILE_SCHEMA = pa.schema(
+    [pa.field('Date', pa.timestamp('ns'))] +
+    [pa.field(field, pa.float64()) for field in STORE_FIELDS]
+)
+
+_PARTITIONING = ds.partitioning(pa.schema([pa.field('symbol', pa.string())]), flavor='hive')
+
+# אינדקס המאגר: מניה -> קובץ, כיסוי, גודל וזמן כתיבה
+_INDEX_FILE = "_index.json"
+
+# קובץ הנעילה של האינדקס (נעילה בין תהליכים)
+_LOCK_FILE = "_index.lock"
+
+# גישה למניה (LRU) נרשמת כ-mtime של קובץ הנתונים שלה, לכל היותר פעם בפרק זמן זה לכל מניה
+_ACCESS_TOUCH_SECONDS = 30
+
+
+def _merge_ranges(ranges) -> List[List[str]]:
+    """
+    איחוד טווחי תאריכים (YYYY-MM-DD) חופפים או נוגעים - ממוינים לפי התחלה
+    """
+    merged: List[List[str]] = []
+    for start, end in sorted([list(r) for r in ranges]):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class _StoreLock:
+    """
+    נעילת האינדקס של מאגר: RLock בין threads ונעילת קובץ בין תהליכים
+    
+    ה-job היומי, ה-pre-compute וה-workers שלו כותבים לאותו מאגר במקביל, ולכן
+    קריאה-עדכון-כתיבה של האינדקס חייבת נעילה שתקפה גם בין תהליכים.
+    הנעילה רה-כניסה בתוך אותו thread - נעילת הקובץ נלקחת רק ברמה החיצונית.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._handle = None
+    
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._handle = open(self.path, 'a+')
+                if sys.platform == 'win32':
+                    self._handle.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(self._handle.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+                else:
+                    fcntl.flock(self._handle.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                if self._handle is not None:
+                    self._handle.close()
+                    self._handle = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if sys.platform == 'win32':
+                    self._handle.seek(0)
+                    msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            finally:
+                self._handle.close()
+                self._handle = None
+        self._thread_lock.release()
+
+
+# נעילה אחת לכל תיקיית מאגר - כמה PriceStore באותו תהליך (ו-threads של ההורדה) חולקים אותה
+_INDEX_LOCKS: Dict[str, _StoreLock] = {}
+_INDEX_LOCKS_GUARD = threading.Lock()
+
+
+def _index_lock(root_dir: str) -> _StoreLock:
+    with _INDEX_LOCKS_GUARD:
+        key = os.path.abspath(root_dir)
+        if key not in _INDEX_LOCKS:
+            _INDEX_LOCKS[key] = _StoreLock(os.path.join(key, _LOCK_FILE))
+        return _INDEX_LOCKS[key]
+
+
+class PriceStore:
+    """
+    מאגר מחירים עמודתי על דיסק
+    
+    מבנה: {root_dir}/symbol={SYMBOL}/data.parquet - מחיצה (partition) לכל מניה.
+    קריאה של כל היקום היא סריקת dataset אחת עם סינון לפי מניות, שדות וטווח תאריכים.
+    
+    {root_dir}/_index.json מחזיק לכל מניה את הקובץ, הכיסוי והגודל, כך שבדיקות כיסוי
+    וגודל לא פותחות קבצים. האינדקס נכתב רק בכתיבה למאגר (תחת נעילת קובץ, דרך קובץ זמני
+    ו-os.replace); קריאה רק מעדכנת את ה-mtime של קובץ המניה, ולפיו מפנים מניות (LRU)
+    כשעוברים את max_bytes.
+    """
+    
+    def __init__(self, root_dir: str = os.path.join("data_cache", "prices"), max_bytes: Optional[int] = None):
+        """
+        אתחול
+        
+        Args:
+            root_dir: תיקיית המאגר
+            max_bytes: תקציב גודל למאגר (None = ללא הגבלה). מעבר לו מפנים מניות לפי LRU.
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        os.makedirs(root_dir, exist_ok=True)
+        
+        self._lock = _index_lock(root_dir)
+        self._index_path = os.path.join(root_dir, _INDEX_FILE)
+        self._index_cache: Optional[Tuple[Tuple[int, int, int], Dict[str, Dict], int]] = None
+        self._touched: Dict[str, float] = {}
+        
+        if not os.path.exists(self._index_path):
+            with self._lock:
+                if not os.path.exists(self._index_path):
+                    self.rebuild_index()
+    
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.root_dir, f"symbol={symbol}")
+    
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self._symbol_dir(symbol), "data.parquet")
+    
+    def _file_coverage(self, symbol: str) -> Optional[Dict]:
+        """
+        כיסוי מה-metadata של קובץ ה-Parquet עצמו (בלי לטעון את הנתונים)
+        """
+        try:
+            metadata = pq.read_schema(self._path(symbol)).metadata or {}
+            return json.loads(metadata[_METADATA_KEY])
+        except Exception:
+            return None
+    
+    def _read_index(self, fresh: bool = False) -> Dict[str, Dict]:
+        """
+        קריאת האינדקס (עם קאש בזיכרון לפי mtime, inode וגודל של הקובץ)
+        
+        Args:
+            fresh: קריאה מהדיסק גם אם הקאש נראה עדכני (תחת נעילה, לפני עדכון)
+        """
+        try:
+            stat = os.stat(self._index_path)
+        except OSError:
+            return {}
+        
+        # os.replace יוצר inode חדש, כך שגם כתיבה של תהליך אחר באותו tick של השעון מזוהה
+        key = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        if fresh or self._index_cache is None or self._index_cache[0] != key:
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                entries = index.get('symbols', {})
+                total_bytes = index.get('total_bytes')
+            except (OSError, ValueError):
+                entries, total_bytes = {}, 0
+            if total_bytes is None:
+                total_bytes = sum(entry.get('bytes', 0) for entry in entries.values())
+            self._index_cache = (key, entries, total_bytes)
+        
+        return self._index_cache[1]
+    
+    def _total_bytes(self) -> int:
+        """
+        גודל המאגר כפי שנרשם באינדקס בכתיבה האחרונה - בלי stat לקבצים
+        """
+        self._read_index()
+        return self._index_cache[2] if self._index_cache else 0
+    
+    def _update_index(self, update=None):
+        """
+        קריאה-עדכון-כתיבה של האינדקס תחת נעילה (גם בין תהליכים)
+        
+        האינדקס נקרא מחדש מהדיסק אחרי לקיחת הנעילה, כך שעדכונים של תהליכים אחרים
+        לא נדרסים, ונכתב לקובץ זמני ייחודי ואז מוחלף אטומית. הגודל הכולל של המאגר
+        נשמר באינדקס לצד הגודל של כל מניה, כך שבדיקת התקציב לא סוכמת או ניגשת לקבצים.
+        
+        Args:
+            update: פונקציה שמקבלת את ה-Dict של האינדקס ומשנה אותו במקום
+        """
+        with self._lock:
+            entries = dict(self._read_index(fresh=True))
+            if update is not None:
+                update(entries)
+            
+            tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                total_bytes = sum(entry.get('bytes', 0) for entry in entries.values())
+                json.dump({'version': 1, 'total_bytes': total_bytes, 'symbols': entries}, f)
+            os.replace(tmp_path, self._index_path)
+            self._index_cache = None
+    
+    def _touch(self, symbols: List[str]):
+        """
+        רישום גישה למניות (LRU) כ-mtime של קובץ הנתונים - בלי לכתוב את האינדקס
+        """
+        now = time.time()
+        for symbol in symbols:
+            if now - self._touched.get(symbol, 0) < _ACCESS_TOUCH_SECONDS:
+                continue
+            self._touched[symbol] = now
+            try:
+                os.utime(self._path(symbol), (now, now))
+            except OSError:
+                pass
+    
+    def _last_access(self, symbol: str, entry: Dict) -> float:
+        """
+        זמן הגישה האחרון למניה: הכתיבה האחרונה (מהאינדקס) או הקריאה האחרונה (mtime של הקובץ)
+        """
+        try:
+            accessed = os.path.getmtime(self._path(symbol))
+        except OSError:
+            accessed = 0
+        return max(entry.get('last_access', 0), accessed)
+    
+    def _entry(self, symbol: str, coverage: Dict, last_access: Optional[float] = None) -> Dict:
+        return dict(
+            coverage,
+            file=os.path.relpath(self._path(symbol), self.root_dir),
+            bytes=os.path.getsize(self._path(symbol)),
+            last_access=last_access if last_access is not None else time.time()
+        )
+    
+    def rebuild_index(self) -> int:
+        """
+        בניית האינדקס מחדש מהקבצים שעל הדיסק
+        
+        Returns:
+            מספר המניות באינדקס
+        """
+        with self._lock:
+            entries = {}
+            for name in os.listdir(self.root_dir):
+                if not name.startswith("symbol="):
+                    continue
+                symbol = name[len("symbol="):]
+                coverage = self._file_coverage(symbol)
+                if coverage:
+                    entries[symbol] = self._entry(symbol, coverage, os.path.getmtime(self._path(symbol)))
+            
+            def replace_all(index):
+                index.clear()
+                index.update(entries)
+            
+            self._update_index(replace_all)
+        
+        return len(entries)
+    
+    def index(self) -> Dict[str, Dict]:
+        """
+        עותק של האינדקס: מניה -> file, first_date, last_date, rows, fetched_start, fetched_end, bytes, last_access
+        """
+        return {symbol: dict(entry) for symbol, entry in self._read_index().items()}
+    
+    def symbols(self) -> List[str]:
+        """
+        רשימת המניות במאגר (ממוינת)
+        """
+        return sorted(self._read_index())
+    
+    def has(self, symbol: str) -> bool:
+        return symbol in self._read_index() and os.path.exists(self._path(symbol))
+    
+    def coverage(self, symbol: str) -> Optional[Dict]:
+        """
+        כיסוי הנתונים של מניה - נקרא מהאינדקס בלי לפתוח את הקובץ
+        
+        Returns:
+            Dict עם first_date, last_date, rows, fetched_start, fetched_end, fetched_ranges או None.
+            fetched_ranges - הטווחים שהורדו בפועל (יכולים להיות כמה טווחים עם פער ביניהם);
+            fetched_start / fetched_end - הקצוות שלהם.
+        """
+        entry = self._read_index().get(symbol)
+        if entry is None:
+            return None
+        
+        info = {key: entry[key] for key in ('first_date', 'last_date', 'rows', 'fetched_start', 'fetched_end')}
+        info['fetched_ranges'] = entry.get('fetched_ranges') or [[entry['fetched_start'], entry['fetched_end']]]
+        return info
+    
+    def missing_ranges(self, symbol: str, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        """
+        חלקי הטווח [start_date, end_date] שעוד לא הורדו עבור המניה
+        
+        Returns:
+            רשימת (התחלה, סוף) ממוינת - ריקה אם הטווח מכוסה במלואו
+        """
+        info = self.coverage(symbol)
+        if not info:
+            return [(start_date, end_date)]
+        
+        gaps = []
+        cursor = start_date
+        for range_start, range_end in info['fetched_ranges']:
+            if range_end < cursor:
+                continue
+            if range_start > end_date:
+                break
+            if range_start > cursor:
+                gaps.append((cursor, range_start))
+            cursor = max(cursor, range_end)
+        if cursor < end_date:
+            gaps.append((cursor, end_date))
+        
+        return gaps
+    
+    def covers(self, symbol: str, start_date: str, end_date: str) -> bool:
+        """
+        האם הטווח [start_date, end_date] כבר הורד עבור המניה
+        
+        הבדיקה היא לפי הטווחים שהתבקשו בהורדה (ולא לפי השורה הראשונה),
+        כך שמניה שהונפקה אחרי start_date עדיין נחשבת מכוסה.
+        """
+        return not self.missing_ranges(symbol, start_date, end_date)
+    
+    def size_bytes(self, symbol: Optional[str] = None) -> int:
+        """
+        גודל על דיסק של מניה אחת או של כל המאגר (מהאינדקס)
+        """
+        if symbol:
+            return self._read_index().get(symbol, {}).get('bytes', 0)
+        return self._total_bytes()
+    
+    def enforce_budget(self, max_bytes: Optional[int] = None, keep: Tuple[str, ...] = ()) -> List[str]:
+        """
+        פינוי מניות לפי LRU עד שגודל המאגר בתוך התקציב
+        
+        Args:
+            max_bytes: תקציב (ברירת מחדל: self.max_bytes)
+            keep: מניות שלא יפונו (למשל זו שנכתבה עכשיו)
+            
+        Returns:
+            רשימת המניות שפונו
+        """
+        max_bytes = max_bytes if max_bytes is not None else self.max_bytes
+        if max_bytes is None or self._total_bytes() <= max_bytes:
+            return []
+        
+        evicted = []
+        with self._lock:
+            index = self._read_index(fresh=True)
+            total = self._total_bytes()
+            if total <= max_bytes:
+                return []
+            
+            last_access = {s: self._last_access(s, e) for s, e in index.items()}
+            
+            for symbol in sorted(index, key=lambda s: last_access[s]):
+                if total <= max_bytes:
+                    break
+                if symbol in keep:
+                    continue
+                total -= index[symbol].get('bytes', 0)
+                shutil.rmtree(self._symbol_dir(symbol), ignore_errors=True)
+                evicted.append(symbol)
+            
+            def drop_evicted(entries):
+                for symbol in evicted:
+                    entries.pop(symbol, None)
+            
+            self._update_index(drop_evicted)
+        
+        return evicted
+    
+    def compact(self, legacy_dir: Optional[str] = None) -> Dict:
+        """
+        ניקוי המאגר: יישור האינדקס מול הדיסק, מחיקת קבצים זמניים שנשארו,
+        ומחיקת קבצי pickle ישנים שהטווח שלהם כבר מכוסה במאגר
+        
+        Args:
+            legacy_dir: תיקיית קבצי ה-pickle הישנים (למשל data_cache)
+            
+        Returns:
+            Dict עם reindexed, dropped, removed_files, freed_bytes
+        """
+        stats = {'reindexed': [], 'dropped': [], 'removed_files': 0, 'freed_bytes': 0}
+        
+        def remove_file(path):
+            stats['freed_bytes'] += os.path.getsize(path)
+            stats['removed_files'] += 1
+            os.remove(path)
+        
+        with self._lock:
+            on_disk = set()
+            
+            for name in os.listdir(self.root_dir):
+                directory = os.path.join(self.root_dir, name)
+                if not name.startswith("symbol=") or not os.path.isdir(directory):
+                    continue
+                symbol = name[len("symbol="):]
+                for filename in os.listdir(directory):
+                    if filename.endswith(".tmp"):
+                        remove_file(os.path.join(directory, filename))
+                if os.path.exists(self._path(symbol)):
+                    on_disk.add(symbol)
+                else:
+                    shutil.rmtree(directory, ignore_errors=True)
+            
+            def reconcile(entries):
+                for symbol in list(entries):
+                    if symbol not in on_disk:
+                        entries.pop(symbol)
+                        stats['dropped'].append(symbol)
+                for symbol in on_disk - set(entries):
+                    coverage = self._file_coverage(symbol)
+                    if coverage:
+                        entries[symbol] = self._entry(symbol, coverage, os.path.getmtime(self._path(symbol)))
+                        stats['reindexed'].append(symbol)
+            
+            self._update_index(reconcile)
+        
+        # קבצי pickle ישנים ({symbol}_{start}_{end}.pkl) שהמאגר כבר מכסה
+        if legacy_dir and os.path.exists(legacy_dir):
+            for filename in os.listdir(legacy_dir):
+                if not filename.endswith('.pkl'):
+                    continue
+                parts = filename[:-len('.pkl')].rsplit('_', 2)
+                if len(parts) != 3:
+                    continue
+                symbol, start, end = parts
+                if self.covers(symbol, start, start if end == 'None' else end):
+                    remove_file(os.path.join(legacy_dir, filename))
+        
+        return stats
+    
+    def normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        נרמול פריים של yfinance לסכמת המאגר
+        
+        - אינדקס תאריכים ללא אזור זמן (תאריך המסחר)
+        - Adj Close חסר → Close (כמו ב-download_multiple_stocks)
+        - Volume חסר → 0
+        """
+        out = pd.DataFrame(index=pd.DatetimeIndex(pd.to_datetime(df.index)))
+        if out.index.tz is not None:
+            out.index = out.index.tz_localize(None)
+        out.index = out.index.normalize()
+        out.index.name = 'Date'
+        
+        for field in STORE_FIELDS:
+            if field in df.columns:
+                out[field] = pd.to_numeric(df[field].to_numpy(), errors='coerce').astype(np.float64)
+            elif field == 'Adj Close' and 'Close' in df.columns:
+                out[field] = pd.to_numeric(df['Close'].to_numpy(), errors='coerce').astype(np.float64)
+            elif field == 'Volume':
+                out[field] = 0.0
+            else:
+                out[field] = np.nan
+        
+        out = out[~out.index.duplicated(keep='last')]
+        return out.sort_index()
+    
+    def write(self,
+              symbol: str,
+              df: pd.DataFrame,
+              fetched_start: Optional[str] = None,
+              fetched_end: Optional[str] = None,
+              fetched_ranges: Optional[List[List[str]]] = None):
+        """
+        כתיבת (החלפת) כל ההיסטוריה של מניה
+        
+        Args:
+            symbol: סימול המניה
+            df: פריים עם אינדקס תאריכים ועמודות מחיר (כמו ticker.history)
+            fetched_start: תחילת הטווח שהתבקש בהורדה (ברירת מחדל: השורה הראשונה)
+            fetched_end: סוף הטווח שהתבקש בהורדה (ברירת מחדל: השורה האחרונה)
+            fetched_ranges: כל הטווחים שהורדו (ברירת מחדל: [fetched_start, fetched_end])
+        """
+        data = self.normalize(df)
+        if data.empty:
+            return
+        
+        first_date = data.index[0].strftime('%Y-%m-%d')
+        last_date = data.index[-1].strftime('%Y-%m-%d')
+        fetched_ranges = _merge_ranges(fetched_ranges or [[fetched_start or first_date, fetched_end or last_date]])
+        coverage = {
+            'first_date': first_date,
+            'last_date': last_date,
+            'rows': int(len(data)),
+            'fetched_start': fetched_ranges[0][0],
+            'fetched_end': fetched_ranges[-1][1],
+            'fetched_ranges': fetched_ranges,
+            # משתנה בכל כתיבה (גם restatement באותו גודל) - לקאשים שנגזרים מהקובץ
+            'written_at': time.time(),
+        }
+        
+        table = pa.Table.from_pandas(data.reset_index(), schema=_FILE_SCHEMA, preserve_index=False)
+        table = table.replace_schema_metadata({_METADATA_KEY: json.dumps(coverage).encode()})
+        
+        with self._lock:
+            # כתיבה אטומית - קובץ זמני ייחודי באותה תיקייה ואז החלפה
+            os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self._symbol_dir(symbol))
+            os.close(fd)
+            try:
+                pq.write_table(table, tmp_path, compression='zstd')
+                os.replace(tmp_path, self._path(symbol))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            
+            entry = self._entry(symbol, coverage)
+            self._update_index(lambda entries: entries.__setitem__(symbol, entry))
+        
+        if self.max_bytes is not None:
+            self.enforce_budget(keep=(symbol,))
+    
+    def append(self,
+               symbol: str,
+               df: pd.DataFrame,
+               fetched_start: Optional[str] = None,
+               fetched_end: Optional[str] = None):
+        """
+        מיזוג שורות חדשות להיסטוריה הקיימת של מניה (ערך חדש גובר על קיים באותו תאריך)
+        
+        הטווח החדש מתווסף לטווחים שכבר הורדו. טווח שלא נוגע בקיים נשמר כטווח נפרד,
+        כך שהשורות הישנות נשארות מכוסות והפער ביניהם יורד בפעם הבאה.
+        
+        הקריאה, המיזוג והכתיבה רצים תחת נעילת המאגר, כך ששני תהליכים שמוסיפים
+        לאותה מניה לא דורסים זה את השורות של זה.
+        """
+        with self._lock:
+            existing = self.read(symbol)
+            info = self.coverage(symbol)
+            
+            if existing is None or existing.empty or info is None:
+                self.write(symbol, df, fetched_start, fetched_end)
+                return
+            
+            new_data = self.normalize(df)
+            merged = new_data.combine_first(existing)
+            
+            fetched_start = fetched_start or (new_data.index[0].strftime('%Y-%m-%d') if not new_data.empty else info['fetched_start'])
+            fetched_end = fetched_end or (new_data.index[-1].strftime('%Y-%m-%d') if not new_data.empty else info['fetched_end'])
+            
+            self.write(symbol, merged, fetched_ranges=info['fetched_ranges'] + [[fetched_start, fetched_end]])
+    
+    def remove(self, symbol: str) -> bool:
+        """
+        הסרת מניה מהמאגר
+        """
+        if not os.path.exists(self._symbol_dir(symbol)):
+            return False
+        shutil.rmtree(self._symbol_dir(symbol))
+        self._update_index(lambda entries: entries.pop(symbol, None))
+        return True
+    
+    def clear(self):
+        """
+        מחיקת כל המאגר
+        """
+        with self._lock:
+            # קובץ הנעילה נשאר - תהליכים אחרים ממתינים עליו
+            for name in os.listdir(self.root_dir):
+                path = os.path.join(self.root_dir, name)
+                if name == _LOCK_FILE:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            self._touched = {}
+            self._update_index(lambda entries: entries.clear())
+    
+    def read(self,
+             symbol: str,
+             fields: Optional[List[str]] = None,
+             start_date: Optional[str] = None,
+             end_date: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        קריאת מניה אחת
+        
+        Returns:
+            DataFrame עם אינדקס Date ועמודה לכל שדה, או None אם המניה לא במאגר
+        """
+        if not self.has(symbol):
+            return None
+        
+        columns = ['Date'] + list(fields or STORE_FIELDS)
+        df = pq.read_table(self._path(symbol), columns=columns).to_pandas()
+        self._touch([symbol])
+        df = df.set_index('Date')
+        
+        if start_date:
+            df = df[df.index >= pd.Timestamp(start_date)]
+        if end_date:
+            df = df[df.index <= pd.Timestamp(end_date)]
+        
+        return df
+    
+    def load(self,
+             symbols: Optional[List[str]] = None,
+             fields: Optional[List[str]] = None,
+             start_date: Optional[str] = None,
+             end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        טעינת שדות X למניות S בטווח R - סריקה אחת על כל המאגר
+        
+        Args:
+            symbols: רשימת מניות (ברירת מחדל: כל המאגר)
+            fields: רשימת שדות (ברירת מחדל: STORE_FIELDS)
+            start_date: תאריך התחלה (כולל)
+            end_date: תאריך סיום (כולל)
+        
+        Returns:
+            DataFrame עם MultiIndex (symbol, field), לפי סדר המניות והשדות שהתבקשו.
+            מניות שלא נמצאו במאגר לא מופיעות.
+        """
+        fields = list(fields or STORE_FIELDS)
+        available = self.symbols()
+        if symbols is None:
+            symbols = available
+        else:
+            available_set = set(available)
+            symbols = [s for s in symbols if s in available_set]
+        
+        if not symbols:
+            return pd.DataFrame()
+        
+        dataset = ds.dataset(
+            [self._path(s) for s in symbols],
+            schema=_FILE_SCHEMA.append(pa.field('symbol', pa.string())),
+            format='parquet',
+            partitioning=_PARTITIONING,
+            partition_base_dir=self.root_dir
+        )
+        
+        condition = None
+        if start_date:
+            condition = ds.field('Date') >= pd.Timestamp(start_date)
+        if end_date:
+            end_condition = ds.field('Date') <= pd.Timestamp(end_date)
+            condition = end_condition if condition is None else condition & end_condition
+        
+        table = dataset.to_table(columns=['Date', 'symbol'] + fields, filter=condition)
+        self._touch(symbols)
+        
+        if table.num_rows == 0:
+            return pd.DataFrame()
+        
+        # פיזור ישיר למערך (תאריך, מניה, שדה) - מהיר בהרבה מ-pivot
+        dates = table.column('Date').to_numpy()
+        unique_dates, date_pos = np.unique(dates, return_inverse=True)
+        
+        encoded = table.column('symbol').combine_chunks().dictionary_encode()
+        code_names = encoded.dictionary.to_pylist()
+        position = {symbol: i for i, symbol in enumerate(symbols)}
+        symbol_pos = np.array([position[name] for name in code_names], dtype=np.int64)[encoded.indices.to_numpy()]
+        
+        values = np.full((len(unique_dates), len(symbols), len(fields)), np.nan, dtype=np.float64)
+        for k, field in enumerate(fields):
+            values[date_pos, symbol_pos, k] = table.column(field).to_numpy()
+        
+        # הסרת מניות שאין להן שורות בטווח
+        present = np.zeros(len(symbols), dtype=bool)
+        present[np.unique(symbol_pos)] = True
+        values = values[:, present, :]
+        loaded = [s for s, keep in zip(symbols, present) if keep]
+        
+        return pd.DataFrame(
+            values.reshape(len(unique_dates), len(loaded) * len(fields)),
+            index=pd.DatetimeIndex(unique_dates),
+            columns=pd.MultiIndex.from_product([loaded, fields])
+        )
+    
+    def export_cube(self,
+                    path: str,
+                    symbols: Optional[List[str]] = None,
+                    fields: Optional[List[str]] = None,
+                    start_date: Optional[str] = None,
+                    end_date: Optional[str] = None) -> 'PriceCube':
+        """
+        ייצוא הפאנל המיושר לקובייה ממופת-זיכרון (ראה PriceCube)
+        
+        Args:
+            path: נתיב הקובייה ללא סיומת
+            symbols, fields, start_date, end_date: כמו ב-load
+            
+        Returns:
+            PriceCube פתוחה על הקובץ
+        """
+        stock_data = self.load(symbols, fields, start_date, end_date)
+        if stock_data.empty:
+            raise ValueError("אין נתונים במאגר לייצוא")
+        
+        return PriceCube.build(path, stock_data, list(fields or STORE_FIELDS))
+    
+    def import_pickle_cache(self, cache_dir: str) -> int:
+        """
+        ייבוא חד-פעמי של קבצי pickle ישנים ({symbol}_{start}_{end}.pkl) למאגר
+        
+        לכל מניה כל הקבצים ממוזגים לפי סדר עדכון (החדש גובר).
+        
+        Returns:
+            מספר המניות שיובאו
+        """
+        if not os.path.exists(cache_dir):
+            return 0
+        
+        files_by_symbol: Dict[str, List[Tuple[float, str, str, str]]] = {}
+        for filename in os.listdir(cache_dir):
+            if not filename.endswith('.pkl'):
+                continue
+            parts = filename[:-len('.pkl')].rsplit('_', 2)
+            if len(parts) != 3:
+                continue
+            symbol, start, end = parts
+            filepath = os.path.join(cache_dir, filename)
+            files_by_symbol.setdefault(symbol, []).append(
+                (os.path.getmtime(filepath), filepath, start, end)
+            )
+        
+        imported = 0
+        for symbol, files in files_by_symbol.items():
+            for _, filepath, start, end in sorted(files):
+                try:
+                    with open(filepath, 'rb') as f:
+                        df = pickle.load(f)
+                except Exception:
+                    continue
+                if df is None or df.empty:
+                    continue
+                self.append(
+                    symbol, df,
+                    fetched_start=start if start != 'None' else None,
+                    fetched_end=end if end != 'None' else None
+                )
+            if self.has(symbol):
+                imported += 1
+        
+        return imported
+
+
+class PriceCube:
+    """
+    פאנל מחירים מיושר (שדה × תאריך × מניה), ממופה לזיכרון
+    
+    קבצים: {path}.npy (המערך) ו-{path}.json (אינדקס של שדות, תאריכים ומניות).
+    תהליכי worker פותחים את הקובץ במצב קריאה בלבד ומשתפים עותק אחד ב-page cache
+    במקום לקבל את ה-DataFrame המלא ב-pickle.
+    הסדר field-major נבחר כך שכל שדה הוא בלוק (T, N) רציף - הצורה שמנוע הקורלציות עובד איתה.
+    
+    ברירת המחדל היא float32 (חצי מהנפח); קובייה שמזינה חישוב שחייב להיות זהה לחישוב
+    על ה-DataFrame נבנית ב-float64.
+    """
+    
+    def __init__(self, path: str):
+        """
+        פתיחת קובייה קיימת (קריאה בלבד)
+        
+        Args:
+            path: נתיב הקובייה ללא סיומת
+        """
+        self.path = path
+        
+        with open(f"{path}.json", 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        
+        self.fields: List[str] = index['fields']
+        self.symbols: List[str] = index['symbols']
+        self.dates = pd.DatetimeIndex(pd.to_datetime(index['dates']))
+        self.values = np.load(f"{path}.npy", mmap_mode='r')
+        
+        self._field_pos = {field: i for i, field in enumerate(self.fields)}
+        self._symbol_pos = {symbol: i for i, symbol in enumerate(self.symbols)}
+    
+    @classmethod
+    def build(cls,
+              path: str,
+              stock_data: pd.DataFrame,
+              fields: Optional[List[str]] = None,
+              dtype=np.float32) -> 'PriceCube':
+        """
+        כתיבת קובייה מ-DataFrame עם MultiIndex (symbol, field)
+        
+        Args:
+            path: נתיב הקובייה ללא סיומת
+            stock_data: DataFrame כמו ב-PriceStore.load
+            fields: שדות לשמירה (ברירת מחדל: כל השדות שבפריים)
+            dtype: סוג הערכים בקובייה (float32 או float64)
+            
+        Returns:
+            PriceCube פתוחה על הקובץ החדש
+        """
+        dtype = np.dtype(dtype)
+        symbols = list(dict.fromkeys(stock_data.columns.get_level_values(0)))
+        if fields is None:
+            fields = list(dict.fromkeys(stock_data.columns.get_level_values(1)))
+        
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        
+        # כתיבה לקובץ זמני ואז החלפה, כדי ש-worker שפתוח על הקובייה הישנה לא יראה קובץ חלקי
+        tmp_path = f"{path}.tmp.npy"
+        values = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=dtype,
+            shape=(len(fields), len(stock_data.index), len(symbols))
+        )
+        for k, field in enumerate(fields):
+            columns = pd.MultiIndex.from_product([symbols, [field]])
+            values[k] = stock_data.reindex(columns=columns).to_numpy(dtype=dtype)
+        values.flush()
+        del values
+        
+        index = {
+            'fields': fields,
+            'symbols': symbols,
+            'dates': [d.strftime('%Y-%m-%d') for d in pd.DatetimeIndex(stock_data.index)],
+            'dtype': dtype.name,
+            'layout': 'field,date,symbol',
+            'created_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        }
+        with open(f"{path}.tmp.json", 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        
+        os.replace(tmp_path, f"{path}.npy")
+        os.replace(f"{path}.tmp.json", f"{path}.json")
+        
+        return cls(path)
+    
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json")
+    
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.values.shape
+    
+    def field(self, field: str) -> np.ndarray:
+        """
+        בלוק (T, N) של שדה אחד - view על הקובץ, בלי העתקה
+        """
+        return self.values[self._field_pos[field]]
+    
+    def symbol_index(self, symbol: str) -> int:
+        return self._symbol_pos[symbol]
+    
+    def to_frame(self,
+                 fields: Optional[List[str]] = None,
+                 symbols: Optional[List[str]] = None,
+                 rows: Optional[slice] = None) -> pd.DataFrame:
+        """
+        המרה חזרה ל-DataFrame עם MultiIndex (symbol, field) (מעתיק את הנתונים לזיכרון)
+        
+        Args:
+            fields: שדות (ברירת מחדל: כולם)
+            symbols: מניות (ברירת מחדל: כולן)
+            rows: טווח שורות (תאריכים) - רק הוא מועתק מהקובץ
+        """
+        fields = list(fields or self.fields)
+        symbols = list(symbols or self.symbols)
+        rows = rows if rows is not None else slice(None)
+        
+        symbol_idx = [self._symbol_pos[s] for s in symbols]
+        dates = self.dates[rows]
+        
+        # (T, N, F) - כל שדה נחתך מה-mmap בנפרד, כך שלא נקראים שדות או שורות מיותרים
+        block = np.stack(
+            [self.values[self._field_pos[f], rows][:, symbol_idx] for f in fields],
+            axis=-1
+        ).astype(np.float64)
+        
+        return pd.DataFrame(
+            block.reshape(len(dates), len(symbols) * len(fields)),
+            index=dates,
+            columns=pd.MultiIndex.from_product([symbols, fields])
+        )
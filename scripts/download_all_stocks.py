@@ -14,6 +14,7 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 from data_fetcher import DataFetcher
+from price_store import PriceStore
 
 def clear_all_data():
     """מחיקת כל הנתונים הקיימים"""
@@ -21,26 +22,20 @@ def clear_all_data():
     print("🗑️  מחיקת כל הנתונים הקיימים...")
     print("="*70)
     
-    cache_dir = "data_cache"
+    store = PriceStore(os.path.join("data_cache", "prices"))
+    symbols = store.symbols()
     
-    if os.path.exists(cache_dir):
-        # ספירת קבצים לפני מחיקה
-        files = [f for f in os.listdir(cache_dir) if f.endswith('.pkl')]
-        file_count = len(files)
+    if symbols:
+        print(f"נמצאו {len(symbols)} מניות במאגר למחיקה")
         
-        print(f"נמצאו {file_count} קבצי נתונים למחיקה")
-        
-        # מחיקת כל הקבצים
-        for filename in files:
-            filepath = os.path.join(cache_dir, filename)
-            try:
-                os.remove(filepath)
-            except Exception as e:
-                print(f"⚠️  שגיאה במחיקת {filename}: {e}")
-        
-        print(f"✅ נמחקו {file_count} קבצים")
+        # מחיקת כל המאגר
+        try:
+            store.clear()
+            print(f"✅ נמחקו {len(symbols)} מניות")
+        except Exception as e:
+            print(f"⚠️  שגיאה במחיקת המאגר: {e}")
     else:
-        print("ℹ️  אין תיקיית קאש קיימת")
+        print("ℹ️  אין נתונים קיימים במאגר")
     
     print()
 
@@ -87,11 +82,16 @@ def download_all_stocks(start_date="2012-01-01", symbols_file=None):
     print()
     
     try:
+        def report_progress(done, total, symbol):
+            if done % 50 == 0 or done == total:
+                print(f"התקדמות: {done}/{total}")
+        
         stock_data = fetcher.download_multiple_stocks(
             symbols,
             start_date=start_date,
             end_date=None,  # עד היום
-            use_cache=False  # כפיה להורדה מחדש
+            use_cache=False,  # כפיה להורדה מחדש
+            progress_callback=report_progress
         )
         
         if stock_data is None or stock_data.empty:
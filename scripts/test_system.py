@@ -171,6 +171,63 @@ try:
 except Exception as e:
     print(f"   ⚠️  לא ניתן לקרוא אקסל מקורי: {e}")
 
+# בדיקה 7: snapshots לפי תאריך מול החישוב הישן לפי מניה
+print("\n7️⃣ בדיקת snapshots (מטריצה לפי תאריך מול זוג-זוג לפי מניה)...")
+try:
+    from prediction_engine.pre_compute import PreComputeEngine
+    
+    # נתונים סינתטיים עם פקטור משותף, חור של NaN וחלון קבוע
+    np.random.seed(7)
+    snap_dates = pd.bdate_range('2023-01-02', periods=60)
+    factor = np.random.randn(60).cumsum()
+    snap_symbols = [f'S{i}' for i in range(8)]
+    snap_columns = {}
+    for i, symbol in enumerate(snap_symbols):
+        prices = 100 + factor * (i % 3) + np.random.randn(60).cumsum() * 0.5
+        if i == 3:
+            prices[10:14] = np.nan
+        if i == 5:
+            prices[30:50] = 100.0
+        snap_columns[(symbol, 'Adj Close')] = prices
+        snap_columns[(symbol, 'Volume')] = 1e6 + factor * 1e5 * (i % 2) + np.random.randn(60) * 1e5
+    snap_data = pd.DataFrame(snap_columns, index=snap_dates)
+    
+    # המנוע בלי חיבור ל-DB - רק פונקציות החישוב
+    pre_compute = PreComputeEngine(connect=False)
+    
+    panels = pre_compute.build_correlation_panels(snap_data, snap_symbols)
+    by_date = {}
+    for date_idx in range(14, 45):
+        for snap in pre_compute.compute_snapshots_for_date(snap_data, panels, date_idx, snap_symbols, 15, 15, 0.6):
+            by_date[(snap['snapshot_date'], snap['stock_symbol'])] = snap
+    
+    mismatches = 0
+    for symbol in snap_symbols:
+        for snap in pre_compute.compute_snapshots_for_stock(snap_data, symbol, list(snap_dates[14:45]), snap_symbols, 15, 15, 0.6):
+            other = by_date[(snap['snapshot_date'], symbol)]
+            same = (
+                [m['symbol'] for m in snap['matched_stocks']] == [m['symbol'] for m in other['matched_stocks']]
+                and all(
+                    abs(a['corr_price'] - b['corr_price']) < 1e-9 and abs(a['corr_volume'] - b['corr_volume']) < 1e-9
+                    for a, b in zip(snap['matched_stocks'], other['matched_stocks'])
+                )
+                and snap['future_return_pct'] == other['future_return_pct']
+                and snap['movement_type'] == other['movement_type']
+            )
+            mismatches += not same
+    
+    if mismatches == 0:
+        print(f"   ✅ תוצאות זהות ל-{len(by_date)} snapshots")
+    else:
+        print(f"   ❌ {mismatches} snapshots שונים מהחישוב לפי מניה")
+        sys.exit(1)
+    
+except Exception as e:
+    print(f"   ❌ שגיאה בבדיקת snapshots: {e}")
+    import traceback
+    print(traceback.format_exc())
+    sys.exit(1)
+
 # סיכום
 print("\n" + "="*70)
 print("✅ כל הבדיקות הושלמו!")
@@ -181,6 +238,7 @@ print("   ✅ מנוע חישוב תקין")
 print("   ✅ ניתוח מלא עובד")
 print("   ✅ הורדת נתונים תקינה")
 print("   ✅ שמירת תוצאות עובדת")
+print("   ✅ snapshots לפי תאריך זהים לחישוב לפי מניה")
 print("\n🚀 המערכת מוכנה לשימוש!")
 print("\nלהפעלת הממשק הגרפי, הרץ:")
 print("   streamlit run deltamix.py")
@@ -0,0 +1,8 @@
+"""
+הגדרות משותפות לבדיקות - הוספת שורש הפרויקט לנתיב
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
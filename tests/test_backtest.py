@@ -0,0 +1,167 @@
+"""
+בדיקות שקילות של ה-Backtest: מול ה-DB, מקומי מה-DB ומקומי ממאגר המחירים
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_store import PriceStore
+from prediction_engine import backtest
+from prediction_engine.backtest import BacktestEngine
+
+PARAMS = {'lookback_days': 10, 'forward_days': 5, 'correlation_threshold': 0.6}
+
+# יום חול בלי מסחר במאגר
+HOLIDAY = '2022-02-28'
+
+
+class _SnapshotClient:
+    """
+    תחליף ל-SupabaseClient עם טבלת snapshots בזיכרון (אותם סינונים וסדר כמו ב-DB)
+    """
+    
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.requests = 0
+    
+    def get_correlation_snapshots(self, stock_symbol=None, start_date=None, end_date=None, limit=1000,
+                                  lookback_days=None, forward_days=None, correlation_threshold=None):
+        self.requests += 1
+        filters = {
+            'stock_symbol': stock_symbol,
+            'lookback_days': lookback_days,
+            'forward_days': forward_days,
+            'correlation_threshold': correlation_threshold
+        }
+        rows = [
+            s for s in self.snapshots
+            if all(value is None or s[key] == value for key, value in filters.items())
+            and (start_date is None or s['snapshot_date'] >= start_date)
+            and (end_date is None or s['snapshot_date'] <= end_date)
+        ]
+        rows.sort(key=lambda s: s['snapshot_date'], reverse=True)
+        return rows[:limit]
+
+
+def _write_store(root_dir: str, n_dates: int = 120, n_symbols: int = 8, seed: int = 5) -> list:
+    """
+    מאגר מחירים סינתטי עם פקטור משותף; ימי מסחר בלבד וחג באמצע
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2022-01-03', periods=n_dates).drop(pd.Timestamp(HOLIDAY))
+    factor = rng.standard_normal(len(dates)).cumsum()
+    store = PriceStore(root_dir)
+    symbols = [f'S{i}' for i in range(n_symbols)]
+    for i, symbol in enumerate(symbols):
+        prices = 100 + factor * (i % 3) + rng.standard_normal(len(dates)).cumsum()
+        volumes = 1e6 + factor * 1e4 * (i % 2) + rng.standard_normal(len(dates)) * 1e4
+        store.write(symbol, pd.DataFrame({'Close': prices, 'Adj Close': prices, 'Volume': volumes}, index=dates))
+    return symbols
+
+
+def _snapshots(engine, symbols, start_date, end_date):
+    """
+    ה-snapshots של Pre-Computation בפורמט ה-DB, ובנוסף שילוב פרמטרים אחר לאותם תאריכים
+    """
+    index = engine.load_snapshot_arrays(symbols, start_date, end_date, **PARAMS)
+    days = len(index) // len(index.universe)
+    snapshots = []
+    for row in range(len(index)):
+        future_return = index.future_returns[row]
+        snapshot = {
+            'stock_symbol': index.universe[row // days],
+            'snapshot_date': str(index.snapshot_dates[row]),
+            'matched_stocks': index.matched_stocks(row),
+            'future_return_pct': None if np.isnan(future_return) else float(future_return),
+            **PARAMS
+        }
+        snapshots.append(snapshot)
+        # שילוב אחר עם תשואה הפוכה - אסור שייכנס לחיזוי או לתוצאה
+        snapshots.append({
+            **snapshot,
+            'lookback_days': PARAMS['lookback_days'] + 5,
+            'matched_stocks': [],
+            'future_return_pct': None if snapshot['future_return_pct'] is None else -snapshot['future_return_pct']
+        })
+    return snapshots
+
+
+def _key(results):
+    return [
+        (r['stock_symbol'], r['date'], r['predicted_direction'], r['actual_direction'], r['correct'])
+        for r in results['results']
+    ]
+
+
+@pytest.fixture
+def engines(tmp_path, monkeypatch):
+    monkeypatch.setitem(backtest.PATHS, 'data_cache', str(tmp_path))
+    symbols = _write_store(str(tmp_path / 'prices'))
+    
+    offline = BacktestEngine(connect=False)
+    online = BacktestEngine(connect=False)
+    online.db_client = _SnapshotClient(_snapshots(offline, symbols, '2022-01-03', '2022-07-01'))
+    return symbols, offline, online
+
+
+def test_db_backtest_matches_offline_backtests(engines):
+    symbols, offline, online = engines
+    start_date, end_date = '2022-02-01', '2022-05-31'
+    
+    from_store = offline.run_offline_backtest(symbols, start_date, end_date, source='store', **PARAMS)
+    from_db = online.run_offline_backtest(symbols, start_date, end_date, source='db', **PARAMS)
+    per_date = online.run_backtest(symbols, start_date, end_date, **PARAMS)
+    
+    assert from_store['total_tests'] > 0
+    assert _key(from_db) == _key(from_store)
+    assert _key(per_date) == _key(from_store)
+    np.testing.assert_allclose(
+        [r['actual_return'] for r in per_date['results']],
+        [r['actual_return'] for r in from_store['results']]
+    )
+    np.testing.assert_allclose(
+        [r['predicted_return'] for r in per_date['results']],
+        [r['predicted_return'] for r in from_store['results']]
+    )
+
+
+def _visited_dates(engine, monkeypatch):
+    visited = []
+    predict = engine.get_prediction_for_date
+    
+    def spy(stock_symbol, date, *args):
+        visited.append(date.strftime('%Y-%m-%d'))
+        return predict(stock_symbol, date, *args)
+    
+    monkeypatch.setattr(engine, 'get_prediction_for_date', spy)
+    return visited
+
+
+def test_db_backtest_only_visits_trading_days(engines, monkeypatch):
+    symbols, offline, online = engines
+    visited = _visited_dates(online, monkeypatch)
+    
+    results = online.run_backtest(symbols[:1], '2022-02-01', '2022-03-31', **PARAMS)
+    
+    trading_days = online.forward_returns.calendar.dates
+    expected = trading_days[(trading_days >= '2022-02-01') & (trading_days <= '2022-03-31')]
+    assert results['total_tests'] > 0
+    assert visited == expected.strftime('%Y-%m-%d').tolist()
+    assert HOLIDAY not in visited
+
+
+def test_db_backtest_without_store_visits_snapshot_dates(engines, tmp_path, monkeypatch):
+    symbols, offline, online = engines
+    monkeypatch.setitem(backtest.PATHS, 'data_cache', str(tmp_path / 'empty'))
+    visited = _visited_dates(online, monkeypatch)
+    
+    results = online.run_backtest(symbols[:1], '2022-02-01', '2022-03-31', **PARAMS)
+    
+    snapshot_dates = sorted({
+        s['snapshot_date'] for s in online.db_client.snapshots
+        if s['stock_symbol'] == symbols[0] and '2022-02-01' <= s['snapshot_date'] <= '2022-03-31'
+    })
+    assert online.forward_returns is None
+    assert results['total_tests'] > 0
+    assert visited == snapshot_dates
@@ -0,0 +1,319 @@
+"""
+בדיקות שקילות של מנוע הקורלציה מול הלולאות המקוריות
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation_engine import CorrelationEngine
+
+
+def _volume_ratio_loop(engine: CorrelationEngine,
+                       volumes: pd.DataFrame,
+                       combined_corr: pd.DataFrame) -> pd.DataFrame:
+    """
+    calculate_volume_ratio המקורי - לולאה על כל תא
+    """
+    ratio_df = pd.DataFrame(index=volumes.index)
+    for col in volumes.columns:
+        ratios = []
+        for i in range(len(volumes)):
+            if i < engine.ma_length or combined_corr[col].iloc[i] < engine.significance:
+                ratios.append(0)
+                continue
+            avg_volume = volumes[col].iloc[i - engine.ma_length:i].mean()
+            current_volume = volumes[col].iloc[i]
+            ratios.append(avg_volume / current_volume if current_volume > 0 else 0)
+        ratio_df[col] = ratios
+    return ratio_df
+
+
+def _assert_identical(actual: np.ndarray, expected: np.ndarray):
+    """
+    שוויון ביט-לביט (NaN שווה ל-NaN)
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    assert actual.shape == expected.shape
+    assert np.array_equal(actual, expected, equal_nan=True)
+
+
+@pytest.mark.parametrize('ma_length', [3, 10, 20, 150])
+@pytest.mark.parametrize('with_gaps', [False, True])
+def test_volume_ratio_matches_loop(ma_length, with_gaps):
+    rng = np.random.default_rng(ma_length)
+    volumes = pd.DataFrame(rng.uniform(1e5, 1e9, (400, 3)), columns=['A', 'B', 'C'])
+    if with_gaps:
+        volumes.iloc[rng.integers(0, 400, 30), 1] = np.nan
+        volumes.iloc[50:54, 2] = 0
+    combined_corr = pd.DataFrame(rng.uniform(0, 1, (400, 3)), columns=['A', 'B', 'C'])
+    combined_corr.iloc[100:105, 0] = np.nan
+    
+    engine = CorrelationEngine({'ma_length': ma_length, 'significance': 0.5})
+    
+    _assert_identical(
+        engine.calculate_volume_ratio(volumes, combined_corr),
+        _volume_ratio_loop(engine, volumes, combined_corr)
+    )
+
+
+def test_volume_ratio_integer_volumes():
+    rng = np.random.default_rng(1)
+    volumes = pd.DataFrame(rng.integers(1_000_000, 10_000_000, (120, 2)), columns=['A', 'B'])
+    combined_corr = pd.DataFrame(rng.uniform(0, 1, (120, 2)), columns=['A', 'B'])
+    
+    engine = CorrelationEngine({'ma_length': 10, 'significance': 0.7})
+    
+    _assert_identical(
+        engine.calculate_volume_ratio(volumes, combined_corr),
+        _volume_ratio_loop(engine, volumes, combined_corr)
+    )
+
+
+def _combine_loop(engine: CorrelationEngine,
+                  price_corr: pd.DataFrame,
+                  volume_corr: pd.DataFrame) -> pd.DataFrame:
+    """
+    combine_correlations המקורי - לולאה על העמודות
+    """
+    combined = pd.DataFrame(index=price_corr.index)
+    for col in price_corr.columns:
+        if engine.calc_mode == 1:
+            combined[col] = price_corr[col]
+        elif engine.calc_mode == 2:
+            combined[col] = volume_corr[col]
+        elif engine.calc_mode == 3:
+            combined[col] = np.where(
+                (price_corr[col] < 0) | (volume_corr[col] < 0),
+                0,
+                price_corr[col] * volume_corr[col]
+            )
+    return combined
+
+
+@pytest.mark.parametrize('calc_mode', [1, 2, 3, 4])
+def test_combine_correlations_matches_loop(calc_mode):
+    rng = np.random.default_rng(calc_mode)
+    price_corr = pd.DataFrame(rng.uniform(-1, 1, (50, 4)), columns=['A', 'B', 'C', 'D'])
+    volume_corr = pd.DataFrame(rng.uniform(-1, 1, (50, 4)), columns=['A', 'B', 'C', 'D'])
+    price_corr.iloc[3:6, 0] = np.nan
+    volume_corr.iloc[10:12, 2] = np.nan
+    price_corr.iloc[20, 1] = 0.0
+    
+    engine = CorrelationEngine({'calc_mode': calc_mode})
+    combined = engine.combine_correlations(price_corr, volume_corr)
+    expected = _combine_loop(engine, price_corr, volume_corr)
+    
+    assert list(combined.columns) == list(expected.columns)
+    assert combined.index.equals(expected.index)
+    _assert_identical(combined, expected)
+
+
+def _rolling_correlation_loop(series: pd.Series, reference: pd.Series, window: int) -> np.ndarray:
+    """
+    calculate_rolling_correlation המקורי - corr של pandas לכל חלון
+    """
+    correlations = []
+    for i in range(len(series)):
+        if i < window - 1:
+            correlations.append(0)
+            continue
+        stock_window = series.iloc[i - window + 1:i + 1]
+        ref_window = reference.iloc[i - window + 1:i + 1]
+        if stock_window.notna().all() and ref_window.notna().all():
+            corr = stock_window.corr(ref_window)
+            correlations.append(corr if not np.isnan(corr) else 0)
+        else:
+            correlations.append(0)
+    return np.array(correlations, dtype=np.float64)
+
+
+@pytest.mark.parametrize('window', [2, 15, 40])
+def test_rolling_correlation_matches_loop(window):
+    rng = np.random.default_rng(window)
+    series = pd.Series(100 + rng.standard_normal(200).cumsum())
+    reference = pd.Series(3e9 + series.to_numpy() * 1e6 + rng.standard_normal(200) * 1e7)
+    series.iloc[60:63] = np.nan
+    reference.iloc[120] = np.nan
+    series.iloc[150:150 + window + 5] = 42.0
+    
+    engine = CorrelationEngine({})
+    actual = engine.calculate_rolling_correlation(series, reference, window).to_numpy()
+    
+    np.testing.assert_allclose(actual, _rolling_correlation_loop(series, reference, window), rtol=0, atol=1e-9)
+
+
+
+@pytest.mark.parametrize('window', [15, 40])
+def test_rolling_correlation_low_variance_stretch_matches_loop(window):
+    # תקופה ארוכה כמעט שטוחה (לא קבועה) ואחריה מגמה - שונות החלון זניחה ביחס לשונות הכללית
+    rng = np.random.default_rng(window)
+    flat = 100 + rng.uniform(-1e-3, 1e-3, 600)
+    trend = 100 + np.linspace(0, 400, 300) + rng.standard_normal(300)
+    series = pd.Series(np.concatenate([flat, trend]))
+    reference = pd.Series(50 + rng.standard_normal(900).cumsum())
+    
+    engine = CorrelationEngine({})
+    actual = engine.calculate_rolling_correlation(series, reference, window).to_numpy()
+    
+    np.testing.assert_allclose(actual, _rolling_correlation_loop(series, reference, window), rtol=0, atol=1e-9)
+
+def _stock_frame(n_dates: int = 150, n_symbols: int = 6, seed: int = 2) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    factor = rng.standard_normal(n_dates).cumsum()
+    columns = {}
+    for i in range(n_symbols):
+        columns[(f'S{i}', 'Close')] = 100 + factor * (i % 3) + rng.standard_normal(n_dates).cumsum()
+    return pd.DataFrame(columns, index=pd.bdate_range('2022-01-03', periods=n_dates))
+
+
+def _rolling_matrix_loop(data_df: pd.DataFrame, window: int) -> pd.DataFrame:
+    """
+    calculate_rolling_correlation_matrix המקורי - dropna ו-corr לכל חלון ואז nanmean
+    """
+    correlations_list = []
+    for i in range(window - 1, len(data_df)):
+        valid_data = data_df.iloc[i - window + 1:i + 1].dropna()
+        if len(valid_data) >= window * 0.8:
+            correlations_list.append(valid_data.corr().to_numpy())
+    with np.errstate(invalid='ignore'):
+        return pd.DataFrame(np.nanmean(correlations_list, axis=0), index=data_df.columns, columns=data_df.columns)
+
+
+@pytest.mark.parametrize('window', [5, 15, 30])
+def test_rolling_correlation_matrix_matches_loop(window):
+    stock_data = _stock_frame()
+    stock_data.iloc[20:22, 1] = np.nan
+    stock_data.iloc[70:70 + window + 3, 4] = 50.0
+    
+    engine = CorrelationEngine({})
+    actual = engine.calculate_rolling_correlation_matrix(stock_data, 'Close', window)
+    expected = _rolling_matrix_loop(engine.get_field_frame(stock_data, 'Close'), window)
+    
+    assert actual.index.equals(expected.index)
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=0, atol=1e-9)
+
+
+def test_correlation_tensor_matches_per_stock_frames():
+    stock_data = _stock_frame()
+    stock_data.iloc[40:43, 2] = np.nan
+    
+    engine = CorrelationEngine({})
+    frames = engine.calculate_rolling_correlation_over_time(stock_data, 'Close', 20)
+    tensor = engine.calculate_rolling_correlation_over_time(stock_data, 'Close', 20, as_tensor=True)
+    
+    assert tensor['values'].dtype == np.float32
+    assert len(tensor['pairs']) == 6 * 5 // 2
+    for stock1, frame in frames.items():
+        for stock2 in frame.columns:
+            series = engine.get_pair_correlation_series(tensor, stock1, stock2)
+            np.testing.assert_allclose(series.to_numpy(), frame[stock2].to_numpy(), rtol=0, atol=1e-6)
+    
+    date = stock_data.index[100]
+    cross_section = engine.get_correlations_at_date(tensor, date)
+    for (stock1, stock2), value in cross_section.items():
+        assert value == pytest.approx(frames[stock1].loc[date, stock2], abs=1e-6)
+
+
+def _top_correlations_loop(correlation_matrix: pd.DataFrame, top_n: int) -> pd.DataFrame:
+    """
+    find_top_correlations המקורי - כל המשולש העליון ואז מיון
+    """
+    correlations = []
+    for i, stock1 in enumerate(correlation_matrix.index):
+        for j, stock2 in enumerate(correlation_matrix.columns):
+            if i < j and not np.isnan(correlation_matrix.iloc[i, j]):
+                correlations.append({'מניה 1': stock1, 'מניה 2': stock2, 'קורלציה': correlation_matrix.iloc[i, j]})
+    return pd.DataFrame(correlations).sort_values('קורלציה', ascending=False).head(top_n).reset_index(drop=True)
+
+
+def _correlation_matrix(n_symbols: int = 30, seed: int = 4) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(-1, 1, (n_symbols, n_symbols))
+    values = (values + values.T) / 2
+    np.fill_diagonal(values, 1.0)
+    values[3, 7] = values[7, 3] = np.nan
+    symbols = [f'S{i}' for i in range(n_symbols)]
+    return pd.DataFrame(values, index=symbols, columns=symbols)
+
+
+@pytest.mark.parametrize('top_n', [1, 10, 500])
+def test_top_correlations_match_sort(top_n):
+    correlation_matrix = _correlation_matrix()
+    
+    actual = CorrelationEngine({}).find_top_correlations(correlation_matrix, top_n)
+    
+    pd.testing.assert_frame_equal(actual, _top_correlations_loop(correlation_matrix, top_n), check_dtype=False)
+
+
+def test_top_correlations_per_symbol_match_sort():
+    correlation_matrix = _correlation_matrix()
+    
+    actual = CorrelationEngine({}).find_top_correlations(correlation_matrix, 5, per_symbol=True, min_correlation=0.2)
+    
+    expected = []
+    for stock1 in correlation_matrix.index:
+        row = correlation_matrix.loc[stock1].drop(stock1).dropna()
+        row = row[row >= 0.2].sort_values(ascending=False).head(5)
+        expected.extend({'מניה 1': stock1, 'מניה 2': stock2, 'קורלציה': value} for stock2, value in row.items())
+    pd.testing.assert_frame_equal(actual, pd.DataFrame(expected), check_dtype=False)
+
+
+def _reference_block(n_dates: int = 160, seed: int = 9):
+    """
+    בלוק (dates × symbols) עם עמודה ריקה, פערים ועמודה קבועה, וסדרת ייחוס
+    """
+    rng = np.random.default_rng(seed)
+    reference = 3e9 + rng.standard_normal(n_dates).cumsum() * 1e7
+    block = 100 + rng.standard_normal((n_dates, 5)).cumsum(axis=0)
+    block[:, 1] += reference * 1e-8
+    block[:, 2] = np.nan
+    block[30:34, 3] = np.nan
+    block[:, 4] = 42.0
+    reference[90] = np.nan
+    return block, reference
+
+
+@pytest.mark.parametrize('window', [2, 15, 40])
+def test_reference_correlations_match_per_column(window):
+    block, reference = _reference_block()
+    engine = CorrelationEngine({})
+    
+    actual = engine.calculate_reference_correlations(block, reference, window)
+    
+    assert actual.dtype == np.float32
+    assert actual.shape == block.shape
+    for column in range(block.shape[1]):
+        expected = engine.calculate_rolling_correlation(pd.Series(block[:, column]), pd.Series(reference), window)
+        np.testing.assert_allclose(actual[:, column], expected.to_numpy(), rtol=0, atol=1e-6)
+
+
+def test_full_analysis_matches_per_symbol_loop():
+    stock_data = _stock_frame()
+    rng = np.random.default_rng(3)
+    for symbol in stock_data.columns.get_level_values(0).unique():
+        stock_data[(symbol, 'Volume')] = rng.uniform(1e6, 5e6, len(stock_data))
+    stock_data.iloc[:, 2] = np.nan
+    reference = _stock_frame(seed=7)[('S1', 'Close')]
+    reference_volumes = pd.Series(rng.uniform(1e6, 5e6, len(stock_data)), index=stock_data.index)
+    
+    engine = CorrelationEngine({'block_length': 15, 'significance': 0.3, 'ma_length': 5, 'threshold': 0.01})
+    results = engine.run_full_analysis(stock_data, reference, reference_volumes)
+    
+    price_df = engine.get_field_frame(stock_data, 'Close')
+    volume_df = engine.get_field_frame(stock_data, 'Volume')
+    for symbol in price_df.columns:
+        expected_price = engine.calculate_rolling_correlation(price_df[symbol], reference, 15)
+        expected_volume = engine.calculate_rolling_correlation(volume_df[symbol], reference_volumes, 15)
+        np.testing.assert_allclose(results['price_correlations'][symbol], expected_price, rtol=0, atol=1e-6)
+        np.testing.assert_allclose(results['volume_correlations'][symbol], expected_volume, rtol=0, atol=1e-6)
+    
+    ratio_df = results['volume_ratios']
+    assert results['statistics'] == engine.calculate_statistics(ratio_df)
+    assert set(results['statistics']) == set(price_df.columns)
+    
+    today = engine.find_today_opportunities(results)
+    expected = {symbol for symbol, ratio in ratio_df.iloc[-1].items() if ratio > 1.01}
+    assert {opp['symbol'] for opp in today} == expected
+    assert all(opp['date'] == stock_data.index[-1] for opp in today)
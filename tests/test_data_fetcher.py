@@ -0,0 +1,274 @@
+"""
+בדיקות ה-DataFetcher מול transport מדומה: ניסיונות חוזרים, מגבלת קצב, קבוצות, עדכון אינקרמנטלי ו-restatement
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_fetcher
+from data_fetcher import DataFetcher, _RateLimiter
+
+
+def _history(periods: int = 300, start: str = '2020-01-01', seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(periods).cumsum()
+    return pd.DataFrame({
+        'Open': close + 0.5,
+        'High': close + 1.0,
+        'Low': close - 1.0,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 5_000_000, periods).astype(float)
+    }, index=pd.bdate_range(start, periods=periods))
+
+
+class _FakeTransport:
+    """
+    transport בזיכרון: היסטוריה מלאה לכל מניה, שגיאות מתוזמנות ורישום של כל בקשה
+    """
+    
+    host = 'fake.host'
+    
+    def __init__(self, histories, failures=None):
+        self.histories = histories
+        self.failures = {symbol: list(errors) for symbol, errors in (failures or {}).items()}
+        self.calls = []
+        self._lock = threading.Lock()
+    
+    def _slice(self, symbol, start_date, end_date):
+        df = self.histories.get(symbol)
+        if df is None:
+            return pd.DataFrame()
+        return df[(df.index >= pd.Timestamp(start_date)) & (df.index < pd.Timestamp(end_date))]
+    
+    def _record(self, method, symbols, start_date, end_date):
+        with self._lock:
+            self.calls.append((method, tuple(symbols), start_date, end_date))
+            for symbol in symbols:
+                if self.failures.get(symbol):
+                    raise self.failures[symbol].pop(0)
+    
+    def history(self, symbol, start_date, end_date):
+        self._record('history', [symbol], start_date, end_date)
+        return self._slice(symbol, start_date, end_date)
+    
+    def history_many(self, symbols, start_date, end_date):
+        self._record('history_many', symbols, start_date, end_date)
+        frames = {symbol: self._slice(symbol, start_date, end_date) for symbol in symbols}
+        return {symbol: df for symbol, df in frames.items() if not df.empty}
+    
+    def is_delisted(self, symbol):
+        return symbol not in self.histories
+
+
+SYMBOLS = [f'S{i}' for i in range(7)]
+
+
+def _fetcher(tmp_path, name, transport, **kwargs):
+    kwargs.setdefault('requests_per_second', 0)
+    kwargs.setdefault('retry_backoff', 0)
+    return DataFetcher(cache_dir=str(tmp_path / name), transport=transport, **kwargs)
+
+
+def test_transient_errors_are_retried(tmp_path):
+    transport = _FakeTransport({'AAA': _history()}, {'AAA': [ConnectionError('timed out')] * 2})
+    fetcher = _fetcher(tmp_path, 'cache', transport, max_retries=3)
+    
+    df = fetcher.download_stock_data('AAA', '2020-01-01', '2021-01-01')
+    
+    assert df is not None and len(df) > 0
+    assert len(transport.calls) == 3
+
+
+def test_retries_stop_after_max_retries(tmp_path):
+    transport = _FakeTransport({'AAA': _history()}, {'AAA': [ConnectionError('timed out')] * 5})
+    fetcher = _fetcher(tmp_path, 'cache', transport, max_retries=2)
+    
+    assert fetcher.download_stock_data('AAA', '2020-01-01', '2021-01-01') is None
+    assert len(transport.calls) == 3
+
+
+def test_permanent_errors_are_not_retried(tmp_path):
+    transport = _FakeTransport({'AAA': _history()}, {'AAA': [ValueError('AAA: possibly delisted; no price data found')]})
+    fetcher = _fetcher(tmp_path, 'cache', transport, max_retries=3)
+    
+    assert fetcher.download_stock_data('AAA', '2020-01-01', '2021-01-01') is None
+    assert len(transport.calls) == 1
+
+
+def test_retry_backoff_grows_exponentially(tmp_path, monkeypatch):
+    delays = []
+    monkeypatch.setattr(data_fetcher.time, 'sleep', delays.append)
+    transport = _FakeTransport({'AAA': _history()}, {'AAA': [ConnectionError('timed out')] * 3})
+    fetcher = _fetcher(tmp_path, 'cache', transport, max_retries=3, retry_backoff=1.0)
+    
+    fetcher._call_with_retry(transport.history, 'AAA', '2020-01-01', '2021-01-01', host=None)
+    
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        assert 0.5 * 2 ** attempt <= delay <= 1.5 * 2 ** attempt
+
+
+def test_rate_limiter_is_shared_across_threads():
+    limiter = _RateLimiter(requests_per_second=50)
+    calls = 10
+    
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.wait) for _ in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert time.monotonic() - start >= (calls - 1) * limiter.interval * 0.95
+
+
+def test_batched_download_matches_single_requests(tmp_path):
+    histories = {symbol: _history(seed=i) for i, symbol in enumerate(SYMBOLS)}
+    single = _FakeTransport(histories)
+    batched = _FakeTransport(histories)
+    
+    expected = _fetcher(tmp_path, 'single', single, batch_size=1).download_multiple_stocks(SYMBOLS, '2020-01-01', '2021-01-01')
+    actual = _fetcher(tmp_path, 'batched', batched, batch_size=3).download_multiple_stocks(SYMBOLS, '2020-01-01', '2021-01-01')
+    
+    pd.testing.assert_frame_equal(actual, expected)
+    assert {call[0] for call in single.calls} == {'history'}
+    assert sorted(len(call[1]) for call in batched.calls) == [1, 3, 3]
+
+
+def test_incremental_update_matches_full_download(tmp_path):
+    histories = {symbol: _history(seed=i) for i, symbol in enumerate(SYMBOLS[:3])}
+    last_date = histories[SYMBOLS[0]].index[-1].strftime('%Y-%m-%d')
+    transport = _FakeTransport(histories)
+    
+    fetcher = _fetcher(tmp_path, 'incremental', transport)
+    fetcher.download_multiple_stocks(SYMBOLS[:3], '2020-01-01', '2020-08-01')
+    stats = fetcher.update_incremental(SYMBOLS[:3], end_date=last_date, overlap_days=7)
+    
+    full = _fetcher(tmp_path, 'full', _FakeTransport(histories))
+    full.download_multiple_stocks(SYMBOLS[:3], '2020-01-01', (pd.Timestamp(last_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
+    
+    assert sorted(stats['appended']) == SYMBOLS[:3]
+    assert stats['failed'] == [] and stats['restated'] == []
+    for symbol in SYMBOLS[:3]:
+        pd.testing.assert_frame_equal(fetcher.store.read(symbol), full.store.read(symbol))
+    # רק הזנב (עם החפיפה) הורד בעדכון
+    update_starts = {call[2] for call in transport.calls[1:]}
+    assert all(pd.Timestamp(start) >= pd.Timestamp('2020-07-01') for start in update_starts)
+
+
+def test_restatement_rewrites_history(tmp_path):
+    histories = {'AAA': _history(seed=1), 'BBB': _history(seed=2)}
+    last_date = histories['AAA'].index[-1].strftime('%Y-%m-%d')
+    transport = _FakeTransport(dict(histories))
+    
+    fetcher = _fetcher(tmp_path, 'cache', transport)
+    fetcher.download_multiple_stocks(['AAA', 'BBB'], '2020-01-01', '2020-08-01')
+    
+    # פיצול 1:2 - כל ההיסטוריה של AAA מותאמת מחדש
+    split = histories['AAA'].copy()
+    split[['Open', 'High', 'Low', 'Close']] /= 2
+    transport.histories['AAA'] = split
+    stats = fetcher.update_incremental(['AAA', 'BBB'], end_date=last_date)
+    
+    assert stats['restated'] == ['AAA']
+    assert stats['appended'] == ['BBB']
+    expected = fetcher.store.normalize(split)
+    stored = fetcher.store.read('AAA')
+    np.testing.assert_allclose(stored['Close'].to_numpy(), expected['Close'].to_numpy())
+    assert stored.index.equals(expected.index)
+
+
+def test_resolve_history_fetches_only_missing_ranges(tmp_path):
+    histories = {'AAA': _history(seed=3)}
+    transport = _FakeTransport(histories)
+    fetcher = _fetcher(tmp_path, 'cache', transport)
+    fetcher.download_stock_data('AAA', '2020-03-01', '2020-06-01')
+    transport.calls.clear()
+    
+    stock_data = fetcher.resolve_history(['AAA'], '2020-01-01', '2020-09-01', ['Close'])
+    
+    assert len(transport.calls) == 2
+    for _, _, start_date, end_date in transport.calls:
+        assert end_date <= '2020-03-01' or start_date >= '2020-06-01'
+    expected = histories['AAA'].loc['2020-01-01':'2020-08-31', 'Close']
+    np.testing.assert_allclose(stock_data[('AAA', 'Close')].to_numpy(), expected.to_numpy())
+    
+    transport.calls.clear()
+    fetcher.resolve_history(['AAA'], '2020-01-01', '2020-09-01', ['Close'])
+    assert transport.calls == []
+
+
+@pytest.mark.parametrize('gap_days', [0, 30])
+def test_disjoint_downloads_keep_both_ranges_covered(tmp_path, gap_days):
+    transport = _FakeTransport({'AAA': _history(seed=4)})
+    fetcher = _fetcher(tmp_path, 'cache', transport)
+    second_start = (pd.Timestamp('2020-04-01') + pd.Timedelta(days=gap_days)).strftime('%Y-%m-%d')
+    
+    fetcher.download_stock_data('AAA', '2020-01-01', '2020-04-01')
+    fetcher.download_stock_data('AAA', second_start, '2020-09-01')
+    transport.calls.clear()
+    
+    assert fetcher.download_stock_data('AAA', '2020-01-01', '2020-04-01') is not None
+    assert fetcher.download_stock_data('AAA', second_start, '2020-09-01') is not None
+    assert transport.calls == []
+
+
+def _history_until_today(periods: int = 60, seed: int = 5) -> pd.DataFrame:
+    """
+    היסטוריה שהבר האחרון שלה הוא היום (יום מסחר פתוח)
+    """
+    history = _history(periods=periods, seed=seed)
+    history.index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=periods)
+    return history
+
+
+def test_open_day_is_fetched_again(tmp_path):
+    history = _history_until_today()
+    today = history.index[-1]
+    transport = _FakeTransport({'AAA': history})
+    fetcher = _fetcher(tmp_path, 'cache', transport)
+    
+    df = fetcher.download_stock_data('AAA', history.index[0].strftime('%Y-%m-%d'))
+    
+    assert df.index[-1] == today
+    assert fetcher.store.coverage('AAA')['fetched_end'] == today.strftime('%Y-%m-%d')
+    
+    # אחרי הסגירה הבר של היום משתנה - רק היום מורד שוב
+    closed = history.copy()
+    closed.loc[today, 'Close'] += 5
+    transport.histories['AAA'] = closed
+    transport.calls.clear()
+    
+    df = fetcher.download_stock_data('AAA', history.index[0].strftime('%Y-%m-%d'))
+    
+    assert [call[2] for call in transport.calls] == [today.strftime('%Y-%m-%d')]
+    assert df.loc[today, 'Close'] == closed.loc[today, 'Close']
+    assert len(df) == len(history)
+
+
+def test_intraday_update_does_not_cover_open_or_future_days(tmp_path):
+    history = _history_until_today()
+    today = history.index[-1].strftime('%Y-%m-%d')
+    future = (history.index[-1] + pd.Timedelta(days=10)).strftime('%Y-%m-%d')
+    transport = _FakeTransport({'AAA': history})
+    fetcher = _fetcher(tmp_path, 'cache', transport)
+    fetcher.download_stock_data('AAA', history.index[0].strftime('%Y-%m-%d'), history.index[-5].strftime('%Y-%m-%d'))
+    
+    stats = fetcher.update_incremental(['AAA'], end_date=future)
+    
+    assert stats['appended'] == ['AAA']
+    assert fetcher.store.coverage('AAA')['fetched_end'] == today
+    assert fetcher.store.missing_ranges('AAA', today, future) == [(today, future)]
+    
+    # ריצה נוספת אחרי הסגירה מעדכנת את הבר של היום
+    closed = history.copy()
+    closed.loc[today, 'Close'] += 5
+    transport.histories['AAA'] = closed
+    fetcher.update_incremental(['AAA'], end_date=today)
+    
+    assert fetcher.store.read('AAA').loc[today, 'Close'] == closed.loc[today, 'Close']
+    assert fetcher.store.coverage('AAA')['fetched_end'] == today
@@ -0,0 +1,116 @@
+"""
+בדיקות ה-SupabaseClient מול טבלה מדומה עם תקרת השורות של PostgREST
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from prediction_engine import db_client
+from prediction_engine.db_client import SupabaseClient
+
+
+class _FakeQuery:
+    """
+    builder מדומה: מסנן, ממיין ומחזיר עד max_rows שורות כמו PostgREST
+    """
+    
+    def __init__(self, table):
+        self.table = table
+        self.filters = []
+        self.orders = []
+        self.bounds = None
+    
+    def select(self, columns):
+        return self
+    
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+    
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+    
+    def lte(self, column, value):
+        self.filters.append(lambda row: row[column] <= value)
+        return self
+    
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+    
+    def range(self, start, end):
+        assert self.bounds is None, "range() נקרא פעמיים על אותו builder"
+        self.bounds = (start, end)
+        return self
+    
+    def execute(self):
+        rows = [row for row in self.table.rows if all(f(row) for f in self.filters)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        start, end = self.bounds if self.bounds is not None else (0, len(rows) - 1)
+        self.table.requests += 1
+        return type('Response', (), {'data': rows[start:end + 1][:self.table.max_rows]})()
+
+
+class _FakeTable:
+    def __init__(self, rows, max_rows):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.requests = 0
+
+
+def _client(rows, max_rows=1000):
+    table = _FakeTable(rows, max_rows)
+    client = SupabaseClient.__new__(SupabaseClient)
+    client.client = type('Client', (), {'table': lambda self, name: _FakeQuery(table)})()
+    return client, table
+
+
+def _rows(days, combos):
+    return [
+        {
+            'stock_symbol': 'AAA',
+            'snapshot_date': (date(2000, 1, 3) + timedelta(days=day)).isoformat(),
+            'lookback_days': lookback,
+            'forward_days': 15,
+            'correlation_threshold': 0.85
+        }
+        for day in range(days)
+        for lookback in combos
+    ]
+
+
+@pytest.mark.parametrize('limit', [1, 999, 1000, 1001, 2500, 10000])
+def test_snapshots_are_paged_past_the_row_cap(monkeypatch, limit):
+    monkeypatch.setattr(db_client, 'PAGE_SIZE', 1000)
+    rows = _rows(1200, [10, 15])
+    client, table = _client(rows, max_rows=1000)
+    
+    snapshots = client.get_correlation_snapshots(stock_symbol='AAA', limit=limit)
+    
+    assert len(snapshots) == min(limit, len(rows))
+    keys = [(s['snapshot_date'], s['lookback_days']) for s in snapshots]
+    assert len(set(keys)) == len(keys)
+    assert [s['snapshot_date'] for s in snapshots] == sorted((s['snapshot_date'] for s in snapshots), reverse=True)
+
+
+def test_short_page_ends_the_scan():
+    client, table = _client(_rows(1500, [15]))
+    
+    snapshots = client.get_correlation_snapshots(stock_symbol='AAA', limit=10000)
+    
+    assert len(snapshots) == 1500
+    assert table.requests == 2
+
+
+def test_snapshots_are_filtered_by_parameter_combo():
+    client, table = _client(_rows(300, [10, 15]))
+    
+    snapshots = client.get_correlation_snapshots(
+        stock_symbol='AAA', limit=1000, lookback_days=10, forward_days=15, correlation_threshold=0.85
+    )
+    
+    assert len(snapshots) == 300
+    assert {s['lookback_days'] for s in snapshots} == {10}
@@ -0,0 +1,155 @@
+"""
+בדיקות מטריצת התשואות העתידיות ולוח ימי המסחר מול החישוב לכל תא
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_store import PriceStore
+from prediction_engine.config import COMPUTATION_PARAMS
+from prediction_engine.forward_returns import ForwardReturnMatrix, classify_movements, movement_labels
+from prediction_engine.trading_calendar import TradingCalendar
+from prediction_engine.utils import calculate_future_return, classify_movement, resolve_row
+
+THRESHOLDS = COMPUTATION_PARAMS['movement_thresholds']
+
+
+def _prices(n_dates: int = 60, n_symbols: int = 4, seed: int = 8) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    prices = pd.DataFrame(
+        100 * np.exp(rng.normal(0, 0.04, (n_dates, n_symbols)).cumsum(axis=0)),
+        index=pd.bdate_range('2022-01-03', periods=n_dates),
+        columns=[f'S{i}' for i in range(n_symbols)]
+    )
+    prices.iloc[5:8, 1] = np.nan
+    prices.iloc[20, 2] = 0.0
+    return prices
+
+
+@pytest.mark.parametrize('thresholds', [
+    THRESHOLDS,
+    {'strong_up': 8.0, 'moderate_up': 3.0, 'neutral_upper': 2.0, 'neutral_lower': -2.0, 'moderate_down': -3.0, 'strong_down': -8.0}
+])
+def test_classify_movements_matches_classify_movement(thresholds):
+    edges = sorted(set(thresholds.values()))
+    returns = np.concatenate([
+        np.linspace(-20, 20, 4001),
+        edges,
+        np.nextafter(edges, np.inf),
+        np.nextafter(edges, -np.inf),
+        [np.nan]
+    ])
+    
+    labels = movement_labels(classify_movements(returns, thresholds))
+    
+    expected = [None if np.isnan(r) else classify_movement(r, thresholds) for r in returns]
+    assert labels == expected
+
+
+@pytest.mark.parametrize('forward_days', [1, 5, 15])
+def test_matrix_matches_calculate_future_return(forward_days):
+    prices = _prices()
+    stock_data = pd.concat({symbol: prices[[symbol]].rename(columns={symbol: 'Adj Close'}) for symbol in prices.columns}, axis=1)
+    
+    matrix = ForwardReturnMatrix.from_prices(prices, forward_days, THRESHOLDS)
+    
+    for symbol in prices.columns:
+        for date in prices.index:
+            future_return = calculate_future_return(stock_data, symbol, date, forward_days)
+            expected_type = None if future_return is None else classify_movement(future_return, THRESHOLDS)
+            actual_return, actual_type = matrix.get(symbol, date)
+            if future_return is None:
+                assert actual_return is None
+            else:
+                assert actual_return == pytest.approx(future_return, rel=1e-12)
+            assert actual_type == expected_type
+
+
+def test_matrix_roundtrip_and_store_cache(tmp_path):
+    prices = _prices()
+    store = PriceStore(str(tmp_path / 'prices'))
+    for symbol in prices.columns:
+        store.write(symbol, pd.DataFrame({'Close': prices[symbol], 'Adj Close': prices[symbol]}).dropna())
+    
+    matrix = ForwardReturnMatrix.from_store(store, list(prices.columns), 5, THRESHOLDS, start_date='2022-01-01')
+    cached = ForwardReturnMatrix.from_store(store, list(prices.columns), 5, THRESHOLDS, start_date='2022-01-01')
+    np.testing.assert_array_equal(cached.returns, matrix.returns)
+    np.testing.assert_array_equal(cached.codes, matrix.codes)
+    assert cached.dates.equals(matrix.dates)
+    
+    # restatement של מניה - המטריצה נבנית מחדש ולא נטענת מהקאש הישן
+    restated = prices['S0'] / 2
+    restated.iloc[-1] *= 1.5
+    store.write('S0', pd.DataFrame({'Close': restated, 'Adj Close': restated}))
+    rebuilt = ForwardReturnMatrix.from_store(store, list(prices.columns), 5, THRESHOLDS, start_date='2022-01-01')
+    assert not np.array_equal(rebuilt.returns[:, 0], matrix.returns[:, 0], equal_nan=True)
+
+
+def _calendar_dates() -> pd.DatetimeIndex:
+    return pd.bdate_range('2022-01-03', periods=40).delete([7, 8, 20])
+
+
+@pytest.mark.parametrize('snap', ['exact', 'previous', 'next'])
+def test_calendar_positions_match_searchsorted(snap):
+    dates = _calendar_dates()
+    calendar = TradingCalendar(dates)
+    queries = pd.date_range('2021-12-25', '2022-03-10', freq='D')
+    
+    positions = calendar.positions(queries, snap)
+    
+    for query, vector_position in zip(queries, positions.tolist()):
+        if query in dates:
+            expected = dates.get_loc(query)
+        elif snap == 'previous':
+            expected = int(dates.searchsorted(query, side='right')) - 1
+        elif snap == 'next':
+            expected = int(dates.searchsorted(query, side='left'))
+            expected = expected if expected < len(dates) else -1
+        else:
+            expected = -1
+        position = calendar.position(query, snap)
+        assert (-1 if position is None else position) == expected
+        assert vector_position == expected
+
+
+def test_calendar_between_and_validation():
+    dates = _calendar_dates()
+    calendar = TradingCalendar(dates)
+    
+    positions = calendar.between('2022-01-08', '2022-02-01')
+    expected = np.flatnonzero((dates >= '2022-01-08') & (dates <= '2022-02-01'))
+    np.testing.assert_array_equal(positions, expected)
+    assert [calendar.date(p) for p in positions] == list(dates[expected])
+    np.testing.assert_array_equal(calendar.between(), np.arange(len(dates)))
+    
+    with pytest.raises(ValueError):
+        TradingCalendar(dates[::-1])
+    with pytest.raises(ValueError):
+        TradingCalendar(dates.append(dates[:1]))
+    with pytest.raises(ValueError):
+        calendar.position('2022-01-08', snap='nearest')
+
+
+def test_calendar_is_built_once_per_frame(monkeypatch):
+    prices = _prices()
+    stock_data = pd.concat({symbol: prices[[symbol]].rename(columns={symbol: 'Adj Close'}) for symbol in prices.columns}, axis=1)
+    
+    built = []
+    init = TradingCalendar.__init__
+    
+    def counting_init(self, dates):
+        built.append(len(dates))
+        init(self, dates)
+    
+    monkeypatch.setattr(TradingCalendar, '__init__', counting_init)
+    for date in prices.index[:20]:
+        calculate_future_return(stock_data, 'S0', date, 5)
+        assert resolve_row(stock_data, date) == prices.index.get_loc(date)
+    
+    assert built == [len(prices)]
+    
+    # אינדקס אחר (גם אם שווה) מקבל לוח משלו
+    other = stock_data.copy()
+    other.index = prices.index.copy()
+    assert TradingCalendar.from_frame(other) is not TradingCalendar.from_frame(stock_data)
@@ -0,0 +1,128 @@
+"""
+בדיקות אינדקס ה-MinHash/LSH: עדכון אינקרמנטלי מול בנייה אחת, ודירוג מול calculate_similarity
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from prediction_engine.pattern_index import PatternIndex
+from prediction_engine.utils import calculate_similarity
+
+PARAMS = {'lookback_days': 15, 'forward_days': 15, 'correlation_threshold': 0.85, 'window_type': 'rolling'}
+
+
+def _snapshots(n_dates: int = 80, n_symbols: int = 12, seed: int = 11, stock_symbol: str = 'AAA'):
+    """
+    snapshots סינתטיים עם קבוצות התאמות חוזרות (כדי שיהיו מקרים דומים)
+    """
+    rng = np.random.default_rng(seed)
+    universe = [f'S{i}' for i in range(n_symbols)]
+    patterns = [rng.choice(universe, size=rng.integers(2, 6), replace=False).tolist() for _ in range(6)]
+    snapshots = []
+    for date in pd.bdate_range('2021-01-04', periods=n_dates).strftime('%Y-%m-%d'):
+        symbols = list(patterns[rng.integers(len(patterns))])
+        if rng.random() < 0.3:
+            symbols.append(universe[rng.integers(n_symbols)])
+        snapshots.append({
+            'stock_symbol': stock_symbol,
+            'snapshot_date': date,
+            'matched_stocks': [{'symbol': s, 'corr_price': float(rng.uniform(0.85, 1.0))} for s in dict.fromkeys(symbols)],
+            'future_return_pct': None if rng.random() < 0.1 else float(rng.normal())
+        })
+    return snapshots
+
+
+def _index(tmp_path, name):
+    return PatternIndex(str(tmp_path / name), PARAMS, num_perm=32, bands=16)
+
+
+def _state(index, stock_symbol, dates):
+    return [
+        (date, index.matched_stocks(stock_symbol, date),
+         index.query(stock_symbol, index.matched_stocks(stock_symbol, date), top_k=None, before_date=date))
+        for date in dates
+    ]
+
+
+def test_incremental_updates_match_single_build(tmp_path):
+    snapshots = _snapshots()
+    dates = [s['snapshot_date'] for s in snapshots]
+    
+    built = _index(tmp_path, 'built')
+    built.add_snapshots(snapshots)
+    
+    # עדכון יומי, ואחריו החלפת תאריכים קיימים והוספת תאריך מוקדם
+    incremental = _index(tmp_path, 'incremental')
+    held_back = snapshots[10]
+    for snapshot in snapshots[:10] + snapshots[11:]:
+        incremental.add_snapshots([{**snapshot, 'matched_stocks': [], 'future_return_pct': None}]
+                                  if snapshot['snapshot_date'] in dates[20:23] else [snapshot])
+    incremental.add_snapshots(snapshots[20:23])
+    incremental.add_snapshots([held_back])
+    
+    expected = _state(built, 'AAA', dates)
+    assert _state(incremental, 'AAA', dates) == expected
+    assert _state(_index(tmp_path, 'incremental'), 'AAA', dates) == expected
+    assert incremental.snapshot_dates('AAA').tolist() == dates
+
+
+def test_appended_buckets_match_a_full_sort(tmp_path):
+    snapshots = _snapshots()
+    index = _index(tmp_path, 'appended')
+    for snapshot in snapshots:
+        index.add_snapshots([snapshot])
+    
+    entry = index._stocks['AAA']
+    resorted = index._with_bands({key: value for key, value in entry.items() if not key.startswith('band_')})
+    np.testing.assert_array_equal(entry['band_keys'], resorted['band_keys'])
+    np.testing.assert_array_equal(entry['band_order'], resorted['band_order'])
+
+
+def test_query_scores_match_calculate_similarity(tmp_path):
+    snapshots = _snapshots()
+    index = _index(tmp_path, 'query')
+    index.add_snapshots(snapshots)
+    
+    for current in snapshots[40:]:
+        date = current['snapshot_date']
+        results = index.query('AAA', current['matched_stocks'], top_k=None, before_date=date, min_similarity=0.5)
+        found = {r['date']: r['similarity'] for r in results}
+        
+        brute_force = {
+            s['snapshot_date']: calculate_similarity(current['matched_stocks'], s['matched_stocks'])
+            for s in snapshots if s['snapshot_date'] < date
+        }
+        # דירוג מדויק לכל מועמד, ואותה קבוצת מניות תמיד נמצאת (חתימות זהות)
+        for found_date, similarity in found.items():
+            assert similarity == brute_force[found_date]
+            assert similarity > 0.5
+        symbols = {m['symbol'] for m in current['matched_stocks']}
+        for s in snapshots:
+            if s['snapshot_date'] < date and {m['symbol'] for m in s['matched_stocks']} == symbols:
+                assert s['snapshot_date'] in found or brute_force[s['snapshot_date']] <= 0.5
+
+
+def test_concurrent_writers_of_one_stock_do_not_clobber_temp_files(tmp_path):
+    snapshots = _snapshots()
+    errors = []
+    
+    def write(index):
+        try:
+            for _ in range(5):
+                index.add_snapshots(snapshots)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=write, args=(_index(tmp_path, 'shared'),)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    index = _index(tmp_path, 'shared')
+    assert [name for name in os.listdir(index.index_dir) if name.endswith('.tmp.npz')] == []
+    assert index.snapshot_dates('AAA').tolist() == [s['snapshot_date'] for s in snapshots]
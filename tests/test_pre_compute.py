@@ -0,0 +1,186 @@
+"""
+בדיקות שקילות של ה-pre-compute: workers מול תהליך יחיד
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_store import PriceCube
+from prediction_engine import pre_compute
+from prediction_engine.pre_compute import PreComputeEngine, _init_snapshot_worker, _compute_snapshot_chunk
+
+
+class _RecordingClient:
+    """
+    תחליף ל-SupabaseClient שרק אוסף את ה-snapshots שנשמרו
+    """
+    
+    def __init__(self):
+        self.snapshots = []
+    
+    def insert_correlation_snapshots(self, snapshots):
+        self.snapshots.extend(snapshots)
+        return True
+
+
+def _stock_data(n_dates: int = 80, n_symbols: int = 12, seed: int = 3) -> pd.DataFrame:
+    """
+    נתונים סינתטיים עם פקטור משותף (קורלציות סביב הספים) ונפחים בסדר גודל 1e9
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2022-01-03', periods=n_dates)
+    factor = rng.standard_normal(n_dates).cumsum()
+    columns = {}
+    for i in range(n_symbols):
+        columns[(f'S{i}', 'Adj Close')] = 100 + factor * (i % 4) * 0.5 + rng.standard_normal(n_dates).cumsum()
+        columns[(f'S{i}', 'Volume')] = 3e9 + factor * 1e7 * (i % 3) + rng.standard_normal(n_dates) * 1e7 + 0.37
+    return pd.DataFrame(columns, index=dates)
+
+
+def test_worker_chunk_matches_in_process_chunk(tmp_path):
+    stock_data = _stock_data()
+    symbols = stock_data.columns.get_level_values(0).unique().tolist()
+    positions = list(range(30, 60))
+    lookbacks, forwards, thresholds = [10, 15], [5], [0.5, 0.7]
+    
+    engine = PreComputeEngine(connect=False)
+    expected = engine.compute_sweep_chunk(stock_data, symbols, positions, lookbacks, forwards, thresholds)
+    
+    cube = PriceCube.build(str(tmp_path / 'cube'), stock_data, ['Adj Close', 'Volume'], dtype=np.float64)
+    _init_snapshot_worker(cube.path, symbols, engine.params)
+    chunk_idx, snapshots, error = _compute_snapshot_chunk((0, positions, lookbacks, forwards, thresholds))
+    
+    assert error is None
+    assert chunk_idx == 0
+    assert snapshots == expected
+
+
+def _sweep(stock_data, tmp_path, monkeypatch, workers):
+    monkeypatch.setitem(pre_compute.PATHS, 'price_cube', str(tmp_path / f'cube{workers}' / 'prices'))
+    monkeypatch.setitem(pre_compute.PATHS, 'precompute_journal', str(tmp_path / f'journal{workers}'))
+    monkeypatch.setitem(pre_compute.MULTIPROCESSING_CONFIG, 'chunk_size', 10)
+    
+    engine = PreComputeEngine(connect=False)
+    engine.db_client = _RecordingClient()
+    stats = engine.compute_parameter_sweep(stock_data, [10, 15], [5], [0.5, 0.7], max_workers=workers)
+    assert stats['snapshots'] == len(engine.db_client.snapshots)
+    assert stats['failed_chunks'] == 0
+    
+    key = lambda s: (s['snapshot_date'], s['stock_symbol'], s['lookback_days'], s['forward_days'], s['correlation_threshold'])
+    return sorted(engine.db_client.snapshots, key=key)
+
+
+def test_sweep_does_not_depend_on_worker_count(tmp_path, monkeypatch):
+    stock_data = _stock_data()
+    
+    single = _sweep(stock_data, tmp_path, monkeypatch, workers=1)
+    pooled = _sweep(stock_data, tmp_path, monkeypatch, workers=2)
+    
+    assert len(single) > 0
+    assert pooled == single
+
+
+def test_sweep_flushes_each_chunk_and_returns_counts(tmp_path, monkeypatch):
+    monkeypatch.setitem(pre_compute.PATHS, 'precompute_journal', str(tmp_path / 'journal'))
+    monkeypatch.setitem(pre_compute.MULTIPROCESSING_CONFIG, 'chunk_size', 8)
+    
+    engine = PreComputeEngine(connect=False)
+    engine.db_client = _RecordingClient()
+    flushed = []
+    engine._flush_snapshots = lambda snapshots: flushed.append(len(snapshots)) or True
+    
+    # 4 שילובים - chunk של 2 תאריכים במקום 8
+    stats = engine.compute_parameter_sweep(_stock_data(), [10, 15], [5], [0.5, 0.7], start_date='2022-02-01', end_date='2022-02-28', max_workers=1)
+    
+    assert stats['chunks'] == len(flushed) > 1
+    assert stats['snapshots'] == sum(flushed)
+    assert set(flushed) <= {2 * 12 * 4, 12 * 4}
+
+
+def test_snapshots_by_date_match_per_stock_path():
+    stock_data = _stock_data(n_dates=60, n_symbols=8)
+    symbols = stock_data.columns.get_level_values(0).unique().tolist()
+    # חור של NaN ומחיר קבוע (קורלציה לא מוגדרת)
+    stock_data.loc[stock_data.index[10:14], ('S3', 'Adj Close')] = np.nan
+    stock_data.loc[stock_data.index[30:50], ('S5', 'Adj Close')] = 100.0
+    
+    engine = PreComputeEngine(connect=False)
+    panels = engine.build_correlation_panels(stock_data, symbols)
+    by_date = {}
+    for date_idx in range(14, 45):
+        for snapshot in engine.compute_snapshots_for_date(stock_data, panels, date_idx, symbols, 15, 15, 0.6):
+            by_date[(snapshot['snapshot_date'], snapshot['stock_symbol'])] = snapshot
+    
+    compared = 0
+    for symbol in symbols:
+        for snapshot in engine.compute_snapshots_for_stock(stock_data, symbol, list(stock_data.index[14:45]), symbols, 15, 15, 0.6):
+            other = by_date[(snapshot['snapshot_date'], symbol)]
+            assert [m['symbol'] for m in snapshot['matched_stocks']] == [m['symbol'] for m in other['matched_stocks']]
+            for a, b in zip(snapshot['matched_stocks'], other['matched_stocks']):
+                assert a['corr_price'] == pytest.approx(b['corr_price'], abs=1e-9)
+                assert a['corr_volume'] == pytest.approx(b['corr_volume'], abs=1e-9)
+            assert snapshot['future_return_pct'] == other['future_return_pct']
+            assert snapshot['movement_type'] == other['movement_type']
+            compared += 1
+    
+    assert compared == len(by_date)
+
+
+class _FailingClient(_RecordingClient):
+    """
+    תחליף ל-SupabaseClient שנכשל בשמירות שמספרן ב-fail_calls (מ-1)
+    """
+    
+    def __init__(self, fail_calls):
+        super().__init__()
+        self.fail_calls = set(fail_calls)
+        self.calls = 0
+    
+    def insert_correlation_snapshots(self, snapshots):
+        self.calls += 1
+        if self.calls in self.fail_calls:
+            return False
+        return super().insert_correlation_snapshots(snapshots)
+
+
+def test_resume_recomputes_only_failed_chunks(tmp_path, monkeypatch):
+    stock_data = _stock_data()
+    expected = _sweep(stock_data, tmp_path, monkeypatch, workers=1)
+    
+    monkeypatch.setitem(pre_compute.PATHS, 'precompute_journal', str(tmp_path / 'journal_resume'))
+    engine = PreComputeEngine(connect=False)
+    
+    # השמירה של ה-chunk השני נכשלת פעמיים (כולל הניסיון החוזר)
+    engine.db_client = _FailingClient(fail_calls=[2, 3])
+    first = engine.compute_parameter_sweep(stock_data, [10, 15], [5], [0.5, 0.7], max_workers=1)
+    assert first['failed_chunks'] == 1
+    
+    saved = list(engine.db_client.snapshots)
+    engine.db_client = _RecordingClient()
+    second = engine.compute_parameter_sweep(stock_data, [10, 15], [5], [0.5, 0.7], max_workers=1, resume=True)
+    
+    assert second['chunks'] == 1
+    assert second['skipped_chunks'] == first['chunks'] - 1
+    assert second['failed_chunks'] == 0
+    
+    key = lambda s: (s['snapshot_date'], s['stock_symbol'], s['lookback_days'], s['forward_days'], s['correlation_threshold'])
+    assert sorted(saved + engine.db_client.snapshots, key=key) == expected
+    
+    # ריצה שלישית עם resume - הכל כבר הושלם
+    third = engine.compute_parameter_sweep(stock_data, [10, 15], [5], [0.5, 0.7], max_workers=1, resume=True)
+    assert third['chunks'] == 0
+
+
+def test_journal_of_other_parameters_is_not_reused(tmp_path, monkeypatch):
+    stock_data = _stock_data()
+    monkeypatch.setitem(pre_compute.PATHS, 'precompute_journal', str(tmp_path / 'journal_params'))
+    monkeypatch.setitem(pre_compute.MULTIPROCESSING_CONFIG, 'chunk_size', 10)
+    engine = PreComputeEngine(connect=False)
+    engine.db_client = _RecordingClient()
+    
+    engine.compute_parameter_sweep(stock_data, [10], [5], [0.5], max_workers=1)
+    other = engine.compute_parameter_sweep(stock_data, [15], [5], [0.5], max_workers=1, resume=True)
+    
+    assert other['skipped_chunks'] == 0
+    assert other['chunks'] > 0
@@ -0,0 +1,155 @@
+"""
+בדיקות מאגר המחירים - אינדקס, נעילה בין תהליכים ו-LRU
+"""
+
+import os
+import json
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+
+
+def _frame(periods: int = 50, start: str = '2020-01-01', offset: float = 0.0) -> pd.DataFrame:
+    dates = pd.bdate_range(start, periods=periods)
+    return pd.DataFrame({'Close': np.arange(periods, dtype=float) + offset, 'Volume': 1e6}, index=dates)
+
+
+def _write_symbols(root_dir: str, worker: int, count: int):
+    """
+    worker שכותב מניות משלו וקורא את המאגר בין הכתיבות
+    """
+    store = PriceStore(root_dir)
+    for i in range(count):
+        store.write(f'W{worker}_{i}', _frame(offset=i))
+        store.load([f'W{worker}_{j}' for j in range(i + 1)])
+
+
+def test_concurrent_writers_keep_every_index_entry(tmp_path):
+    root_dir = str(tmp_path / 'prices')
+    PriceStore(root_dir)
+    
+    workers = [multiprocessing.Process(target=_write_symbols, args=(root_dir, k, 10)) for k in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert len(PriceStore(root_dir).symbols()) == 40
+
+
+def _append_rows(root_dir: str, worker: int, count: int):
+    """
+    worker שמוסיף לאותה מניה שורות בתאריכים משלו
+    """
+    store = PriceStore(root_dir)
+    dates = pd.bdate_range('2021-01-04', periods=count * 4)
+    for i in range(count):
+        date = dates[worker * count + i].strftime('%Y-%m-%d')
+        store.append('SHARED', _frame(periods=1, start=date, offset=worker * 100 + i))
+
+
+def test_concurrent_appends_to_one_symbol_keep_every_row(tmp_path):
+    root_dir = str(tmp_path / 'prices')
+    PriceStore(root_dir)
+    
+    workers = [multiprocessing.Process(target=_append_rows, args=(root_dir, k, 8)) for k in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    assert all(worker.exitcode == 0 for worker in workers)
+    store = PriceStore(root_dir)
+    assert len(store.read('SHARED')) == 32
+    assert store.coverage('SHARED')['rows'] == 32
+    assert [name for name in os.listdir(store._symbol_dir('SHARED')) if name.endswith('.tmp')] == []
+
+
+def test_reads_do_not_rewrite_the_index(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    store.write('A', _frame())
+    store.write('B', _frame())
+    index_path = os.path.join(store.root_dir, '_index.json')
+    before = os.stat(index_path)
+    
+    reader = PriceStore(store.root_dir)
+    reader.load()
+    reader.read('A')
+    reader.covers('A', '2020-01-01', '2020-02-01')
+    
+    after = os.stat(index_path)
+    assert (after.st_mtime_ns, after.st_ino) == (before.st_mtime_ns, before.st_ino)
+
+
+def test_budget_evicts_least_recently_read(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    for symbol, accessed in (('A', 100), ('B', 200), ('C', 300)):
+        store.write(symbol, _frame())
+        os.utime(store._path(symbol), (accessed, accessed))
+    store._update_index(lambda entries: [
+        entries.__setitem__(symbol, dict(entries[symbol], last_access=0)) for symbol in 'ABC'
+    ])
+    
+    store.read('A')
+    
+    assert store.enforce_budget(store.size_bytes() - 1) == ['B']
+    assert store.symbols() == ['A', 'C']
+
+
+def test_budget_check_uses_the_indexed_total(tmp_path, monkeypatch):
+    store = PriceStore(str(tmp_path / 'prices'), max_bytes=10 ** 9)
+    
+    def no_stat(*args):
+        raise AssertionError('budget check under the limit must not stat data files')
+    
+    monkeypatch.setattr(PriceStore, '_last_access', no_stat)
+    for symbol in 'ABCD':
+        store.write(symbol, _frame())
+    store.remove('B')
+    
+    on_disk = sum(os.path.getsize(store._path(symbol)) for symbol in 'ACD')
+    assert store.size_bytes() == on_disk
+    assert PriceStore(store.root_dir).size_bytes() == on_disk
+    with open(os.path.join(store.root_dir, '_index.json'), encoding='utf-8') as f:
+        assert json.load(f)['total_bytes'] == on_disk
+
+
+def test_clear_keeps_store_usable(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    store.write('A', _frame())
+    store.clear()
+    
+    assert store.symbols() == []
+    store.write('B', _frame())
+    assert store.symbols() == ['B']
+
+
+def test_append_disjoint_range_keeps_old_coverage(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    store.write('A', _frame(40, '2020-01-01'), fetched_start='2020-01-01', fetched_end='2020-02-26')
+    store.append('A', _frame(20, '2020-06-01'), fetched_start='2020-06-01', fetched_end='2020-06-27')
+    
+    assert store.covers('A', '2020-01-01', '2020-02-26')
+    assert store.covers('A', '2020-06-01', '2020-06-27')
+    assert not store.covers('A', '2020-01-01', '2020-06-27')
+    assert store.missing_ranges('A', '2020-01-01', '2020-06-27') == [('2020-02-26', '2020-06-01')]
+    assert store.coverage('A')['rows'] == 60
+    
+    # מילוי הפער מאחד את הטווחים
+    store.append('A', _frame(10, '2020-03-02'), fetched_start='2020-02-26', fetched_end='2020-06-01')
+    assert store.coverage('A')['fetched_ranges'] == [['2020-01-01', '2020-06-27']]
+    assert store.covers('A', '2020-01-01', '2020-06-27')
+
+
+def test_missing_ranges_matches_single_range_edges(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices'))
+    store.write('A', _frame(40, '2020-03-02'), fetched_start='2020-03-01', fetched_end='2020-05-01')
+    
+    assert store.missing_ranges('A', '2020-01-01', '2020-06-01') == [('2020-01-01', '2020-03-01'), ('2020-05-01', '2020-06-01')]
+    assert store.missing_ranges('A', '2020-06-01', '2020-07-01') == [('2020-06-01', '2020-07-01')]
+    assert store.missing_ranges('A', '2020-03-15', '2020-04-15') == []
+    assert store.missing_ranges('B', '2020-03-15', '2020-04-15') == [('2020-03-15', '2020-04-15')]
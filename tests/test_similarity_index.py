@@ -0,0 +1,84 @@
+"""
+בדיקות אינדקס הדמיון מול calculate_similarity על כל snapshot
+"""
+
+import numpy as np
+import pytest
+
+from prediction_engine import similarity_index
+from prediction_engine.similarity_index import SimilarityIndex
+from prediction_engine.utils import calculate_similarity
+
+
+def _snapshots(n_snapshots: int = 400, n_symbols: int = 90, seed: int = 6):
+    """
+    snapshots סינתטיים: יקום של יותר מ-64 מניות (כמה מילים ב-bitset) וקבוצות חופפות
+    """
+    rng = np.random.default_rng(seed)
+    universe = [f'S{i}' for i in range(n_symbols)]
+    core = rng.choice(n_symbols, size=8, replace=False)
+    snapshots = []
+    for row in range(n_snapshots):
+        size = rng.integers(0, 12)
+        symbols = set(rng.choice(core, size=min(size, 6), replace=False).tolist())
+        symbols |= set(rng.choice(n_symbols, size=size // 2, replace=False).tolist())
+        snapshots.append({
+            'snapshot_date': f'2020-{row // 28 % 12 + 1:02d}-{row % 28 + 1:02d}',
+            'matched_stocks': [{'symbol': universe[i], 'corr_price': float(rng.uniform(0.5, 1.0))} for i in sorted(symbols)],
+            'future_return_pct': float(rng.normal())
+        })
+    return universe, snapshots
+
+
+def _brute_force(snapshots, query, min_similarity, start, stop):
+    rows, scores = [], []
+    for row in range(start, stop):
+        similarity = calculate_similarity(query, snapshots[row]['matched_stocks'])
+        if similarity > min_similarity:
+            rows.append(row)
+            scores.append(similarity)
+    return np.array(rows, dtype=np.int64), np.array(scores)
+
+
+@pytest.mark.parametrize('scan_rows', [0, 1_000_000])
+@pytest.mark.parametrize('min_similarity', [0.3, 0.7])
+def test_query_matches_calculate_similarity(monkeypatch, scan_rows, min_similarity):
+    monkeypatch.setattr(similarity_index, 'SCAN_ROWS', scan_rows)
+    universe, snapshots = _snapshots()
+    index = SimilarityIndex.from_snapshots(snapshots, universe)
+    
+    rng = np.random.default_rng(int(min_similarity * 10))
+    for row in rng.choice(len(snapshots), size=40, replace=False).tolist():
+        query = snapshots[row]['matched_stocks']
+        start, stop = sorted(rng.integers(0, len(snapshots), size=2).tolist())
+        
+        rows, scores = index.query(query, min_similarity, start, stop)
+        expected_rows, expected_scores = _brute_force(snapshots, query, min_similarity, start, stop)
+        
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-12)
+
+
+def test_query_with_symbols_outside_universe():
+    universe, snapshots = _snapshots()
+    index = SimilarityIndex.from_snapshots(snapshots, universe)
+    query = snapshots[5]['matched_stocks'] + [{'symbol': 'UNKNOWN', 'corr_price': 0.9}]
+    
+    rows, scores = index.query(query, 0.3)
+    expected_rows, expected_scores = _brute_force(snapshots, query, 0.3, 0, len(snapshots))
+    
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-12)
+    assert index.query([{'symbol': 'UNKNOWN', 'corr_price': 0.9}], 0.0)[0].size == 0
+
+
+def test_snapshots_roundtrip():
+    universe, snapshots = _snapshots(n_snapshots=50)
+    index = SimilarityIndex.from_snapshots(snapshots)
+    
+    by_symbol = lambda m: m['symbol']
+    assert len(index) == len(snapshots)
+    for row, snapshot in enumerate(snapshots):
+        assert sorted(index.matched_stocks(row), key=by_symbol) == sorted(snapshot['matched_stocks'], key=by_symbol)
+        assert index.snapshot_dates[row] == snapshot['snapshot_date']
+        assert index.future_returns[row] == snapshot['future_return_pct']